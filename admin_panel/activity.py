@@ -0,0 +1,111 @@
+import threading
+from contextlib import contextmanager
+from django.conf import settings
+from django.db import transaction
+from members.models import Member
+from .models import ActivityLog
+from .recent_activity import push_recent_activities
+
+# Estado por thread: registros aguardando gravação e profundidade dos blocos buffered_activity_logs
+_state = threading.local()
+
+
+def _buffer():
+    if not hasattr(_state, 'logs'):
+        _state.logs = []
+    return _state.logs
+
+
+def _holding():
+    return getattr(_state, 'depth', 0) > 0
+
+
+def flush_activity_logs():
+    """Grava com um único bulk_create os registros acumulados nesta thread. Retorna quantos foram gravados."""
+    logs = _buffer()[:]
+    _buffer().clear()
+
+    if not logs:
+        return 0
+
+    # O membro pode ter sido excluído depois do registro (ex.: criado e excluído na mesma requisição)
+    member_ids = {log.member_id for log in logs if log.member_id is not None}
+    if member_ids:
+        existing_ids = set(Member.objects.filter(id__in=member_ids).values_list('id', flat=True))
+        for log in logs:
+            if log.member_id not in existing_ids:
+                log.member_id = None
+
+    save_activity_logs(logs)
+    return len(logs)
+
+
+def save_activity_logs(logs, batch_size=None):
+    """
+    Grava os registros com bulk_create, sem passar pelo buffer (ex.: tarefas e importações em lote).
+
+    Depois do commit os registros também entram nas atividades recentes da página inicial
+    (ver admin_panel.recent_activity), então toda gravação direta de ActivityLog deve usar esta função.
+    """
+    logs = ActivityLog.objects.bulk_create(logs, batch_size=batch_size or settings.ACTIVITY_LOG_BUFFER_SIZE)
+    transaction.on_commit(lambda: push_recent_activities(logs))
+    return logs
+
+
+def _commit(log):
+    # Chamado pelo on_commit: a transação (ou savepoint) do registro foi confirmada
+    _buffer().append(log)
+
+    if not _holding() or len(_buffer()) >= settings.ACTIVITY_LOG_BUFFER_SIZE:
+        flush_activity_logs()
+
+
+def log_activity(event_type, description, member=None, changes=None):
+    """
+    Registra uma atividade no ActivityLog.
+
+    O registro só entra no buffer depois do commit da transação atual (fora de uma
+    transação, na hora); se ela ou o savepoint em que foi feito sofrer rollback, ele
+    é descartado. Dentro de buffered_activity_logs os registros confirmados ficam
+    retidos até o fim do bloco ou até atingir ACTIVITY_LOG_BUFFER_SIZE e são gravados
+    com um único bulk_create; fora dele cada um é gravado no commit. Com
+    ACTIVITY_LOG_SYNC=True cada registro é gravado na hora, como antes.
+    """
+    if settings.ACTIVITY_LOG_SYNC:
+        log = ActivityLog.objects.create(member=member, event_type=event_type, description=description, changes=changes)
+        # Só entra nas atividades recentes se a transação for confirmada
+        transaction.on_commit(lambda: push_recent_activities([log]))
+        return log
+
+    log = ActivityLog(
+        member_id=member.pk if member else None, event_type=event_type, description=description, changes=changes
+    )
+    transaction.on_commit(lambda: _commit(log))
+
+    return log
+
+
+@contextmanager
+def buffered_activity_logs():
+    """
+    Retém os registros de atividade confirmados durante o bloco e grava todos ao sair dele.
+
+    Usado nas requisições (ActivityLogBufferMiddleware) e em tarefas que alteram muitos
+    membros, trocando um INSERT por registro por um bulk_create a cada
+    ACTIVITY_LOG_BUFFER_SIZE registros.
+
+        with buffered_activity_logs():
+            for member in members:
+                member.update_activity_status()
+    """
+    _state.depth = getattr(_state, 'depth', 0) + 1
+
+    try:
+        yield
+    finally:
+        _state.depth -= 1
+
+        if not _holding():
+            # O buffer só tem registros de transações já confirmadas; os de uma transação
+            # ainda aberta entram no commit dela, gravados um a um fora do bloco
+            flush_activity_logs()
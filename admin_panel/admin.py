@@ -3,4 +3,13 @@ from .models import ActivityLog, DailyReport
 # Register your models here.
 
 admin.site.register(DailyReport)
-admin.site.register(ActivityLog)
+
+
+@admin.register(ActivityLog)
+class ActivityLogAdmin(admin.ModelAdmin):
+    list_display = ('created_at', 'event_type', 'member', 'description')
+    list_filter = ('event_type',)
+    list_select_related = ('member',)
+    # Ordena pelo índice de created_at e evita o COUNT(*) da tabela inteira a cada página
+    ordering = ('-created_at',)
+    show_full_result_count = False
@@ -0,0 +1,136 @@
+import gzip
+import json
+import logging
+import os
+import zlib
+from datetime import timedelta
+from pathlib import Path
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.timezone import localtime
+from .models import ActivityLog
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_PATTERN = 'activity_logs_*.jsonl.gz'
+
+
+def get_archive_dir(directory=None):
+    return Path(directory or settings.ACTIVITY_LOG_ARCHIVE_DIR)
+
+
+def serialize_log(log):
+    # Data no fuso local, para que a busca por dia use o mesmo calendário do painel
+    return json.dumps(
+        {**log, 'created_at': localtime(log['created_at']).isoformat()}, cls=DjangoJSONEncoder, ensure_ascii=False
+    )
+
+
+def archive_activity_logs(retention_days=None, batch_size=None, directory=None, now=None):
+    """
+    Move para arquivos JSON Lines compactados (gzip) os registros mais antigos que retention_days.
+
+    Cada lote de batch_size registros (pelo índice de created_at) é gravado no arquivo
+    da execução, levado ao disco (fsync) e só então apagado, com um DELETE por lote,
+    então a tabela nunca fica bloqueada por muito tempo e uma queda de energia não perde
+    registros. Se o processo cair entre a gravação e o DELETE, o lote é arquivado de
+    novo na próxima execução (a busca descarta ids repetidos).
+    Retorna a quantidade de registros arquivados e o arquivo gerado.
+    """
+    retention_days = settings.ACTIVITY_LOG_RETENTION_DAYS if retention_days is None else retention_days
+    batch_size = batch_size or settings.ACTIVITY_LOG_ARCHIVE_BATCH_SIZE
+    now = localtime(now)
+    cutoff = now - timedelta(days=retention_days)
+
+    archive_dir = get_archive_dir(directory)
+    archive_dir.mkdir(parents=True, exist_ok=True)
+    path = archive_dir / f'activity_logs_{now:%Y%m%d_%H%M%S}.jsonl.gz'
+    summary = {'archived': 0, 'batches': 0, 'cutoff': cutoff.isoformat(), 'file': None}
+
+    while True:
+        logs = list(
+            ActivityLog.objects.filter(created_at__lt=cutoff)
+            .order_by('created_at', 'id')
+            .values('id', 'member_id', 'event_type', 'description', 'changes', 'created_at')[:batch_size]
+        )
+        if not logs:
+            break
+
+        # Cada lote vira um membro gzip anexado ao arquivo; o gzip lê todos em sequência
+        with open(path, 'ab') as raw:
+            with gzip.open(raw, 'wt', encoding='utf-8') as archive:
+                for log in logs:
+                    archive.write(serialize_log(log) + '\n')
+            # O DELETE só roda com o lote gravado no disco, não apenas no cache do sistema operacional
+            raw.flush()
+            os.fsync(raw.fileno())
+
+        ActivityLog.objects.filter(id__in=[log['id'] for log in logs]).delete()
+        summary['archived'] += len(logs)
+        summary['batches'] += 1
+        summary['file'] = str(path)
+
+    return summary
+
+
+ARCHIVE_FIELDS = ('id', 'member_id', 'event_type', 'description', 'created_at')
+
+
+def parse_archive_line(line):
+    """Registro de uma linha do arquivo, ou None se ela estiver truncada ou corrompida."""
+    try:
+        # json.loads decodifica os bytes como UTF-8; erros de codificação também são ValueError
+        log = json.loads(line)
+    except ValueError:
+        return None
+
+    if not isinstance(log, dict) or any(field not in log for field in ARCHIVE_FIELDS):
+        return None
+    return log
+
+
+def search_archives(directory=None, member_id=None, event_type=None, text=None, since=None, until=None):
+    """
+    Percorre os arquivos de ActivityLog arquivados, do mais antigo ao mais recente, gerando
+    os registros (dicionários) que atendem aos filtros. since e until são datas (inclusivas).
+
+    Um arquivo truncado ou corrompido (ex.: o processo caiu durante a gravação) é registrado
+    no log e ignorado a partir do ponto do erro; linhas que não são registros válidos são
+    puladas. Nos dois casos a busca continua.
+    """
+    seen = set()
+
+    for path in sorted(get_archive_dir(directory).glob(ARCHIVE_PATTERN)):
+        skipped = 0
+
+        try:
+            # Lido em bytes para que uma linha com codificação inválida não interrompa o arquivo
+            with gzip.open(path, 'rb') as archive:
+                for line in archive:
+                    log = parse_archive_line(line)
+
+                    if log is None:
+                        skipped += 1
+                        continue
+                    if log['id'] in seen:
+                        continue
+                    if member_id is not None and log['member_id'] != member_id:
+                        continue
+                    if event_type and log['event_type'] != event_type:
+                        continue
+                    if text and text.lower() not in log['description'].lower():
+                        continue
+
+                    created_on = log['created_at'][:10]
+                    if since and created_on < since.isoformat():
+                        continue
+                    if until and created_on > until.isoformat():
+                        continue
+
+                    seen.add(log['id'])
+                    yield log
+        except (EOFError, gzip.BadGzipFile, zlib.error) as error:
+            logger.warning('Arquivo de atividades %s corrompido, ignorado: %s', path, error)
+        finally:
+            if skipped:
+                logger.warning('Arquivo de atividades %s: %s linha(s) inválida(s) ignorada(s).', path, skipped)
@@ -0,0 +1,41 @@
+import json
+from datetime import date
+from django.core.management.base import BaseCommand, CommandError
+from admin_panel.archive import get_archive_dir, search_archives
+
+
+class Command(BaseCommand):
+    help = (
+        'Busca registros de atividade já arquivados (arquivos .jsonl.gz de ACTIVITY_LOG_ARCHIVE_DIR). '
+        'Exibe um registro JSON por linha.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--member-id', type=int, default=None)
+        parser.add_argument('--event-type', default=None, help='created, updated, deleted, payment ou pending.')
+        parser.add_argument('--text', default=None, help='Trecho da descrição (sem diferenciar maiúsculas).')
+        parser.add_argument('--since', type=date.fromisoformat, default=None, help='Data inicial (AAAA-MM-DD).')
+        parser.add_argument('--until', type=date.fromisoformat, default=None, help='Data final (AAAA-MM-DD).')
+        parser.add_argument('--limit', type=int, default=None, help='Quantidade máxima de registros exibidos.')
+        parser.add_argument('--directory', default=None, help='Padrão: ACTIVITY_LOG_ARCHIVE_DIR.')
+
+    def handle(self, *args, **options):
+        if not get_archive_dir(options['directory']).is_dir():
+            raise CommandError(f"Diretório de arquivos não encontrado: {get_archive_dir(options['directory'])}")
+
+        found = 0
+        for log in search_archives(
+            directory=options['directory'],
+            member_id=options['member_id'],
+            event_type=options['event_type'],
+            text=options['text'],
+            since=options['since'],
+            until=options['until'],
+        ):
+            self.stdout.write(json.dumps(log, ensure_ascii=False))
+            found += 1
+
+            if options['limit'] is not None and found >= options['limit']:
+                break
+
+        self.stderr.write(f'{found} registro(s) encontrado(s).')
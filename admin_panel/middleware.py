@@ -0,0 +1,12 @@
+from .activity import buffered_activity_logs
+
+
+class ActivityLogBufferMiddleware:
+    """Grava os registros de atividade da requisição de uma vez, no fim dela (ver admin_panel.activity)."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with buffered_activity_logs():
+            return self.get_response(request)
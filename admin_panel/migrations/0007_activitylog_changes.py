@@ -0,0 +1,19 @@
+# Generated by Django 5.1.3 on 2026-10-18 22:01
+
+import django.core.serializers.json
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('admin_panel', '0006_alter_activitylog_created_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='activitylog',
+            name='changes',
+            field=models.JSONField(blank=True, encoder=django.core.serializers.json.DjangoJSONEncoder, null=True),
+        ),
+    ]
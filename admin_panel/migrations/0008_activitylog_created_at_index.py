@@ -0,0 +1,17 @@
+# Generated by Django 5.1.3 on 2026-10-18 22:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('admin_panel', '0007_activitylog_changes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='activitylog',
+            index=models.Index(fields=['created_at'], name='admin_panel_created_77c91f_idx'),
+        ),
+    ]
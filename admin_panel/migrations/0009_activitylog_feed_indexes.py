@@ -0,0 +1,29 @@
+# Generated by Django 5.1.3 on 2026-10-18 22:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('admin_panel', '0008_activitylog_created_at_index'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='activitylog',
+            name='admin_panel_created_77c91f_idx',
+        ),
+        migrations.AddIndex(
+            model_name='activitylog',
+            index=models.Index(fields=['created_at', 'id'], name='activitylog_created_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='activitylog',
+            index=models.Index(fields=['event_type', 'created_at', 'id'], name='activitylog_event_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='activitylog',
+            index=models.Index(fields=['member', 'created_at', 'id'], name='activitylog_member_created_idx'),
+        ),
+    ]
@@ -1,10 +1,15 @@
 from django.db import models
+from django.core.serializers.json import DjangoJSONEncoder
 from members.models import Member
 from django.utils.timezone import localdate
 from members.models import Member, Payment
 from django.db.models import Sum
 from datetime import date as date_instance
 from django.utils.timezone import localtime
+from datetime import datetime, time, timedelta
+from django.utils.timezone import make_aware
+from django.db.models import Q
+import base64
 
 class ActivityLog(models.Model):
     EVENT_TYPES = [
@@ -18,11 +23,76 @@ class ActivityLog(models.Model):
     member = models.ForeignKey(Member, on_delete=models.SET_NULL, null=True, blank=True)
     event_type = models.CharField(max_length=20, choices=EVENT_TYPES)
     description = models.TextField()
+    # Campos alterados numa atualização: {campo: [antes, depois]}
+    changes = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
     created_at = models.DateTimeField(default=localtime, editable=False)
 
+    class Meta:
+        # Mesma ordem do feed (created_at, id): a paginação por cursor lê só as linhas da página
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='activitylog_created_id_idx'),
+            models.Index(fields=['event_type', 'created_at', 'id'], name='activitylog_event_created_idx'),
+            models.Index(fields=['member', 'created_at', 'id'], name='activitylog_member_created_idx'),
+        ]
+
     def __str__(self):
         return f"{self.get_event_type_display()} - {self.description}"
 
+    @property
+    def cursor(self):
+        """Cursor opaco que aponta para este registro no feed (created_at e id)."""
+        value = f'{self.created_at.isoformat()}|{self.id}'
+        return base64.urlsafe_b64encode(value.encode()).decode()
+
+    @staticmethod
+    def parse_cursor(cursor):
+        """Retorna (created_at, id) de um cursor gerado por ActivityLog.cursor. Levanta ValueError se inválido."""
+        try:
+            created_at, log_id = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+            created_at = datetime.fromisoformat(created_at)
+            log_id = int(log_id)
+        except (TypeError, ValueError, UnicodeError):
+            raise ValueError(f'Cursor inválido: {cursor}')
+
+        if created_at.tzinfo is None:
+            raise ValueError(f'Cursor inválido: {cursor}')
+
+        return created_at, log_id
+
+    @classmethod
+    def get_feed(cls, cursor=None, limit=50, event_type=None, member_id=None, since=None, until=None):
+        """
+        Página do feed de atividades, da mais recente para a mais antiga.
+
+        Usa paginação por cursor em (created_at, id) em vez de OFFSET: cada página
+        continua logo depois do último registro da anterior, então o custo é o mesmo
+        na primeira ou na milésima página. since e until são datas (inclusivas).
+        Retorna (registros, cursor da próxima página ou None).
+        """
+        logs = cls.objects.select_related('member').order_by('-created_at', '-id')
+
+        if event_type:
+            logs = logs.filter(event_type=event_type)
+        if member_id is not None:
+            logs = logs.filter(member_id=member_id)
+        # Limites em datetime (e não created_at__date) para o banco usar o índice
+        if since:
+            logs = logs.filter(created_at__gte=make_aware(datetime.combine(since, time.min)))
+        if until:
+            logs = logs.filter(created_at__lt=make_aware(datetime.combine(until + timedelta(days=1), time.min)))
+
+        if cursor:
+            created_at, log_id = cls.parse_cursor(cursor)
+            # O created_at__lte delimita a faixa do índice; o Q desempata registros do mesmo instante
+            logs = logs.filter(Q(created_at__lt=created_at) | Q(id__lt=log_id), created_at__lte=created_at)
+
+        # Um registro a mais indica se existe próxima página, sem COUNT
+        page = list(logs[:limit + 1])
+        if len(page) > limit:
+            return page[:limit], page[limit - 1].cursor
+
+        return page, None
+
 
 class DailyReport(models.Model):
     date = models.DateField(unique=True)
@@ -0,0 +1,90 @@
+import logging
+from django.conf import settings
+from django.utils.dateformat import format as format_date
+from django.utils.timezone import localtime
+from utils.ring_buffer import get_ring_buffer
+from .models import ActivityLog
+
+logger = logging.getLogger(__name__)
+
+RECENT_ACTIVITY_BUFFER = 'recent_activities'
+
+# Se a última operação na lista falhou; o aviso é registrado uma vez por indisponibilidade, não a cada chamada
+_unavailable = False
+
+
+def get_recent_activity_buffer():
+    return get_ring_buffer(RECENT_ACTIVITY_BUFFER, settings.RECENT_ACTIVITY_SIZE)
+
+
+def _buffer_failed(error):
+    global _unavailable
+
+    if not _unavailable:
+        logger.warning('Lista de atividades recentes indisponível, usando o banco até ela voltar: %r', error)
+    _unavailable = True
+
+
+def _buffer_available():
+    global _unavailable
+
+    if _unavailable:
+        logger.info('Lista de atividades recentes disponível novamente.')
+    _unavailable = False
+
+
+def serialize_activity(log):
+    """Registro já no formato exibido pelo painel, para não precisar do banco ao montar a página."""
+    return {
+        'id': log.id,
+        'event_type': log.event_type,
+        'description': log.description,
+        'created_at': format_date(localtime(log.created_at), 'd/m/y H:i'),
+    }
+
+
+def push_recent_activities(logs):
+    """Coloca os registros recém-gravados (do mais antigo para o mais recente) no início da lista de atividades recentes."""
+    if not settings.RECENT_ACTIVITY_RING_BUFFER or not logs:
+        return
+
+    try:
+        get_recent_activity_buffer().push(*[serialize_activity(log) for log in logs])
+    except Exception as error:
+        # O registro já está no banco; sem o Redis a página inicial consulta o banco
+        _buffer_failed(error)
+    else:
+        _buffer_available()
+
+
+def get_recent_activities(limit=None):
+    """
+    Atividades recentes da página inicial, já serializadas (ver serialize_activity).
+
+    Lidas da lista limitada do Redis, mantida por push_recent_activities a cada registro
+    gravado. Com a lista vazia (Redis reiniciado, chave expirada...) ou indisponível,
+    consulta o banco e, se possível, preenche a lista para as próximas requisições.
+    """
+    limit = limit or settings.RECENT_ACTIVITY_SIZE
+
+    if settings.RECENT_ACTIVITY_RING_BUFFER:
+        try:
+            activities = get_recent_activity_buffer().items(limit)
+        except Exception as error:
+            _buffer_failed(error)
+            activities = None
+        else:
+            _buffer_available()
+
+        if activities:
+            return activities
+
+    activities = [serialize_activity(log) for log in ActivityLog.objects.order_by('-id')[:settings.RECENT_ACTIVITY_SIZE]]
+
+    if settings.RECENT_ACTIVITY_RING_BUFFER:
+        try:
+            get_recent_activity_buffer().fill_if_empty(activities)
+        except Exception as error:
+            _buffer_failed(error)
+
+    return activities[:limit]
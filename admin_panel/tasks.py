@@ -1,6 +1,20 @@
+import logging
 from .models import DailyReport
+from .archive import archive_activity_logs as archive_logs
 from celery import shared_task
 
+logger = logging.getLogger(__name__)
+
 @shared_task
 def save_daily_report():
-    DailyReport.create_report()
\ No newline at end of file
+    DailyReport.create_report()
+
+@shared_task
+def archive_activity_logs():
+    """Arquiva e remove os registros de atividade mais antigos que ACTIVITY_LOG_RETENTION_DAYS."""
+    summary = archive_logs()
+    logger.info(
+        'ActivityLog: %(archived)s registro(s) anteriores a %(cutoff)s arquivado(s) em %(batches)s lote(s) (%(file)s).',
+        summary
+    )
+    return summary
@@ -26,12 +26,13 @@ class TestBaseHomeView(TestBase):
             is_active=False
         )
         
-        # Create reusable payment
-        cls.payment = Payment.objects.create(
-            member=cls.active_member,
-            payment_date=localdate(),
-            amount=100
-        )
+        # Create reusable payment (executa o recálculo de status agendado para o commit)
+        with cls.captureOnCommitCallbacks(execute=True):
+            cls.payment = Payment.objects.create(
+                member=cls.active_member,
+                payment_date=localdate(),
+                amount=100
+            )
         
     def create_member_inactive(self):
         return Member.objects.create(
@@ -0,0 +1,122 @@
+from django.db import transaction
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils.timezone import localdate
+from admin_panel.activity import buffered_activity_logs, log_activity
+from admin_panel.models import ActivityLog
+from members.models import Member
+from users.models import User
+
+
+@override_settings(ACTIVITY_LOG_SYNC=False, ACTIVITY_LOG_BUFFER_SIZE=100)
+class ActivityLogBufferTests(TestCase):
+
+    def create_members(self, count):
+        return [
+            Member.objects.create(email=f'aluno{i}@teste.com', full_name=f'Aluno {i}', phone=f'859888800{i:02d}')
+            for i in range(count)
+        ]
+
+    def test_logs_are_written_on_commit(self):
+        """Tests that the logs of a transaction are only written after it commits."""
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_members(3)
+            self.assertEqual(ActivityLog.objects.count(), 0)
+
+        self.assertEqual(ActivityLog.objects.filter(event_type='created').count(), 3)
+
+    def test_buffered_block_writes_one_bulk_insert(self):
+        """Tests that the logs held by buffered_activity_logs are saved with a single INSERT."""
+        # 5 INSERTs e 5 UPDATEs dos membros, a contagem abaixo e, ao sair do bloco,
+        # o SELECT dos membros existentes e um único INSERT com os 10 registros
+        with self.assertNumQueries(13), buffered_activity_logs():
+            with self.captureOnCommitCallbacks(execute=True):
+                members = self.create_members(5)
+                for member in members:
+                    member.full_name = f'{member.full_name} Silva'
+                    member.save()
+
+            self.assertEqual(len(ActivityLog.objects.all()), 0)
+
+        self.assertEqual(ActivityLog.objects.count(), 10)
+        self.assertEqual(ActivityLog.objects.filter(event_type='updated', member=members[0]).count(), 1)
+
+    @override_settings(ACTIVITY_LOG_BUFFER_SIZE=4)
+    def test_buffer_is_flushed_when_full(self):
+        with buffered_activity_logs():
+            with self.captureOnCommitCallbacks(execute=True):
+                self.create_members(5)
+            self.assertEqual(ActivityLog.objects.count(), 4)
+
+        self.assertEqual(ActivityLog.objects.count(), 5)
+
+    def test_logs_of_a_rolled_back_block_inside_a_buffered_block_are_discarded(self):
+        """Tests that a log held by buffered_activity_logs is dropped when its atomic block rolls back."""
+        with buffered_activity_logs():
+            with self.captureOnCommitCallbacks(execute=True):
+                try:
+                    with transaction.atomic():
+                        Member.objects.create(email='fantasma@teste.com', full_name='Aluno Fantasma', phone='85988880000')
+                        raise RuntimeError
+                except RuntimeError:
+                    pass
+
+                log_activity('pending', 'Depois do rollback.')
+
+        self.assertEqual(list(ActivityLog.objects.values_list('description', flat=True)), ['Depois do rollback.'])
+
+    def test_logs_of_a_rolled_back_savepoint_are_discarded(self):
+        with buffered_activity_logs():
+            with self.captureOnCommitCallbacks(execute=True):
+                with transaction.atomic():
+                    log_activity('created', 'Confirmado.')
+                    try:
+                        with transaction.atomic():
+                            log_activity('created', 'Desfeito.')
+                            raise RuntimeError
+                    except RuntimeError:
+                        pass
+
+        self.assertEqual(list(ActivityLog.objects.values_list('description', flat=True)), ['Confirmado.'])
+
+    def test_uncommitted_logs_are_not_written_at_the_end_of_the_block(self):
+        with buffered_activity_logs():
+            log_activity('created', 'Ainda sem commit.')
+
+        self.assertEqual(ActivityLog.objects.count(), 0)
+
+    def test_logs_of_a_rolled_back_transaction_are_discarded(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    self.create_members(1)
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+
+            log_activity('pending', 'Depois do rollback.')
+
+        self.assertEqual(list(ActivityLog.objects.values_list('description', flat=True)), ['Depois do rollback.'])
+
+    def test_deleted_member_is_not_referenced(self):
+        with buffered_activity_logs():
+            with self.captureOnCommitCallbacks(execute=True):
+                member = self.create_members(1)[0]
+                member.delete()
+
+        self.assertEqual(ActivityLog.objects.count(), 2)
+        self.assertFalse(ActivityLog.objects.filter(member__isnull=False).exists())
+
+    def test_request_logs_are_written_at_the_end_of_the_request(self):
+        user = User.objects.create_user(cpf='12345678901', email='admin@example.com', password='password123')
+        self.client.force_login(user)
+
+        # O TestCase roda dentro de uma transação: os registros só entram no commit simulado
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('admin_panel:add_member'), {
+                'full_name': 'Aluno Novo', 'email': 'novo@teste.com', 'phone': '85988880000',
+                'is_active': True, 'payment_date': localdate(), 'amount': 100.00,
+            })
+
+        self.assertEqual(ActivityLog.objects.filter(event_type='created').count(), 1)
+        self.assertEqual(ActivityLog.objects.filter(event_type='payment').count(), 1)
@@ -0,0 +1,113 @@
+from datetime import timedelta
+from django.urls import reverse
+from django.utils.timezone import localtime
+from admin_panel.models import ActivityLog
+from members.models import Member
+from .base.test_base import TestBase
+
+
+class ActivityFeedTest(TestBase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+
+        cls.member = Member.objects.create(email='aluno@teste.com', full_name='Aluno Teste', phone='85988880000')
+        ActivityLog.objects.all().delete()
+
+        now = localtime()
+        cls.same_instant = now - timedelta(days=1)
+        # Dois registros no mesmo instante: o id desempata
+        cls.logs = ActivityLog.objects.bulk_create([
+            ActivityLog(event_type='created', description='Aluno criado', created_at=now - timedelta(days=3)),
+            ActivityLog(event_type='payment', description='Pagamento 1', member=cls.member, created_at=cls.same_instant),
+            ActivityLog(event_type='payment', description='Pagamento 2', member=cls.member, created_at=cls.same_instant),
+            ActivityLog(event_type='updated', description='Aluno atualizado', member=cls.member, created_at=now),
+        ])
+
+        cls.feed_url = reverse('admin_panel:activity_feed')
+        cls.json_url = reverse('admin_panel:activity_feed_json')
+
+    def descriptions(self, logs):
+        return [log.description for log in logs]
+
+    def test_get_feed_walks_all_pages_with_cursor(self):
+        """Tests that following the cursors returns every log once, newest first, including ties on created_at."""
+        pages = []
+        cursor = None
+
+        while True:
+            logs, cursor = ActivityLog.get_feed(cursor=cursor, limit=1 if not pages else 2)
+            pages.append(self.descriptions(logs))
+            if cursor is None:
+                break
+
+        self.assertEqual(pages, [['Aluno atualizado'], ['Pagamento 2', 'Pagamento 1'], ['Aluno criado']])
+
+    def test_get_feed_uses_one_query_per_page(self):
+        _, cursor = ActivityLog.get_feed(limit=2)
+
+        with self.assertNumQueries(1):
+            logs, _ = ActivityLog.get_feed(cursor=cursor, limit=2)
+            [log.member for log in logs]
+
+    def test_get_feed_filters(self):
+        logs, _ = ActivityLog.get_feed(event_type='payment')
+        self.assertEqual(self.descriptions(logs), ['Pagamento 2', 'Pagamento 1'])
+
+        logs, _ = ActivityLog.get_feed(member_id=self.member.id, limit=1)
+        self.assertEqual(self.descriptions(logs), ['Aluno atualizado'])
+
+        day = self.same_instant.date()
+        logs, _ = ActivityLog.get_feed(since=day, until=day)
+        self.assertEqual(self.descriptions(logs), ['Pagamento 2', 'Pagamento 1'])
+
+    def test_parse_cursor_rejects_invalid_values(self):
+        for cursor in ('invalido', 'MjAyNC0wMS0wMQ==', self.logs[0].cursor[:-4]):
+            with self.assertRaises(ValueError):
+                ActivityLog.parse_cursor(cursor)
+
+    def test_activity_feed_requires_authentication(self):
+        response = self.client.get(self.feed_url)
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(response.url.startswith(reverse('users:login_view')))
+
+    def test_activity_feed_renders_page_and_next_cursor(self):
+        self.client.login(cpf=self.user.cpf, password=self.password)
+
+        with self.settings(ACTIVITY_FEED_PAGE_SIZE=2):
+            response = self.client.get(self.feed_url, {'event_type': 'payment', 'cursor': self.logs[3].cursor})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTemplateUsed(response, 'admin_panel/pages/activity_feed.html')
+        self.assertEqual(self.descriptions(response.context['activities']), ['Pagamento 2', 'Pagamento 1'])
+        self.assertIsNone(response.context['next_cursor'])
+        self.assertEqual(response.context['filter_query'], 'event_type=payment')
+
+    def test_activity_feed_ignores_invalid_cursor(self):
+        self.client.login(cpf=self.user.cpf, password=self.password)
+        response = self.client.get(self.feed_url, {'cursor': 'invalido', 'since': '2024-02-30'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['activities']), 4)
+
+    def test_activity_feed_json(self):
+        self.client.login(cpf=self.user.cpf, password=self.password)
+        response = self.client.get(self.json_url, {'member': self.member.id, 'limit': 2})
+
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual([item['description'] for item in data['results']], ['Aluno atualizado', 'Pagamento 2'])
+        self.assertEqual(data['results'][0]['member_name'], 'Aluno Teste')
+
+        response = self.client.get(self.json_url, {'member': self.member.id, 'limit': 2, 'cursor': data['next_cursor']})
+        data = response.json()
+        self.assertEqual([item['description'] for item in data['results']], ['Pagamento 1'])
+        self.assertIsNone(data['next_cursor'])
+
+    def test_activity_feed_json_invalid_cursor(self):
+        self.client.login(cpf=self.user.cpf, password=self.password)
+        response = self.client.get(self.json_url, {'cursor': 'invalido'})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('error', response.json())
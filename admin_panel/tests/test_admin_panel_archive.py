@@ -0,0 +1,129 @@
+import gzip
+import json
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from pathlib import Path
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils.timezone import localtime
+from admin_panel.archive import archive_activity_logs, search_archives
+from admin_panel.models import ActivityLog
+from admin_panel.tasks import archive_activity_logs as archive_activity_logs_task
+from members.models import Member
+
+
+class ActivityLogArchiveTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.member = Member.objects.create(email='aluno@teste.com', full_name='Aluno Teste', phone='85988880000')
+        ActivityLog.objects.all().delete()
+
+        now = localtime()
+        cls.old_logs = [
+            ActivityLog.objects.create(
+                member=cls.member, event_type='payment', description=f'Pagamento antigo {i}',
+                created_at=now - timedelta(days=400 + i)
+            )
+            for i in range(5)
+        ]
+        cls.old_logs.append(ActivityLog.objects.create(
+            event_type='updated', description='Aluno atualizado', changes={'is_active': [True, False]},
+            created_at=now - timedelta(days=500)
+        ))
+        cls.recent_log = ActivityLog.objects.create(event_type='created', description='Aluno novo')
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def test_old_logs_are_archived_and_deleted_in_batches(self):
+        """Tests that logs older than the retention are written to a gzip file and removed in bounded batches."""
+        with self.assertNumQueries(7):  # 3 lotes de SELECT + DELETE e o SELECT vazio final
+            summary = archive_activity_logs(retention_days=365, batch_size=2, directory=self.directory.name)
+
+        self.assertEqual((summary['archived'], summary['batches']), (6, 3))
+        self.assertEqual(list(ActivityLog.objects.all()), [self.recent_log])
+
+        with gzip.open(summary['file'], 'rt', encoding='utf-8') as archive:
+            rows = [json.loads(line) for line in archive]
+
+        self.assertEqual(sorted(row['id'] for row in rows), sorted(log.id for log in self.old_logs))
+        updated = next(row for row in rows if row['event_type'] == 'updated')
+        self.assertEqual(updated['changes'], {'is_active': [True, False]})
+        self.assertIsNone(updated['member_id'])
+
+    def test_nothing_to_archive(self):
+        summary = archive_activity_logs(retention_days=1000, directory=self.directory.name)
+
+        self.assertEqual(summary['archived'], 0)
+        self.assertIsNone(summary['file'])
+        self.assertEqual(ActivityLog.objects.count(), 7)
+
+    def test_task_uses_retention_settings(self):
+        with override_settings(ACTIVITY_LOG_RETENTION_DAYS=450, ACTIVITY_LOG_ARCHIVE_DIR=self.directory.name):
+            summary = archive_activity_logs_task()
+
+        # Só o registro de 500 dias passa da retenção
+        self.assertEqual(summary['archived'], 1)
+        self.assertEqual(ActivityLog.objects.count(), 6)
+
+    def test_search_archives(self):
+        archive_activity_logs(retention_days=365, batch_size=4, directory=self.directory.name)
+
+        by_member = list(search_archives(self.directory.name, member_id=self.member.id))
+        self.assertEqual(len(by_member), 5)
+
+        by_text = list(search_archives(self.directory.name, text='ANTIGO 3'))
+        self.assertEqual([log['description'] for log in by_text], ['Pagamento antigo 3'])
+
+        day = (localtime() - timedelta(days=500)).date()
+        by_date = list(search_archives(self.directory.name, since=day, until=day))
+        self.assertEqual([log['event_type'] for log in by_date], ['updated'])
+
+    def test_search_command(self):
+        archive_activity_logs(retention_days=365, directory=self.directory.name)
+        out, err = StringIO(), StringIO()
+
+        call_command(
+            'search_activity_archive', event_type='payment', limit=2, directory=self.directory.name,
+            stdout=out, stderr=err
+        )
+
+        lines = out.getvalue().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertEqual(json.loads(lines[0])['event_type'], 'payment')
+        self.assertIn('2 registro(s) encontrado(s).', err.getvalue())
+
+    def test_search_skips_corrupted_archives(self):
+        """Tests that a truncated or invalid archive is logged and skipped while the others are still searched."""
+        summary = archive_activity_logs(retention_days=365, directory=self.directory.name)
+        directory = Path(self.directory.name)
+        content = Path(summary['file']).read_bytes()
+        (directory / 'activity_logs_00000000_000000.jsonl.gz').write_bytes(b'not gzip')
+        (directory / 'activity_logs_00000000_000001.jsonl.gz').write_bytes(content[:len(content) // 2])
+
+        with self.assertLogs('admin_panel.archive', level='WARNING') as logs:
+            found = list(search_archives(self.directory.name, event_type='payment'))
+
+        self.assertEqual(len(found), 5)
+        self.assertEqual(len(logs.records), 2)
+
+    def test_search_skips_invalid_lines(self):
+        """Tests that truncated or garbled lines inside a valid gzip file are skipped with a warning."""
+        archive_activity_logs(retention_days=365, directory=self.directory.name)
+        path = Path(self.directory.name) / 'activity_logs_00000000_000000.jsonl.gz'
+        valid = {'id': 999, 'member_id': None, 'event_type': 'payment', 'description': 'Linha válida', 'created_at': '2020-01-01T00:00:00'}
+        with gzip.open(path, 'wb') as archive:
+            archive.write(b'{"id": 998, "member_id": nu\n')
+            archive.write(b'\xff\xfe garbled\n')
+            archive.write(b'42\n')
+            archive.write(json.dumps(valid).encode('utf-8') + b'\n')
+
+        with self.assertLogs('admin_panel.archive', level='WARNING') as logs:
+            found = list(search_archives(self.directory.name, event_type='payment'))
+
+        self.assertEqual(len(found), 6)
+        self.assertEqual(found[0]['id'], 999)
+        self.assertIn('3 linha(s) inválida(s)', logs.output[0])
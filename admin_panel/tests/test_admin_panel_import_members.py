@@ -0,0 +1,118 @@
+import os
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.urls import reverse
+from django.utils.timezone import localdate
+from admin_panel.models import ActivityLog
+from members.models import BillingMessage, Member, Payment
+from .base.test_base import TestBase
+
+
+class ImportMembersTests(TestBase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+
+        cls.existing_member = Member.objects.create(
+            full_name='Existing Member',
+            email='existing@example.com',
+            phone='85988887777',
+        )
+        cls.import_members_view_url = reverse('admin_panel:import_members_view')
+        cls.import_members_url = reverse('admin_panel:import_members')
+
+    def make_csv_content(self):
+        today = localdate()
+        lines = [
+            'nome,email,telefone,data,valor',
+            f'Aluno Novo,novo@example.com,(85) 98888-1111,{today.isoformat()},100',
+            f'Aluno Antigo,antigo@example.com,85988882222,{(today - timedelta(days=40)).isoformat()},90',
+            f'Aluno Repetido,existing@example.com,85988883333,{today.isoformat()},100',
+            f'Aluno Duplicado,novo@example.com,85988884444,{today.isoformat()},100',
+            f'Al,invalido,123,{today.isoformat()},100',
+        ]
+        return '\n'.join(lines).encode('utf-8')
+
+    def test_import_members_view_template_used(self):
+        """Tests if the import page renders the shared import template."""
+        self.client.login(cpf=self.user.cpf, password=self.password)
+        response = self.client.get(self.import_members_view_url)
+        self.assertTemplateUsed(response, 'admin_panel/pages/import_spreadsheet.html')
+        self.assertContains(response, 'Importar Alunos')
+
+    def test_import_members_csv(self):
+        """Tests that members and their first payments are created and invalid rows are reported."""
+        self.client.login(cpf=self.user.cpf, password=self.password)
+        file = SimpleUploadedFile('members.csv', self.make_csv_content(), content_type='text/csv')
+
+        response = self.client.post(self.import_members_url, {'file': file})
+
+        report = response.context['report']
+        self.assertEqual(report.created, 2)
+        self.assertEqual([error['line'] for error in report.errors], [4, 5, 6])
+        self.assertContains(response, 'Linha 4: Este e-mail já está cadastrado.')
+
+        new_member = Member.objects.get(email='novo@example.com')
+        self.assertEqual(new_member.phone, '85988881111')
+        self.assertTrue(new_member.is_active)
+        self.assertEqual(new_member.last_payment_date, localdate())
+        self.assertEqual(Payment.objects.filter(member=new_member).count(), 1)
+        self.assertFalse(Member.objects.get(email='antigo@example.com').is_active)
+
+        # Um único registro de resumo por lote
+        self.assertEqual(ActivityLog.objects.filter(event_type='created', member__isnull=True).count(), 1)
+
+    def test_import_members_checks_emails_with_one_query_per_chunk(self):
+        """Tests that e-mail uniqueness is checked once per chunk instead of once per row."""
+        from members.importers import import_members
+
+        rows = [
+            (line, {'nome': f'Aluno {line}', 'email': f'aluno{line}@example.com', 'telefone': '85988880000', 'data': localdate().isoformat(), 'valor': '100'})
+            for line in range(2, 42)
+        ]
+
+        # SELECT dos e-mails, SAVEPOINT, 2 INSERTs em lote, INSERT do ActivityLog e RELEASE
+        with self.assertNumQueries(6):
+            report = import_members(rows, chunk_size=100)
+
+        self.assertEqual(report.created, 40)
+
+    def test_import_members_enqueues_billing_for_overdue_members(self):
+        """Tests that members imported already overdue get a billing message, like members created in the panel."""
+        from members.importers import import_members
+
+        rows = [
+            (2, {'nome': 'Aluno Em Dia', 'email': 'emdia@example.com', 'telefone': '85988881111', 'data': localdate().isoformat(), 'valor': '100'}),
+            (3, {'nome': 'Aluno Vencido', 'email': 'vencido@example.com', 'telefone': '85988882222', 'data': (localdate() - timedelta(days=40)).isoformat(), 'valor': '100'}),
+        ]
+
+        import_members(rows)
+
+        message = BillingMessage.objects.get()
+        self.assertEqual(message.member.email, 'vencido@example.com')
+        self.assertEqual(message.kind, BillingMessage.KIND_OVERDUE)
+        self.assertEqual(message.status, BillingMessage.STATUS_PENDING)
+
+    def test_import_members_command(self):
+        """Tests the import_members management command."""
+        with tempfile.NamedTemporaryFile(suffix='.csv', delete=False) as file:
+            file.write(self.make_csv_content())
+        self.addCleanup(os.remove, file.name)
+
+        stdout, stderr = StringIO(), StringIO()
+        call_command('import_members', file.name, stdout=stdout, stderr=stderr)
+
+        self.assertIn('2 aluno(s) importado(s) de 5 linha(s), 3 com erro.', stdout.getvalue())
+        self.assertIn('Linha 5: E-mail repetido na planilha.', stderr.getvalue())
+
+    def test_import_members_command_rejects_corrupted_xlsx(self):
+        """Tests that the command reports a corrupted XLSX as a CommandError."""
+        with tempfile.NamedTemporaryFile(suffix='.xlsx', delete=False) as file:
+            file.write(b'not a zip file')
+        self.addCleanup(os.remove, file.name)
+
+        with self.assertRaisesMessage(CommandError, 'Arquivo XLSX inválido ou corrompido.'):
+            call_command('import_members', file.name, stdout=StringIO())
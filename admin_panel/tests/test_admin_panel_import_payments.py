@@ -0,0 +1,141 @@
+from decimal import Decimal
+from datetime import timedelta
+from io import BytesIO
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.urls import reverse
+from django.utils.timezone import localdate
+from openpyxl import Workbook
+from admin_panel.models import ActivityLog
+from members.models import Member, Payment
+from .base.test_base import TestBase
+
+
+class ImportPaymentsTests(TestBase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+
+        cls.member = Member.objects.create(
+            full_name='Test Member',
+            email='test@example.com',
+            phone='85988887777',
+            is_active=False,
+        )
+        cls.other_member = Member.objects.create(
+            full_name='Other Member',
+            email='other@example.com',
+            phone='85966665555',
+            is_active=False,
+        )
+        cls.import_payments_view_url = reverse('admin_panel:import_payments_view')
+        cls.import_payments_url = reverse('admin_panel:import_payments')
+
+    def make_csv(self, lines):
+        content = '\n'.join(['email,telefone,data,valor'] + lines)
+        return SimpleUploadedFile('payments.csv', content.encode('utf-8'), content_type='text/csv')
+
+    def test_import_payments_view_redirect_if_not_logged_in(self):
+        """Tests redirection to login page for unauthenticated users."""
+        response = self.client.get(self.import_payments_view_url)
+        self.assertRedirects(response, f"{reverse('users:login_view')}?next={self.import_payments_view_url}")
+
+    def test_import_payments_view_template_used(self):
+        """Tests if the correct template is used for import_payments_view."""
+        self.client.login(cpf=self.user.cpf, password=self.password)
+        response = self.client.get(self.import_payments_view_url)
+        self.assertTemplateUsed(response, 'admin_panel/pages/import_spreadsheet.html')
+        self.assertContains(response, 'name="file"')
+
+    def test_import_payments_get_redirects(self):
+        """Tests that a GET on the upload endpoint redirects to the import page."""
+        self.client.login(cpf=self.user.cpf, password=self.password)
+        response = self.client.get(self.import_payments_url)
+        self.assertRedirects(response, self.import_payments_view_url)
+
+    def test_import_payments_rejects_unsupported_file(self):
+        """Tests that files other than CSV or XLSX are rejected."""
+        self.client.login(cpf=self.user.cpf, password=self.password)
+        file = SimpleUploadedFile('payments.txt', b'anything')
+        response = self.client.post(self.import_payments_url, {'file': file})
+        self.assertContains(response, 'Formato de arquivo não suportado.')
+        self.assertEqual(Payment.objects.count(), 0)
+
+    def test_import_payments_csv(self):
+        """Tests that a CSV file creates payments matched by e-mail or phone and reports bad rows."""
+        self.client.login(cpf=self.user.cpf, password=self.password)
+        today = localdate()
+        file = self.make_csv([
+            f'test@example.com,,{today.isoformat()},100.00',
+            f',(85) 96666-5555,{(today - timedelta(days=3)).strftime("%d/%m/%Y")},80',
+            f'missing@example.com,,{today.isoformat()},100.00',
+            ',,2024-01-01,100.00',
+            f'test@example.com,,{(today + timedelta(days=1)).isoformat()},100.00',
+        ])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(self.import_payments_url, {'file': file})
+
+        report = response.context['report']
+        self.assertEqual(report.total_rows, 5)
+        self.assertEqual(report.created, 2)
+        self.assertEqual([error['line'] for error in report.errors], [4, 5, 6])
+        self.assertContains(response, 'Linha 4: Aluno não encontrado.')
+
+        self.member.refresh_from_db()
+        self.other_member.refresh_from_db()
+        self.assertEqual(self.member.last_payment_date, today)
+        self.assertEqual(self.other_member.last_payment_date, today - timedelta(days=3))
+        self.assertTrue(self.member.is_active)
+        self.assertTrue(self.other_member.is_active)
+        self.assertEqual(ActivityLog.objects.filter(description__startswith='Importação de pagamentos').count(), 1)
+
+    def test_import_payments_xlsx(self):
+        """Tests that an XLSX file is imported."""
+        self.client.login(cpf=self.user.cpf, password=self.password)
+        workbook = Workbook()
+        sheet = workbook.active
+        sheet.append(['E-mail', 'Data', 'Valor'])
+        sheet.append(['test@example.com', localdate(), 120])
+        content = BytesIO()
+        workbook.save(content)
+        file = SimpleUploadedFile('payments.xlsx', content.getvalue())
+
+        response = self.client.post(self.import_payments_url, {'file': file})
+
+        self.assertEqual(response.context['report'].created, 1)
+        self.assertEqual(Payment.objects.get(member=self.member).amount, 120)
+
+    def test_import_payments_cp1252_csv_with_comma_decimals(self):
+        """Tests that a CSV exported by Excel in pt-BR (cp1252, ';' and '100,50') is imported."""
+        self.client.login(cpf=self.user.cpf, password=self.password)
+        content = f'e-mail;data;valor;observação\ntest@example.com;{localdate().isoformat()};"100,50";ação\n'
+        file = SimpleUploadedFile('payments.csv', content.encode('cp1252'), content_type='text/csv')
+
+        response = self.client.post(self.import_payments_url, {'file': file})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['report'].created, 1)
+        self.assertEqual(Payment.objects.get(member=self.member).amount, Decimal('100.50'))
+
+    def test_import_payments_rejects_corrupted_xlsx(self):
+        """Tests that a corrupted or renamed XLSX is shown as a form error instead of a server error."""
+        self.client.login(cpf=self.user.cpf, password=self.password)
+        file = SimpleUploadedFile('payments.xlsx', b'email,data,valor\n')
+
+        response = self.client.post(self.import_payments_url, {'file': file})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Arquivo XLSX inválido ou corrompido.')
+        self.assertEqual(Payment.objects.count(), 0)
+
+    def test_import_payments_uses_one_member_lookup_per_chunk(self):
+        """Tests that the members of a chunk are found with a single query."""
+        from members.importers import import_payments
+
+        rows = [(line, {'email': 'test@example.com', 'data': localdate().isoformat(), 'valor': '100'}) for line in range(2, 52)]
+
+        # SELECT dos alunos, SAVEPOINT, INSERT, UPDATE, INSERT do ActivityLog e RELEASE
+        with self.assertNumQueries(6):
+            report = import_payments(rows, chunk_size=100)
+
+        self.assertEqual(report.created, 50)
@@ -0,0 +1,67 @@
+from django.urls import reverse
+from admin_panel.models import Member
+from members.models import BillingMessage, MessageAttempt
+from .base.test_base import TestBase
+
+
+class MessagingViewTest(TestBase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+
+        cls.member = Member.objects.create(email='member@example.com', full_name='John Doe', phone='85988880000')
+        cls.blocked_member = Member.objects.create(
+            email='blocked@example.com', full_name='Jane Roe', phone='85988880001', phone_failures=5
+        )
+
+        MessageAttempt.objects.bulk_create([
+            MessageAttempt(recipient='5585988880000', ok=True, status_code=200, latency_ms=80),
+            MessageAttempt(recipient='5585988880000', ok=True, status_code=200, latency_ms=300, requests=2),
+            MessageAttempt(recipient='5585988880001', ok=False, status_code=200, latency_ms=120, error_class='HTTP200'),
+        ])
+
+        cls.messaging_url = reverse('admin_panel:messaging')
+
+    def test_messaging_view_requires_authentication(self):
+        response = self.client.get(self.messaging_url)
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(response.url.startswith(reverse('users:login_view')))
+
+    def test_messaging_view_renders_channel_stats(self):
+        self.client.login(cpf=self.user.cpf, password=self.password)
+        response = self.client.get(self.messaging_url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTemplateUsed(response, 'admin_panel/pages/messaging.html')
+
+        stats = response.context['channel_stats'][0]
+        self.assertEqual(stats['channel'], 'whatsapp')
+        self.assertEqual(stats['total'], 3)
+        self.assertEqual(stats['success_rate'], 66.7)
+        self.assertEqual(stats['retried'], 1)
+        self.assertIsNotNone(response.context['graph_html'])
+
+    def test_messaging_view_shows_queue_depth(self):
+        BillingMessage.objects.create(member=self.member)
+        self.client.login(cpf=self.user.cpf, password=self.password)
+        response = self.client.get(self.messaging_url)
+
+        self.assertEqual(response.context['queue']['depth'], 1)
+        self.assertContains(response, 'Mensagens na Fila')
+
+    def test_messaging_view_lists_blocked_phones(self):
+        self.client.login(cpf=self.user.cpf, password=self.password)
+        response = self.client.get(self.messaging_url)
+
+        self.assertEqual(list(response.context['blocked_members']), [self.blocked_member])
+        self.assertContains(response, 'Jane Roe')
+
+    def test_messaging_view_without_attempts(self):
+        MessageAttempt.objects.all().delete()
+        self.client.login(cpf=self.user.cpf, password=self.password)
+        response = self.client.get(self.messaging_url, {'days': 'x'})
+
+        self.assertEqual(response.context['days'], 7)
+        self.assertEqual(response.context['channel_stats'], [])
+        self.assertContains(response, 'Nenhuma tentativa de envio no período')
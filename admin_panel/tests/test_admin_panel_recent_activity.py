@@ -0,0 +1,143 @@
+from datetime import timedelta
+from unittest.mock import patch
+from django.db import transaction
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils.timezone import localdate
+from admin_panel.activity import buffered_activity_logs, log_activity, save_activity_logs
+from admin_panel.models import ActivityLog
+from admin_panel.recent_activity import get_recent_activities, get_recent_activity_buffer
+from members.importers import import_members
+from members.models import Member
+from utils.ring_buffer import reset_ring_buffers
+from .base.test_base import TestBase
+
+
+@override_settings(RECENT_ACTIVITY_RING_BUFFER=True, RING_BUFFER_BACKEND='memory', RECENT_ACTIVITY_SIZE=3)
+class RecentActivityTests(TestCase):
+
+    def setUp(self):
+        reset_ring_buffers()
+        self.addCleanup(reset_ring_buffers)
+        patcher = patch('admin_panel.recent_activity._unavailable', False)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def descriptions(self, activities):
+        return [activity['description'] for activity in activities]
+
+    def test_logged_activities_are_pushed_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            for i in range(4):
+                log_activity('created', f'Atividade {i}')
+
+        self.assertEqual(self.descriptions(get_recent_activity_buffer().items()), ['Atividade 3', 'Atividade 2', 'Atividade 1'])
+
+        with self.assertNumQueries(0):
+            activities = get_recent_activities()
+
+        self.assertEqual(self.descriptions(activities), ['Atividade 3', 'Atividade 2', 'Atividade 1'])
+        self.assertEqual(set(activities[0]), {'id', 'event_type', 'description', 'created_at'})
+
+    @override_settings(ACTIVITY_LOG_SYNC=False)
+    def test_buffered_activities_are_pushed_on_flush(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with buffered_activity_logs():
+                log_activity('created', 'Atividade A')
+                log_activity('payment', 'Atividade B')
+
+                self.assertEqual(len(get_recent_activity_buffer()), 0)
+
+        self.assertEqual(self.descriptions(get_recent_activities()), ['Atividade B', 'Atividade A'])
+
+    def test_rolled_back_activities_are_not_pushed(self):
+        with self.captureOnCommitCallbacks(execute=False):
+            log_activity('created', 'Desfeita')
+
+        self.assertEqual(len(get_recent_activity_buffer()), 0)
+
+    def test_logs_saved_in_bulk_are_pushed_after_commit(self):
+        """Tests that the nightly bulk status update also feeds the recent activities."""
+        paid_until = localdate() - timedelta(days=2)
+        Member.objects.create(email='vencido@teste.com', full_name='Aluno Vencido', is_active=True, paid_until=paid_until)
+        reset_ring_buffers()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Member.bulk_update_activity_status()
+            self.assertEqual(len(get_recent_activity_buffer()), 0)
+
+        self.assertEqual(
+            self.descriptions(get_recent_activities()), ['Pagamento vencido: aluno marcado como pendente.']
+        )
+
+    def test_imports_are_pushed(self):
+        rows = [(2, {'nome': 'Aluno Importado', 'email': 'importado@teste.com', 'telefone': '85988881111', 'data': localdate().isoformat(), 'valor': '100'})]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            import_members(rows)
+
+        self.assertEqual(self.descriptions(get_recent_activities()), ['Importação de alunos: 1 aluno(s) cadastrado(s).'])
+
+    def test_logs_saved_in_a_rolled_back_transaction_are_not_pushed(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    save_activity_logs([ActivityLog(event_type='created', description='Desfeita')])
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+
+        self.assertEqual(len(get_recent_activity_buffer()), 0)
+
+    def test_cold_buffer_falls_back_to_database_and_is_filled(self):
+        ActivityLog.objects.bulk_create([ActivityLog(event_type='created', description=f'Banco {i}') for i in range(4)])
+
+        with self.assertNumQueries(1):
+            activities = get_recent_activities()
+
+        self.assertEqual(self.descriptions(activities), ['Banco 3', 'Banco 2', 'Banco 1'])
+        self.assertEqual(get_recent_activity_buffer().items(), activities)
+
+        with self.assertNumQueries(0):
+            get_recent_activities()
+
+    def test_unavailable_buffer_falls_back_to_database(self):
+        ActivityLog.objects.create(event_type='created', description='Banco')
+
+        with patch('admin_panel.recent_activity.get_ring_buffer', side_effect=ConnectionError('redis fora do ar')):
+            with self.assertLogs('admin_panel.recent_activity', 'WARNING') as logs:
+                activities = get_recent_activities()
+                get_recent_activities()
+                with self.captureOnCommitCallbacks(execute=True):
+                    log_activity('created', 'Sem Redis')
+
+        self.assertEqual(self.descriptions(activities), ['Banco'])
+        # Um único aviso, sem traceback, para toda a indisponibilidade
+        self.assertEqual(len(logs.records), 1)
+        self.assertIsNone(logs.records[0].exc_info)
+
+    def test_fallback_is_logged_again_after_the_buffer_recovers(self):
+        with patch('admin_panel.recent_activity.get_ring_buffer', side_effect=ConnectionError('redis fora do ar')):
+            with self.assertLogs('admin_panel.recent_activity', 'WARNING'):
+                get_recent_activities()
+
+        with self.assertLogs('admin_panel.recent_activity', 'INFO') as logs:
+            get_recent_activities()
+
+        self.assertIn('disponível novamente', logs.output[0])
+
+
+@override_settings(RECENT_ACTIVITY_RING_BUFFER=True, RING_BUFFER_BACKEND='memory')
+class HomeRecentActivitiesTest(TestBase):
+
+    def setUp(self):
+        reset_ring_buffers()
+        self.addCleanup(reset_ring_buffers)
+
+    def test_home_renders_recent_activities_from_buffer(self):
+        get_recent_activity_buffer().push({'id': 1, 'event_type': 'created', 'description': 'Vinda do Redis', 'created_at': '01/02/24 10:00'})
+        self.client.login(cpf=self.user.cpf, password=self.password)
+
+        response = self.client.get(reverse('admin_panel:home'))
+
+        self.assertContains(response, 'Vinda do Redis | 01/02/24 10:00')
@@ -11,6 +11,9 @@ urlpatterns = [
     path('members/add-payment-view/<int:id>/', views.add_payment_view, name='add_payment_view'),
     
     path('finance/', views.finance, name='finance'),
+    path('messaging/', views.messaging, name='messaging'),
+    path('activities/', views.activity_feed, name='activity_feed'),
+    path('activities/json/', views.activity_feed_json, name='activity_feed_json'),
     
     path('generate-general-report/', views.generate_pdf_general_report, name='generate_pdf_general_report'),
     path('generate-current-day-report/', views.generate_pdf_report_of_current_day, name='generate_pdf_report_of_current_day'),
@@ -18,5 +21,10 @@ urlpatterns = [
     path('members/add/', views.add_member, name='add_member'),
     path('members/delete/<int:id>/', views.delete_member, name='delete_member'),
     path('members/edit/<int:id>/update/', views.edit_member, name='edit_member'),
-    path('members/add-payment/<int:id>/', views.add_payment, name='add_payment')
+    path('members/add-payment/<int:id>/', views.add_payment, name='add_payment'),
+    
+    path('members/import-payments/', views.import_payments_view, name='import_payments_view'),
+    path('members/import-payments/upload/', views.import_payments, name='import_payments'),
+    path('members/import/', views.import_members_view, name='import_members_view'),
+    path('members/import/upload/', views.import_members, name='import_members'),
 ]
\ No newline at end of file
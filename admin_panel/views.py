@@ -2,10 +2,14 @@ from django.shortcuts import render, redirect
 from django.contrib.auth.decorators import login_required
 from members.forms import MemberPaymentForm, PaymentForm, MemberEditForm
 from .models import ActivityLog
-from members.models import Member, Payment
+from .recent_activity import get_recent_activities
+from members.models import Member, Payment, BillingMessage, MessageAttempt
+from members.billing import LAST_DRAIN_CACHE_KEY
+from django.core.cache import cache
 from django.shortcuts import get_object_or_404
-from django.utils.timezone import localdate, localtime
-from django.db.models import Q, Max
+from django.utils.timezone import localdate, localtime, now as timezone_now
+from datetime import timedelta
+from django.db.models import Q
 from django.utils.dateparse import parse_date
 from utils.utils import make_pagination
 from django.contrib import messages
@@ -19,7 +23,7 @@ def home(request):
     
     count_new_members_in_month = Member.objects.filter( created_at__month=current_month, created_at__year=current_year).count()
     profit_total_month = Payment.get_current_month_profit()
-    recent_activities = ActivityLog.objects.all().order_by('-id').select_related('member')[:20]
+    recent_activities = get_recent_activities()
     
     context = {
         'count_members_actives': Member.objects.filter(is_active=True).count(),
@@ -46,15 +50,10 @@ def members(request):
     elif status == 'inactive':
         filters['is_active'] = False
     
-    members = Member.objects.filter(**filters).order_by('-id')
-    
     if date:
-        date = parse_date(date)
-        
-        members = members.annotate(
-            last_payment=Max('payments__payment_date')
-        ).filter(last_payment=date)
-        
+        filters['last_payment_date'] = parse_date(date)
+    
+    members = Member.objects.filter(**filters).order_by('-id')
 
         
     # Dealing with form 
@@ -150,6 +149,9 @@ def edit_member(request, id):
             is_active = form.cleaned_data['is_active'] 
             
             member.email = email
+            if phone != member.phone:
+                # Um telefone novo volta a receber cobranças
+                member.phone_failures = 0
             member.phone = phone
             member.full_name = full_name
             member.is_active = is_active
@@ -186,6 +188,88 @@ def add_payment(request, id):
         return redirect('admin_panel:add_payment_view', id=id)
 
 
+from members.forms import SpreadsheetImportForm
+from members.importers import import_members as import_members_from_rows
+from members.importers import import_payments as import_payments_from_rows
+from utils.spreadsheets import SpreadsheetError, iter_spreadsheet_rows
+from django.urls import reverse
+
+# Configuração das páginas de importação de planilhas
+SPREADSHEET_IMPORTS = {
+    'payments': {
+        'title': 'Importar Pagamentos',
+        'columns_help': 'email ou telefone, data e valor',
+        'page': 'admin_panel:import_payments_view',
+        'form_action': 'admin_panel:import_payments',
+        'importer': import_payments_from_rows,
+        'success_message': '{created} pagamento(s) importado(s) com sucesso!',
+        'warning_message': '{created} pagamento(s) importado(s), {errors} linha(s) com erro.',
+    },
+    'members': {
+        'title': 'Importar Alunos',
+        'columns_help': 'nome, email, telefone, data e valor do primeiro pagamento',
+        'page': 'admin_panel:import_members_view',
+        'form_action': 'admin_panel:import_members',
+        'importer': import_members_from_rows,
+        'success_message': '{created} aluno(s) importado(s) com sucesso!',
+        'warning_message': '{created} aluno(s) importado(s), {errors} linha(s) com erro.',
+    },
+}
+
+def render_spreadsheet_import(request, kind, form, report=None):
+    config = SPREADSHEET_IMPORTS[kind]
+    context = {
+        'form': form,
+        'report': report,
+        'title': config['title'],
+        'columns_help': config['columns_help'],
+        'form_action': reverse(config['form_action']),
+    }
+    return render(request, 'admin_panel/pages/import_spreadsheet.html', context)
+
+def handle_spreadsheet_import(request, kind):
+    if request.method != 'POST':
+        return redirect(SPREADSHEET_IMPORTS[kind]['page'])
+
+    config = SPREADSHEET_IMPORTS[kind]
+    form = SpreadsheetImportForm(request.POST, request.FILES)
+
+    if not form.is_valid():
+        messages.error(request, 'Erro ao importar o arquivo. Verifique o arquivo e tente novamente.')
+        return render_spreadsheet_import(request, kind, form)
+
+    # O relatório é exibido diretamente, sem passar pela sessão, porque pode ter milhares de linhas
+    try:
+        report = config['importer'](iter_spreadsheet_rows(form.cleaned_data['file']))
+    except SpreadsheetError as error:
+        form.add_error('file', str(error))
+        messages.error(request, 'Erro ao importar o arquivo. Verifique o arquivo e tente novamente.')
+        return render_spreadsheet_import(request, kind, form)
+
+    if report.has_errors:
+        messages.warning(request, config['warning_message'].format(created=report.created, errors=len(report.errors)))
+    else:
+        messages.success(request, config['success_message'].format(created=report.created))
+
+    return render_spreadsheet_import(request, kind, SpreadsheetImportForm(), report)
+
+@login_required
+def import_payments_view(request):
+    return render_spreadsheet_import(request, 'payments', SpreadsheetImportForm())
+
+@login_required
+def import_payments(request):
+    return handle_spreadsheet_import(request, 'payments')
+
+@login_required
+def import_members_view(request):
+    return render_spreadsheet_import(request, 'members', SpreadsheetImportForm())
+
+@login_required
+def import_members(request):
+    return handle_spreadsheet_import(request, 'members')
+
+
 import plotly.express as px
 import pandas as pd
 
@@ -233,6 +317,126 @@ def finance(request):
     return render(request, 'admin_panel/pages/finance.html', context)
 
 
+@login_required
+def messaging(request):
+    try:
+        days = max(1, int(request.GET.get('days', 7)))
+    except ValueError:
+        days = 7
+
+    channel_stats = MessageAttempt.get_channel_stats(since=timezone_now() - timedelta(days=days))
+
+    graph_html = None
+    if channel_stats:
+        df = pd.DataFrame([
+            {'Channel': stats['channel'], 'Latency': label, 'Attempts': count}
+            for stats in channel_stats
+            for label, count in stats['histogram']
+        ])
+        fig = px.bar(
+            df, x='Latency', y='Attempts', color='Channel', barmode='group', title='Latência dos envios',
+            labels={'Latency': 'Latência', 'Attempts': 'Tentativas', 'Channel': 'Canal'}
+        )
+        graph_html = fig.to_html(full_html=False)
+
+    context = {
+        'days': days,
+        'channel_stats': channel_stats,
+        'graph_html': graph_html,
+        'blocked_members': Member.get_blocked_phones(),
+        'queue': BillingMessage.get_queue_metrics(),
+        'last_drain': cache.get(LAST_DRAIN_CACHE_KEY),
+    }
+
+    return render(request, 'admin_panel/pages/messaging.html', context)
+
+
+from django.conf import settings
+from django.http import JsonResponse
+from django.views.decorators.http import require_GET
+
+
+def parse_date_or_none(value):
+    try:
+        return parse_date(value)
+    except ValueError:
+        # Formato certo mas data inexistente (ex.: 2024-02-30)
+        return None
+
+
+def get_activity_feed_filters(request):
+    """Filtros do feed de atividades a partir da query string. Valores inválidos são ignorados."""
+    event_type = request.GET.get('event_type', '')
+    member = request.GET.get('member', '')
+
+    return {
+        'event_type': event_type if event_type in dict(ActivityLog.EVENT_TYPES) else None,
+        'member_id': int(member) if member.isdigit() else None,
+        'since': parse_date_or_none(request.GET.get('since', '')),
+        'until': parse_date_or_none(request.GET.get('until', '')),
+    }
+
+
+@login_required
+def activity_feed(request):
+    filters = get_activity_feed_filters(request)
+
+    try:
+        activities, next_cursor = ActivityLog.get_feed(
+            cursor=request.GET.get('cursor'), limit=settings.ACTIVITY_FEED_PAGE_SIZE, **filters
+        )
+    except ValueError:
+        # Cursor inválido (ex.: link editado à mão): volta para a primeira página
+        activities, next_cursor = ActivityLog.get_feed(limit=settings.ACTIVITY_FEED_PAGE_SIZE, **filters)
+
+    # Query string dos filtros, para os links de próxima página manterem a busca
+    query = request.GET.copy()
+    query.pop('cursor', None)
+
+    context = {
+        'activities': activities,
+        'next_cursor': next_cursor,
+        'filters': filters,
+        'filter_query': query.urlencode(),
+        'event_types': ActivityLog.EVENT_TYPES,
+        'member': Member.objects.filter(id=filters['member_id']).first() if filters['member_id'] else None,
+    }
+
+    return render(request, 'admin_panel/pages/activity_feed.html', context)
+
+
+@login_required
+@require_GET
+def activity_feed_json(request):
+    try:
+        limit = min(max(1, int(request.GET.get('limit', settings.ACTIVITY_FEED_PAGE_SIZE))), settings.ACTIVITY_FEED_MAX_PAGE_SIZE)
+    except ValueError:
+        limit = settings.ACTIVITY_FEED_PAGE_SIZE
+
+    try:
+        activities, next_cursor = ActivityLog.get_feed(
+            cursor=request.GET.get('cursor'), limit=limit, **get_activity_feed_filters(request)
+        )
+    except ValueError as error:
+        return JsonResponse({'error': str(error)}, status=400)
+
+    return JsonResponse({
+        'results': [
+            {
+                'id': activity.id,
+                'event_type': activity.event_type,
+                'description': activity.description,
+                'member_id': activity.member_id,
+                'member_name': activity.member.full_name if activity.member else None,
+                'changes': activity.changes,
+                'created_at': localtime(activity.created_at).isoformat(),
+            }
+            for activity in activities
+        ],
+        'next_cursor': next_cursor,
+    }, json_dumps_params={'ensure_ascii': False})
+
+
 from django.db.models import Sum
 from django.template.loader import render_to_string
 from xhtml2pdf import pisa
@@ -1,7 +1,9 @@
 from django.contrib import admin
-from .models import Member, Payment, BillingMessage
+from .models import Member, Payment, BillingMessage, MessageAttempt, ProcessingWatermark
 # Register your models here.
 
 admin.site.register(Payment)
 admin.site.register(Member)
-admin.site.register(BillingMessage)
\ No newline at end of file
+admin.site.register(BillingMessage)
+admin.site.register(ProcessingWatermark)
+admin.site.register(MessageAttempt)
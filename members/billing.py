@@ -0,0 +1,309 @@
+import logging
+import os
+import socket
+import time
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.timezone import localtime, now as timezone_now
+from utils.spreadsheets import chunked
+from utils.messaging import get_messaging_backend
+from utils.notifications import get_channel
+from utils.rate_limit import RateLimitExceeded
+from utils.ultramsg import SendResult
+from .models import BillingMessage, Member, MessageAttempt
+
+logger = logging.getLogger(__name__)
+
+# Resumo da última execução de send_billing_messages, guardado no cache
+LAST_DRAIN_CACHE_KEY = 'billing:last_drain'
+# Fila dos eventos de entrega recebidos pelo webhook do UltraMsg (ver members.tasks.apply_delivery_events)
+DELIVERY_EVENTS_QUEUE = 'ultramsg_delivery_events'
+
+
+def parse_send_windows(windows=None):
+    """
+    Converte BILLING_SEND_WINDOWS (ex.: ['08:00-12:00', '22:00-02:00']) em pares (início, fim).
+
+    Uma janela com fim antes do início atravessa a meia-noite. Janelas vazias
+    (início igual ao fim) levantam ImproperlyConfigured.
+    """
+    windows = settings.BILLING_SEND_WINDOWS if windows is None else windows
+    parsed = []
+
+    for window in windows:
+        start, end = (datetime.strptime(value.strip(), '%H:%M').time() for value in window.split('-'))
+        if start == end:
+            raise ImproperlyConfigured(f'Janela de envio vazia em BILLING_SEND_WINDOWS: {window}')
+        parsed.append((start, end))
+
+    return parsed
+
+
+def get_send_window_end(moment=None, windows=None):
+    """
+    Retorna quando termina a janela de envio aberta em moment (horário local) ou None se estiver fora.
+
+    Sem janelas configuradas o envio é liberado a qualquer hora e a janela termina no fim do dia.
+    """
+    moment = localtime(moment)
+    parsed = parse_send_windows(windows)
+
+    if not parsed:
+        return moment.replace(hour=23, minute=59, second=59, microsecond=0)
+
+    for start, end in parsed:
+        end_at = moment.replace(hour=end.hour, minute=end.minute, second=0, microsecond=0)
+
+        if start < end and start <= moment.time() < end:
+            return end_at
+        # Janela que atravessa a meia-noite (ex.: 22:00-02:00)
+        if start > end and moment.time() >= start:
+            return end_at + timedelta(days=1)
+        if start > end and moment.time() < end:
+            return end_at
+
+    return None
+
+
+def get_next_send_window_start(moment=None, windows=None):
+    """Início da próxima janela de envio a partir de moment (horário local)."""
+    moment = localtime(moment)
+    starts = sorted(start for start, _ in parse_send_windows(windows))
+
+    for start in starts:
+        if start > moment.time():
+            return moment.replace(hour=start.hour, minute=start.minute, second=0, microsecond=0)
+
+    if not starts:
+        return moment
+
+    tomorrow = moment + timedelta(days=1)
+    return tomorrow.replace(hour=starts[0].hour, minute=starts[0].minute, second=0, microsecond=0)
+
+
+def make_worker_id():
+    """Identificador do worker gravado em locked_by das mensagens reservadas."""
+    return f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+
+
+def _deliver(message, backend, channel=None):
+    """Envia a mensagem pelo WhatsApp ou pelo channel informado, sem acessar o banco."""
+    if channel is None:
+        recipient = message.member.phone
+    else:
+        notification = message.notification
+        recipient = channel.address(notification)
+
+    try:
+        result = message.deliver(backend) if channel is None else channel.send(notification, backend)
+    except Exception as error:  # Uma falha inesperada não pode derrubar o lote inteiro
+        result = SendResult(ok=False, error=repr(error), error_class=type(error).__name__)
+
+    return _result(message, recipient, result)
+
+
+def _result(message, recipient, result):
+    """Resultado do envio no formato usado por record_results."""
+    return {
+        'id': message.id,
+        'member': message.member.full_name,
+        'member_id': message.member_id,
+        'recipient': recipient,
+        'sent': result.ok,
+        'error': result.error,
+        'retry_after': result.retry_after,
+        'provider_id': result.message_id,
+        'result': result,
+    }
+
+
+def record_results(results, worker_id, channel=MessageAttempt.CHANNEL_WHATSAPP):
+    """
+    Grava o resultado de um lote: um UPDATE para as enviadas e o backoff das que falharam.
+
+    Cada tentativa feita vira um MessageAttempt (um único INSERT por lote) e, no WhatsApp,
+    os números recusados pelo provedor somam falhas no membro (ver Member.register_phone_results).
+    Mensagens adiadas (rate limit ou circuito aberto) voltam para a fila sem contar como tentativa.
+    """
+    sent_ids = {result['id']: result['provider_id'] for result in results if result['sent']}
+    deferred = [result for result in results if not result['sent'] and result['retry_after'] is not None]
+    failures = {
+        result['id']: result['error'] for result in results if not result['sent'] and result['retry_after'] is None
+    }
+
+    if sent_ids:
+        BillingMessage.mark_sent(sent_ids, worker_id)
+    if failures:
+        BillingMessage.mark_failed(failures, worker_id)
+    if deferred:
+        BillingMessage.release(
+            [result['id'] for result in deferred], worker_id, max(result['retry_after'] for result in deferred)
+        )
+
+    attempts = [
+        MessageAttempt.from_result(
+            result['result'], recipient=result['recipient'], channel=channel,
+            billing_message_id=result['id'], member_id=result['member_id']
+        )
+        for result in results if not result['result'].deferred
+    ]
+    if attempts:
+        MessageAttempt.objects.bulk_create(attempts)
+
+    if channel == MessageAttempt.CHANNEL_WHATSAPP:
+        Member.register_phone_results(
+            delivered_ids=[result['member_id'] for result in results if result['sent']],
+            rejected_ids=[result['member_id'] for result in results if result['result'].rejected],
+        )
+
+    for result in results:
+        if not result['sent']:
+            logger.warning('Erro ao enviar mensagem para %s: %s', result['member'], result['error'])
+
+    return len(sent_ids), len(results) - len(sent_ids)
+
+
+def send_billing_messages_concurrently(messages, worker_id, max_workers=8, batch_size=50, rate_limiter=None):
+    """
+    Envia as mensagens de cobrança reservadas pelo worker, com no máximo max_workers envios simultâneos.
+
+    Somente as chamadas HTTP rodam nas threads; o banco é acessado apenas na thread
+    principal, gravando o resultado de cada lote com record_results. Com rate_limiter
+    cada envio espera um token, limitando a vazão total da drenagem; a espera não passa
+    do fim do lease da mensagem, que nesse caso volta para a fila sem ser enviada
+    (outro worker poderia reservá-la de novo e enviá-la em duplicidade).
+    As mensagens devem vir com select_related('member').
+    Retorna a quantidade de enviadas, de falhas e o resultado de cada mensagem.
+    """
+    backend = get_messaging_backend()
+    summary = {'sent': 0, 'failed': 0, 'results': []}
+
+    def deliver(message):
+        if rate_limiter is not None:
+            lease_left = (message.locked_until - timezone_now()).total_seconds() if message.locked_until else None
+
+            try:
+                rate_limiter.acquire(timeout=lease_left)
+            except RateLimitExceeded as error:
+                return _result(message, message.member.phone, SendResult(
+                    ok=False, error=str(error), error_class=type(error).__name__, retry_after=error.retry_after
+                ))
+
+        return _deliver(message, backend)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for batch in chunked(messages, batch_size):
+            results = list(executor.map(deliver, batch))
+            sent, failed = record_results(results, worker_id)
+
+            summary['sent'] += sent
+            summary['failed'] += failed
+            summary['results'].extend(results)
+
+    return summary
+
+
+def hand_off_to_fallback(messages, worker_id):
+    """
+    Separa as mensagens que vão pelo WhatsApp e repassa as demais para a fila do canal de fallback.
+
+    As repassadas continuam reservadas pelo worker e são enviadas pela tarefa
+    send_billing_notifications na fila do canal, que grava o resultado. Se essa fila
+    demorar mais que o lease, a mensagem volta a ser reservada por outro worker.
+    Retorna as mensagens do WhatsApp e quantas foram repassadas.
+    """
+    # Importado aqui porque members.tasks importa este módulo
+    from .tasks import send_billing_notifications
+
+    whatsapp, fallback, unreachable = [], defaultdict(list), {}
+
+    for message in messages:
+        channel = message.channel
+
+        if channel == MessageAttempt.CHANNEL_WHATSAPP:
+            whatsapp.append(message)
+        elif channel is None:
+            unreachable[message.id] = 'Membro sem telefone ou e-mail válido.'
+        else:
+            fallback[channel].append(message.id)
+
+    if unreachable:
+        BillingMessage.mark_failed(unreachable, worker_id)
+
+    for channel, ids in fallback.items():
+        send_billing_notifications.apply_async(args=[ids, worker_id, channel], queue=get_channel(channel).queue)
+
+    return whatsapp, sum(len(ids) for ids in fallback.values())
+
+
+def send_billing_messages_by_channel(message_ids, worker_id, channel):
+    """
+    Envia pelo canal informado as mensagens do outbox ainda reservadas pelo worker.
+
+    Uma única conexão do canal (ex.: SMTP) é usada para o lote todo.
+    """
+    channel = get_channel(channel)
+    messages = BillingMessage.objects.filter(
+        id__in=message_ids, locked_by=worker_id, status=BillingMessage.STATUS_SENDING
+    ).select_related('member')
+
+    with channel.connection() as connection:
+        results = [_deliver(message, connection, channel) for message in messages]
+
+    sent, failed = record_results(results, worker_id, channel=channel.name)
+    return {'channel': channel.name, 'sent': sent, 'failed': failed}
+
+
+def drain_billing_outbox(worker_id=None, max_workers=None, batch_size=None, limit=None, deadline=None, rate_limiter=None):
+    """
+    Esvazia o outbox de mensagens de cobrança reservando lotes com claim_batch.
+
+    Vários workers podem executar ao mesmo tempo: cada um reserva lotes diferentes
+    (SKIP LOCKED) e só grava o resultado das mensagens que reservou. limit encerra
+    a execução depois de reservar essa quantidade de mensagens e deadline para de
+    reservar lotes novos a partir desse horário (ex.: fim da janela de envio).
+    Com rate_limiter cada lote tem no máximo as mensagens que cabem em metade do lease
+    na vazão do limitador, para o lote terminar antes do lease vencer.
+    Mensagens de membros sem telefone válido seguem pelo canal de fallback (ver hand_off_to_fallback).
+    """
+    worker_id = worker_id or make_worker_id()
+    max_workers = max_workers or settings.BILLING_MESSAGES_CONCURRENCY
+    batch_size = batch_size or settings.BILLING_OUTBOX_BATCH_SIZE
+    if rate_limiter is not None:
+        batch_size = min(batch_size, max(1, int(settings.BILLING_OUTBOX_LEASE_SECONDS * rate_limiter.rate / 2)))
+    summary = {
+        'sent': 0,
+        'failed': 0,
+        'handed_off': 0,
+        'cancelled': BillingMessage.cancel_paid() + BillingMessage.cancel_blocked_phones(),
+    }
+    claimed = 0
+    started_at = time.monotonic()
+
+    while limit is None or claimed < limit:
+        if deadline is not None and timezone_now() >= deadline:
+            break
+
+        size = batch_size if limit is None else min(batch_size, limit - claimed)
+        messages = BillingMessage.claim_batch(worker_id, batch_size=size)
+        if not messages:
+            break
+
+        claimed += len(messages)
+        messages, handed_off = hand_off_to_fallback(messages, worker_id)
+        summary['handed_off'] += handed_off
+
+        result = send_billing_messages_concurrently(
+            messages, worker_id, max_workers=max_workers, batch_size=size, rate_limiter=rate_limiter
+        )
+        summary['sent'] += result['sent']
+        summary['failed'] += result['failed']
+
+    elapsed = time.monotonic() - started_at
+    summary['elapsed_seconds'] = round(elapsed, 3)
+    summary['messages_per_second'] = round(claimed / elapsed, 2) if elapsed else 0
+    return summary
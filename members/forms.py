@@ -4,6 +4,7 @@ from .models import Member
 from django.utils.timezone import localdate
 import re
 from django.core.exceptions import ValidationError
+from utils.spreadsheets import SUPPORTED_EXTENSIONS
 
 class MemberPaymentForm(forms.Form):
     email = forms.EmailField(
@@ -77,10 +78,14 @@ class MemberPaymentForm(forms.Form):
         })
     )
     
+    def __init__(self, *args, check_email_unique=True, **kwargs):
+        # A importação em lote desativa a consulta por linha e verifica o lote inteiro de uma vez
+        super().__init__(*args, **kwargs)
+        self.check_email_unique = check_email_unique
 
     def clean_email(self):
         email = self.cleaned_data.get('email')
-        if Member.objects.filter(email=email).exists():
+        if self.check_email_unique and Member.objects.filter(email=email).exists():
             raise forms.ValidationError('Este e-mail já está cadastrado.')
         return email
 
@@ -220,4 +225,26 @@ class PaymentForm(forms.ModelForm):
             payment.save()
             
         
-        return payment
\ No newline at end of file
+        return payment
+
+class SpreadsheetImportForm(forms.Form):
+    file = forms.FileField(
+        label='Arquivo (CSV ou XLSX)',
+        widget=forms.ClearableFileInput(attrs={
+            'id': 'import-file',
+            'class': 'form-control',
+            'accept': '.csv,.xlsx',
+            'required': True
+        }),
+        error_messages={
+            'required': 'Selecione um arquivo para importar.',
+        }
+    )
+
+    def clean_file(self):
+        file = self.cleaned_data.get('file')
+
+        if not file.name.lower().endswith(SUPPORTED_EXTENSIONS):
+            raise forms.ValidationError('Formato de arquivo não suportado. Envie um arquivo CSV ou XLSX.')
+
+        return file
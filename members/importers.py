@@ -0,0 +1,284 @@
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from admin_panel.activity import save_activity_logs
+from admin_panel.models import ActivityLog
+from utils.spreadsheets import chunked
+from django.utils.timezone import localdate
+from .forms import MemberPaymentForm, PaymentForm
+from .models import BillingMessage, Member, Payment
+from .status import deferred_status_recompute, schedule_status_recompute
+
+# Nomes aceitos para cada coluna da planilha (já normalizados por utils.spreadsheets)
+PAYMENT_COLUMNS = {
+    'email': ('email', 'e-mail', 'e_mail'),
+    'phone': ('phone', 'telefone'),
+    'payment_date': ('payment_date', 'data', 'data_pagamento', 'data_de_pagamento'),
+    'amount': ('amount', 'valor'),
+}
+
+MEMBER_COLUMNS = {
+    'full_name': ('full_name', 'nome', 'nome_completo'),
+    **PAYMENT_COLUMNS,
+}
+
+
+class ImportReport:
+    """Resultado de uma importação, com os erros de cada linha rejeitada."""
+
+    def __init__(self):
+        self.total_rows = 0
+        self.created = 0
+        self.errors = []
+
+    def add_error(self, line, message):
+        self.errors.append({'line': line, 'message': message})
+
+    @property
+    def has_errors(self):
+        return bool(self.errors)
+
+
+def get_column(row, columns, field):
+    for name in columns[field]:
+        value = row.get(name)
+        if value not in (None, ''):
+            return value
+    return None
+
+
+def normalize_phone(phone):
+    return str(phone or '').replace('(', '').replace(')', '').replace('-', '').replace(' ', '').strip()
+
+
+def normalize_amount(amount):
+    """Converte valores no formato pt-BR ('1.234,56') para o formato aceito pelo DecimalField."""
+    if isinstance(amount, str) and ',' in amount:
+        return amount.replace('.', '').replace(',', '.').strip()
+    return amount
+
+
+def form_errors_as_text(form):
+    return ' '.join(error for errors in form.errors.values() for error in errors)
+
+
+def update_members_payment_dates(members, payments):
+    """Avança last_payment_date/paid_until dos membros com um único bulk_update."""
+    latest_dates = {}
+    for payment in payments:
+        current = latest_dates.get(payment.member_id)
+        if current is None or payment.payment_date > current:
+            latest_dates[payment.member_id] = payment.payment_date
+
+    changed = []
+    for member in members:
+        payment_date = latest_dates.get(member.id)
+        if payment_date and (member.last_payment_date is None or member.last_payment_date < payment_date):
+            member.last_payment_date = payment_date
+            member.paid_until = Member.calculate_paid_until(payment_date)
+            changed.append(member)
+
+    Member.objects.bulk_update(changed, ['last_payment_date', 'paid_until'], batch_size=1000)
+
+
+def _import_payment_chunk(chunk, report):
+    valid_rows = []
+    emails, phones = set(), set()
+
+    for line, row in chunk:
+        report.total_rows += 1
+
+        email = str(get_column(row, PAYMENT_COLUMNS, 'email') or '').strip()
+        phone = normalize_phone(get_column(row, PAYMENT_COLUMNS, 'phone'))
+
+        if not email and not phone:
+            report.add_error(line, 'Informe o e-mail ou o telefone do aluno.')
+            continue
+
+        form = PaymentForm(data={
+            'payment_date': get_column(row, PAYMENT_COLUMNS, 'payment_date'),
+            'amount': normalize_amount(get_column(row, PAYMENT_COLUMNS, 'amount')),
+        })
+        if not form.is_valid():
+            report.add_error(line, form_errors_as_text(form))
+            continue
+
+        if email:
+            emails.add(email)
+        if phone:
+            phones.add(phone)
+        valid_rows.append((line, email, phone, form.cleaned_data))
+
+    if not valid_rows:
+        return
+
+    # Uma única consulta resolve os alunos de todo o lote
+    members = list(
+        Member.objects.filter(Q(email__in=emails) | Q(phone__in=phones))
+        .only('id', 'email', 'phone', 'full_name', 'last_payment_date', 'paid_until')
+    )
+    members_by_email = {member.email: member for member in members}
+    members_by_phone = {}
+    for member in members:
+        members_by_phone.setdefault(member.phone, []).append(member)
+
+    payments = []
+    touched_members = {}
+
+    for line, email, phone, data in valid_rows:
+        member = members_by_email.get(email)
+
+        if member is None and phone:
+            candidates = members_by_phone.get(phone, [])
+            if len(candidates) > 1:
+                report.add_error(line, 'Mais de um aluno com este telefone. Informe o e-mail.')
+                continue
+            member = candidates[0] if candidates else None
+
+        if member is None:
+            report.add_error(line, 'Aluno não encontrado.')
+            continue
+
+        payments.append(Payment(member=member, payment_date=data['payment_date'], amount=data['amount']))
+        touched_members[member.id] = member
+
+    if not payments:
+        return
+
+    with transaction.atomic():
+        Payment.objects.bulk_create(payments, batch_size=1000)
+        update_members_payment_dates(touched_members.values(), payments)
+        save_activity_logs([ActivityLog(
+            event_type='payment',
+            description=f'Importação de pagamentos: {len(payments)} pagamento(s) registrado(s).'
+        )])
+
+    report.created += len(payments)
+
+    for member_id in touched_members:
+        schedule_status_recompute(member_id)
+
+
+def import_payments(rows, chunk_size=1000):
+    """
+    Importa pagamentos a partir das linhas de uma planilha (ver utils.spreadsheets).
+
+    As linhas são validadas em lotes de chunk_size com as regras do PaymentForm, os alunos
+    são encontrados por e-mail ou telefone com uma consulta por lote e os pagamentos são
+    gravados com bulk_create. O status dos alunos é recalculado uma única vez no final.
+    """
+    report = ImportReport()
+
+    with deferred_status_recompute():
+        for chunk in chunked(rows, chunk_size):
+            _import_payment_chunk(chunk, report)
+
+    report.errors.sort(key=lambda error: error['line'])
+    return report
+
+
+def _import_member_chunk(chunk, report, seen_emails):
+    valid_rows = []
+
+    for line, row in chunk:
+        report.total_rows += 1
+
+        form = MemberPaymentForm(
+            data={
+                'full_name': get_column(row, MEMBER_COLUMNS, 'full_name'),
+                'email': str(get_column(row, MEMBER_COLUMNS, 'email') or '').strip(),
+                'phone': str(get_column(row, MEMBER_COLUMNS, 'phone') or ''),
+                'is_active': False,
+                'payment_date': get_column(row, MEMBER_COLUMNS, 'payment_date'),
+                'amount': normalize_amount(get_column(row, MEMBER_COLUMNS, 'amount')),
+            },
+            check_email_unique=False
+        )
+        if not form.is_valid():
+            report.add_error(line, form_errors_as_text(form))
+            continue
+
+        email = form.cleaned_data['email']
+        if email in seen_emails:
+            report.add_error(line, 'E-mail repetido na planilha.')
+            continue
+
+        seen_emails.add(email)
+        valid_rows.append((line, form.cleaned_data))
+
+    if not valid_rows:
+        return
+
+    # Uma única consulta IN verifica a unicidade dos e-mails de todo o lote
+    existing_emails = set(
+        Member.objects.filter(email__in=[data['email'] for _, data in valid_rows]).values_list('email', flat=True)
+    )
+
+    today = localdate()
+    members = []
+    payments_data = []
+    lines = []
+
+    for line, data in valid_rows:
+        if data['email'] in existing_emails:
+            report.add_error(line, 'Este e-mail já está cadastrado.')
+            continue
+
+        # As datas e o status já saem calculados, dispensando o recálculo por aluno
+        paid_until = Member.calculate_paid_until(data['payment_date'])
+        members.append(Member(
+            email=data['email'],
+            full_name=data['full_name'],
+            phone=data['phone'],
+            last_payment_date=data['payment_date'],
+            paid_until=paid_until,
+            is_active=paid_until >= today,
+        ))
+        payments_data.append(data)
+        lines.append(line)
+
+    if not members:
+        return
+
+    try:
+        with transaction.atomic():
+            Member.objects.bulk_create(members, batch_size=1000)
+            Payment.objects.bulk_create(
+                [
+                    Payment(member=member, payment_date=data['payment_date'], amount=data['amount'])
+                    for member, data in zip(members, payments_data)
+                ],
+                batch_size=1000
+            )
+            # Alunos que já chegam vencidos entram na fila de cobrança, como no cadastro pelo painel
+            overdue = {member.id: member.paid_until for member in members if not member.is_active}
+            if overdue:
+                BillingMessage.enqueue_for_members(list(overdue), paid_until=overdue)
+            save_activity_logs([ActivityLog(
+                event_type='created',
+                description=f'Importação de alunos: {len(members)} aluno(s) cadastrado(s).'
+            )])
+    except IntegrityError:
+        # Um e-mail do lote foi cadastrado por outra requisição depois da verificação
+        for line in lines:
+            report.add_error(line, 'Não foi possível gravar o lote: e-mail cadastrado durante a importação.')
+        return
+
+    report.created += len(members)
+
+
+def import_members(rows, chunk_size=1000):
+    """
+    Cadastra alunos e seus primeiros pagamentos a partir das linhas de uma planilha.
+
+    Cada lote é validado com as regras do MemberPaymentForm, os e-mails são verificados
+    com uma única consulta IN e alunos e pagamentos são gravados com bulk_create. Cada lote
+    registra um único ActivityLog de resumo em vez de um por aluno.
+    """
+    report = ImportReport()
+    seen_emails = set()
+
+    for chunk in chunked(rows, chunk_size):
+        _import_member_chunk(chunk, report, seen_emails)
+
+    report.errors.sort(key=lambda error: error['line'])
+    return report
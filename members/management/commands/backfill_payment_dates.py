@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Max
+from members.models import Member
+
+
+class Command(BaseCommand):
+    help = 'Preenche last_payment_date e paid_until dos membros a partir dos pagamentos existentes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Quantidade de membros atualizados por lote.')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        members = Member.objects.annotate(
+            computed_last_payment=Max('payments__payment_date')
+        ).only('id', 'last_payment_date', 'paid_until').order_by('id')
+
+        batch = []
+        updated = 0
+
+        for member in members.iterator(chunk_size=batch_size):
+            paid_until = Member.calculate_paid_until(member.computed_last_payment)
+
+            if member.last_payment_date == member.computed_last_payment and member.paid_until == paid_until:
+                continue
+
+            member.last_payment_date = member.computed_last_payment
+            member.paid_until = paid_until
+            batch.append(member)
+
+            if len(batch) >= batch_size:
+                Member.objects.bulk_update(batch, ['last_payment_date', 'paid_until'])
+                updated += len(batch)
+                batch = []
+
+        if batch:
+            Member.objects.bulk_update(batch, ['last_payment_date', 'paid_until'])
+            updated += len(batch)
+
+        self.stdout.write(self.style.SUCCESS(f'{updated} membro(s) atualizado(s).'))
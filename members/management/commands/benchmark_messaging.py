@@ -0,0 +1,44 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from utils.messaging import get_messaging_backend
+from utils.utils import percentile
+
+
+class Command(BaseCommand):
+    help = (
+        'Mede a vazão do envio de mensagens pelo MESSAGING_BACKEND configurado, com o mesmo '
+        'paralelismo do envio das cobranças. Não grava nada no banco.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--messages', type=int, default=200, help='Quantidade de mensagens enviadas.')
+        parser.add_argument('--concurrency', type=int, default=None, help='Padrão: BILLING_MESSAGES_CONCURRENCY.')
+        parser.add_argument('--to', default='5585999999999', help='Número de destino das mensagens.')
+
+    def handle(self, *args, **options):
+        backend = get_messaging_backend()
+        concurrency = options['concurrency'] or settings.BILLING_MESSAGES_CONCURRENCY
+
+        started_at = time.monotonic()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            results = list(executor.map(
+                lambda number: backend.send_message(to=options['to'], message=f'Mensagem de teste {number}'),
+                range(options['messages'])
+            ))
+        elapsed = time.monotonic() - started_at
+
+        latencies = [result.latency_ms or 0 for result in results]
+        sent = sum(result.ok for result in results)
+        deferred = sum(result.deferred for result in results)
+
+        self.stdout.write(f'Backend: {settings.MESSAGING_BACKEND} ({concurrency} envio(s) simultâneo(s))')
+        self.stdout.write(
+            f'{sent} enviada(s), {len(results) - sent - deferred} com falha, {deferred} adiada(s) '
+            f'em {elapsed:.2f}s ({len(results) / elapsed if elapsed else 0:.1f} mensagens/s).'
+        )
+        self.stdout.write(
+            f'Latência: p50 {percentile(latencies, 0.5)}ms, p95 {percentile(latencies, 0.95)}ms, '
+            f'p99 {percentile(latencies, 0.99)}ms.'
+        )
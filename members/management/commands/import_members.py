@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+from members.importers import import_members
+from utils.spreadsheets import iter_spreadsheet_rows, SpreadsheetError, SUPPORTED_EXTENSIONS
+
+
+class Command(BaseCommand):
+    help = 'Importa alunos e seus primeiros pagamentos de um arquivo CSV ou XLSX.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Caminho do arquivo CSV ou XLSX.')
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Quantidade de linhas gravadas por lote.')
+
+    def handle(self, *args, **options):
+        path = options['path']
+
+        if not path.lower().endswith(SUPPORTED_EXTENSIONS):
+            raise CommandError('Formato de arquivo não suportado. Envie um arquivo CSV ou XLSX.')
+
+        try:
+            with open(path, 'rb') as file:
+                report = import_members(iter_spreadsheet_rows(file, path), chunk_size=options['chunk_size'])
+        except FileNotFoundError:
+            raise CommandError(f'Arquivo não encontrado: {path}')
+        except SpreadsheetError as error:
+            raise CommandError(str(error))
+
+        for error in report.errors:
+            self.stderr.write(f"Linha {error['line']}: {error['message']}")
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{report.created} aluno(s) importado(s) de {report.total_rows} linha(s), {len(report.errors)} com erro.'
+        ))
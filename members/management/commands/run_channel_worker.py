@@ -0,0 +1,32 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = (
+        'Inicia um worker do Celery só para a fila de um canal de notificação, '
+        'com a concorrência configurada em NOTIFICATION_CHANNELS.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('channel', choices=sorted(settings.NOTIFICATION_CHANNELS))
+        parser.add_argument('--concurrency', type=int, default=None, help='Substitui a concorrência do canal.')
+        parser.add_argument('--loglevel', default='info')
+
+    def handle(self, *args, **options):
+        # Importado aqui para que o Celery só seja carregado quando o comando roda
+        from project.celery import app
+
+        channel = options['channel']
+        config = settings.NOTIFICATION_CHANNELS[channel]
+        concurrency = options['concurrency'] or config['concurrency']
+
+        self.stdout.write(f"Worker do canal {channel}: fila {config['queue']}, {concurrency} processo(s).")
+
+        app.worker_main([
+            'worker',
+            f"--queues={config['queue']}",
+            f'--concurrency={concurrency}',
+            f'--hostname={channel}@%h',
+            f"--loglevel={options['loglevel']}",
+        ])
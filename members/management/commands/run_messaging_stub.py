@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+from utils.ultramsg_stub import UltraMsgStubServer
+
+
+class Command(BaseCommand):
+    help = (
+        'Sobe um servidor local que imita a API do UltraMsg, para testes de carga com '
+        'MESSAGING_BACKEND=utils.messaging.HttpStubBackend.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--latency', type=float, default=0.0, help='Segundos de espera em cada resposta.')
+        parser.add_argument('--jitter', type=float, default=0.0, help='Espera extra aleatória de até N segundos.')
+        parser.add_argument('--error-rate', type=float, default=0.0, help='Fração das requisições que recebem erro (0 a 1).')
+        parser.add_argument('--error-status', type=int, default=500, help='Status HTTP dos erros injetados.')
+        parser.add_argument('--seed', type=int, default=None, help='Semente para repetir a mesma sequência de erros.')
+
+    def handle(self, *args, **options):
+        stub = UltraMsgStubServer(
+            host=options['host'],
+            port=options['port'],
+            latency=options['latency'],
+            latency_jitter=options['jitter'],
+            error_rate=options['error_rate'],
+            error_status=options['error_status'],
+            seed=options['seed'],
+            keep_requests=False,
+        )
+
+        self.stdout.write(f'Stub do UltraMsg em {stub.url} (Ctrl+C para encerrar).')
+
+        try:
+            stub.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{stub.stats['requests']} requisição(ões) atendida(s), {stub.stats['errors']} com erro injetado."
+        ))
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.3 on 2026-10-18 20:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('members', '0005_remove_billingmessage_scheduled_date'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='member',
+            name='last_payment_date',
+            field=models.DateField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='member',
+            name='paid_until',
+            field=models.DateField(blank=True, db_index=True, editable=False, null=True),
+        ),
+    ]
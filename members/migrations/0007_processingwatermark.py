@@ -0,0 +1,22 @@
+# Generated by Django 5.1.3 on 2026-10-18 20:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('members', '0006_member_last_payment_date_paid_until'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProcessingWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('last_processed_date', models.DateField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
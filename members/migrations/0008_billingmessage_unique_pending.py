@@ -0,0 +1,33 @@
+# Generated by Django 5.1.3 on 2026-10-18 20:57
+
+from django.db import migrations, models
+
+
+def remove_duplicated_pending_messages(apps, schema_editor):
+    """Mantém apenas a mensagem pendente mais antiga de cada membro antes de criar a constraint."""
+    BillingMessage = apps.get_model('members', 'BillingMessage')
+
+    duplicated = (
+        BillingMessage.objects.filter(is_sent=False)
+        .values('member_id')
+        .annotate(first_id=models.Min('id'), total=models.Count('id'))
+        .filter(total__gt=1)
+    )
+
+    for row in duplicated:
+        BillingMessage.objects.filter(member_id=row['member_id'], is_sent=False).exclude(id=row['first_id']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('members', '0007_processingwatermark'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicated_pending_messages, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='billingmessage',
+            constraint=models.UniqueConstraint(condition=models.Q(('is_sent', False)), fields=('member',), name='unique_pending_billing_message_per_member'),
+        ),
+    ]
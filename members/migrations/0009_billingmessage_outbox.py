@@ -0,0 +1,76 @@
+# Generated by Django 5.1.3 on 2026-10-18 21:06
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def copy_is_sent_to_status(apps, schema_editor):
+    BillingMessage = apps.get_model('members', 'BillingMessage')
+    BillingMessage.objects.filter(is_sent=True).update(status='sent')
+
+
+def copy_status_to_is_sent(apps, schema_editor):
+    BillingMessage = apps.get_model('members', 'BillingMessage')
+    BillingMessage.objects.filter(status='sent').update(is_sent=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('members', '0008_billingmessage_unique_pending'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='billingmessage',
+            name='unique_pending_billing_message_per_member',
+        ),
+        migrations.AddField(
+            model_name='billingmessage',
+            name='attempts',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='billingmessage',
+            name='last_error',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='billingmessage',
+            name='locked_by',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='billingmessage',
+            name='locked_until',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='billingmessage',
+            name='next_attempt_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddField(
+            model_name='billingmessage',
+            name='sent_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='billingmessage',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pendente'), ('sending', 'Enviando'), ('sent', 'Enviada'), ('failed', 'Falhou'), ('cancelled', 'Cancelada')], default='pending', max_length=10),
+        ),
+        migrations.RunPython(copy_is_sent_to_status, copy_status_to_is_sent),
+        migrations.RemoveField(
+            model_name='billingmessage',
+            name='is_sent',
+        ),
+        migrations.AddIndex(
+            model_name='billingmessage',
+            index=models.Index(fields=['status', 'next_attempt_at'], name='members_bil_status_a3dae3_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='billingmessage',
+            constraint=models.UniqueConstraint(condition=models.Q(('status__in', ['pending', 'sending'])), fields=('member',), name='unique_pending_billing_message_per_member'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.1.3 on 2026-10-18 21:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('members', '0009_billingmessage_outbox'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='billingmessage',
+            name='delivered_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='billingmessage',
+            name='delivery_status',
+            field=models.CharField(blank=True, choices=[('', 'Sem confirmação'), ('delivered', 'Entregue'), ('read', 'Lida')], max_length=10),
+        ),
+        migrations.AddField(
+            model_name='billingmessage',
+            name='provider_message_id',
+            field=models.CharField(blank=True, db_index=True, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='billingmessage',
+            name='read_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.1.3 on 2026-10-18 21:27
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('members', '0010_billingmessage_delivery_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='member',
+            name='phone_failures',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.CreateModel(
+            name='MessageAttempt',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('phone', models.CharField(max_length=20)),
+                ('channel', models.CharField(default='whatsapp', max_length=20)),
+                ('ok', models.BooleanField()),
+                ('status_code', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('latency_ms', models.PositiveIntegerField(blank=True, null=True)),
+                ('error_class', models.CharField(blank=True, max_length=50)),
+                ('requests', models.PositiveSmallIntegerField(default=1)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('billing_message', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='attempts_log', to='members.billingmessage')),
+                ('member', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='message_attempts', to='members.member')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['channel', 'created_at'], name='members_mes_channel_71244c_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.1.3 on 2026-10-18 21:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('members', '0011_messageattempt'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='billingmessage',
+            name='unique_pending_billing_message_per_member',
+        ),
+        migrations.AddField(
+            model_name='billingmessage',
+            name='due_date',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='billingmessage',
+            name='kind',
+            field=models.CharField(choices=[('overdue', 'Pagamento atrasado'), ('reminder', 'Lembrete de vencimento')], default='overdue', max_length=10),
+        ),
+        migrations.AddConstraint(
+            model_name='billingmessage',
+            constraint=models.UniqueConstraint(condition=models.Q(('status__in', ['pending', 'sending'])), fields=('member', 'kind'), name='unique_pending_billing_message_per_member'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.3 on 2026-10-18 22:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('members', '0012_billingmessage_kind'),
+    ]
+
+    operations = [
+        migrations.RenameField(
+            model_name='messageattempt',
+            old_name='phone',
+            new_name='recipient',
+        ),
+        migrations.AlterField(
+            model_name='messageattempt',
+            name='recipient',
+            field=models.CharField(max_length=254),
+        ),
+    ]
@@ -1,46 +1,222 @@
-from django.db import models
+from django.conf import settings
+from django.db import models, transaction
 from datetime import timedelta
-from django.utils.timezone import localdate
-from django.db.models import Sum, Min, Max, Count
+from django.utils.timezone import localdate, make_aware, now as timezone_now
+from django.db.models import Sum, Min, Max, Count, Avg
+from django.db.models.functions import Coalesce
 from django.core.exceptions import ValidationError
-from datetime import datetime
+from datetime import datetime, time as time_instance
+import time
 from django.core.validators import MinLengthValidator
-from utils.ultramsg import UltraMsgAPI
+from utils.messaging import get_messaging_backend
+from utils.notifications import resolve_channels
+from .status import schedule_status_recompute
+
+# Quantidade de dias cobertos por um pagamento
+PAYMENT_PERIOD_DAYS = 30
+
 
 class Member(models.Model):
+    # Campos ignorados por get_changes
+    UNTRACKED_FIELDS = ('id', 'created_at', 'updated_at')
+
     email = models.EmailField(unique=True)
     full_name = models.CharField(max_length=50, validators=[MinLengthValidator(3)])
     phone = models.CharField(max_length=15)
     start_date = models.DateField(default=localdate)
     is_active = models.BooleanField(default=False)
+    # Campos desnormalizados, mantidos pelo Payment, para evitar um Max() por leitura
+    last_payment_date = models.DateField(null=True, blank=True, db_index=True, editable=False)
+    paid_until = models.DateField(null=True, blank=True, db_index=True, editable=False)
+    # Falhas seguidas em que o provedor recusou o telefone; ao atingir MESSAGING_PHONE_MAX_FAILURES as cobranças param
+    phone_failures = models.PositiveSmallIntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f'{self.full_name}'
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._mark_clean()
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
+        # Os valores recarregados passam a ser os do banco; sem isso o próximo save veria alterações antigas
+        self._mark_clean(*(fields or ()))
+
+    def _tracked_fields(self):
+        deferred = self.get_deferred_fields()
+        return [
+            field for field in self._meta.concrete_fields
+            if field.name not in self.UNTRACKED_FIELDS and field.attname not in deferred
+        ]
+
+    def _mark_clean(self, *field_names):
+        """Guarda o valor atual dos campos (padrão: todos os carregados) como o valor do banco."""
+        if not hasattr(self, '_loaded_values'):
+            self._loaded_values = {}
+
+        for field in self._tracked_fields():
+            if not field_names or field.name in field_names or field.attname in field_names:
+                self._loaded_values[field.attname] = field.to_python(field.value_from_object(self))
+
+    def get_changes(self):
+        """Campos alterados desde que o membro foi carregado ou salvo: {campo: [antes, depois]}."""
+        loaded = getattr(self, '_loaded_values', {})
+        changes = {}
+
+        for field in self._tracked_fields():
+            if field.attname not in loaded:
+                continue
+
+            old, new = loaded[field.attname], field.to_python(field.value_from_object(self))
+            if old != new:
+                changes[field.attname] = [old, new]
+
+        return changes
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        changes = self.get_changes()
+
+        if update_fields is not None:
+            changes = {name: change for name, change in changes.items() if name in update_fields}
+
+        # Lido pelo signal de post_save para registrar só o que mudou
+        self.saved_changes = changes
+        super().save(*args, **kwargs)
+        self._mark_clean(*(update_fields or ()))
+
     @property
-    def last_payment_date(self):
-        """Retorna a última data de pagamento do membro ou None se não houver pagamentos."""
-        
-        last_payment = self.payments.aggregate(last_payment=Max('payment_date'))['last_payment']
-        
-        return last_payment
+    def is_phone_blocked(self):
+        return self.phone_failures >= settings.MESSAGING_PHONE_MAX_FAILURES
+
+    @staticmethod
+    def get_phone_fallback():
+        """Canal usado no lugar do WhatsApp quando o telefone está bloqueado (None: as cobranças param)."""
+        return settings.NOTIFICATION_CHANNELS['whatsapp'].get('fallback')
+
+    @classmethod
+    def register_phone_results(cls, delivered_ids=(), rejected_ids=()):
+        """Zera as falhas dos telefones que receberam mensagem e soma uma falha aos recusados."""
+        if delivered_ids:
+            cls.objects.filter(id__in=delivered_ids, phone_failures__gt=0).update(phone_failures=0)
+        if rejected_ids:
+            cls.objects.filter(id__in=rejected_ids).update(phone_failures=models.F('phone_failures') + 1)
+
+    @classmethod
+    def get_blocked_phones(cls):
+        return cls.objects.filter(phone_failures__gte=settings.MESSAGING_PHONE_MAX_FAILURES).order_by('-phone_failures')
+
+    @staticmethod
+    def calculate_paid_until(last_payment_date):
+        """Retorna até quando o pagamento cobre o membro ou None se não houver pagamento."""
+        if last_payment_date is None:
+            return None
+        return last_payment_date + timedelta(days=PAYMENT_PERIOD_DAYS)
+
+    def register_payment_date(self, payment_date):
+        """Avança as datas de pagamento do membro sem agregação, caso payment_date seja a mais recente."""
+        paid_until = self.calculate_paid_until(payment_date)
+
+        # O UPDATE condicional mantém o valor correto mesmo com pagamentos concorrentes
+        Member.objects.filter(pk=self.pk).filter(
+            models.Q(last_payment_date__isnull=True) | models.Q(last_payment_date__lt=payment_date)
+        ).update(last_payment_date=payment_date, paid_until=paid_until)
+
+        if self.last_payment_date is None or self.last_payment_date < payment_date:
+            self.last_payment_date = payment_date
+            self.paid_until = paid_until
+            self._mark_clean('last_payment_date', 'paid_until')
+
+    def refresh_payment_dates(self):
+        """Recalcula as datas de pagamento a partir dos pagamentos existentes (após edição ou exclusão)."""
+        self.last_payment_date = self.payments.aggregate(last_payment=Max('payment_date'))['last_payment']
+        self.paid_until = self.calculate_paid_until(self.last_payment_date)
+
+        Member.objects.filter(pk=self.pk).update(
+            last_payment_date=self.last_payment_date,
+            paid_until=self.paid_until
+        )
+        self._mark_clean('last_payment_date', 'paid_until')
 
     def update_activity_status(self):
-        """Atualiza o status de atividade do membro com base na última data de pagamento."""
+        """
+        Atualiza o status de atividade do membro com base na última data de pagamento.
+
+        Só grava (e registra no ActivityLog) quando algum campo mudou, e apenas as colunas alteradas.
+        """
         now = localdate()
 
-        if self.last_payment_date and self.last_payment_date < now - timedelta(days=30):
+        if self.paid_until and self.paid_until < now:
             self.is_active = False
-            BillingMessage.objects.get_or_create(
-                member=self,
-                is_sent=False,
-            )
+            BillingMessage.enqueue_for_members([self.pk], paid_until={self.pk: self.paid_until})
         else:
             self.is_active = True
-            
-        self.save()
+
+        changes = self.get_changes()
+        if changes:
+            self.save(update_fields=[*changes, 'updated_at'])
+
+    @classmethod
+    def get_overdue_members(cls, date=None, since=None):
+        """
+        Retorna os membros ativos cujo pagamento venceu antes de date.
+
+        O vencimento é o dia seguinte a paid_until. Com since, retorna apenas quem venceu
+        no intervalo (since, date], usando o índice de paid_until em vez de varrer todos os ativos.
+        """
+        date = date or localdate()
+        members = cls.objects.filter(is_active=True, paid_until__lt=date)
+
+        if since:
+            members = members.filter(paid_until__gte=since)
+
+        return members
+
+    @classmethod
+    def bulk_update_activity_status(cls, date=None, since=None, batch_size=1000):
+        """
+        Versão em lote de update_activity_status para a tarefa noturna.
+
+        Marca como pendentes, com um único UPDATE, os membros ativos cujo pagamento venceu
+        e enfileira em lote as mensagens de cobrança que ainda não existem. Não dispara os
+        signals de post_save; o ActivityLog é gravado com bulk_create.
+        Retorna a quantidade de linhas alteradas e o tempo gasto.
+        """
+        from admin_panel.activity import save_activity_logs
+        from admin_panel.models import ActivityLog
+
+        started_at = time.monotonic()
+        date = date or localdate()
+
+        with transaction.atomic():
+            overdue = dict(cls.get_overdue_members(date, since).select_for_update().values_list('id', 'paid_until'))
+            overdue_ids = list(overdue)
+
+            members_updated = cls.objects.filter(id__in=overdue_ids).update(
+                is_active=False,
+                updated_at=timezone_now()
+            )
+
+            BillingMessage.enqueue_for_members(overdue_ids, batch_size=batch_size, paid_until=overdue)
+
+            save_activity_logs(
+                [
+                    ActivityLog(member_id=member_id, event_type='pending', description='Pagamento vencido: aluno marcado como pendente.')
+                    for member_id in overdue_ids
+                ],
+                batch_size=batch_size
+            )
+
+        return {
+            'members_updated': members_updated,
+            'billing_messages_queued': len(overdue_ids),
+            'elapsed_seconds': round(time.monotonic() - started_at, 3),
+        }
     
 
 class Payment(models.Model):
@@ -103,28 +279,509 @@ class Payment(models.Model):
         return payments['total_in_the_year'] or 0.00
     
     def save(self, *args, **kwargs):
+        # Normaliza datetime/str para date antes de comparar com as datas do membro
+        self.payment_date = self._meta.get_field('payment_date').to_python(self.payment_date)
+        created = self._state.adding
+
+        previous_member_id = None
+        if not created:
+            previous_member_id = Payment.objects.filter(pk=self.pk).values_list('member_id', flat=True).first()
+
         super().save(*args, **kwargs)
 
+        if previous_member_id and previous_member_id != self.member_id:
+            previous_member = Member.objects.filter(pk=previous_member_id).first()
+            if previous_member:
+                previous_member.refresh_payment_dates()
+                schedule_status_recompute(previous_member.pk)
+
         if self.member:
-            self.member.update_activity_status()
+            if created:
+                self.member.register_payment_date(self.payment_date)
+            else:
+                self.member.refresh_payment_dates()
+            # O status é recalculado após o commit, uma vez por membro por transação
+            schedule_status_recompute(self.member.pk)
             
 
 class BillingMessage(models.Model):
+    """
+    Outbox das mensagens de cobrança.
+
+    Os workers reservam lotes com SELECT ... FOR UPDATE SKIP LOCKED (claim_batch) e
+    recebem um lease: enquanto locked_until não passar, nenhum outro worker envia a
+    mesma mensagem. Falhas voltam para a fila com backoff em next_attempt_at.
+    """
+    STATUS_PENDING = 'pending'
+    STATUS_SENDING = 'sending'
+    STATUS_SENT = 'sent'
+    STATUS_FAILED = 'failed'
+    STATUS_CANCELLED = 'cancelled'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pendente'),
+        (STATUS_SENDING, 'Enviando'),
+        (STATUS_SENT, 'Enviada'),
+        (STATUS_FAILED, 'Falhou'),
+        (STATUS_CANCELLED, 'Cancelada'),
+    ]
+    # Status em que a mensagem ainda está na fila
+    OPEN_STATUSES = [STATUS_PENDING, STATUS_SENDING]
+
+    KIND_OVERDUE = 'overdue'
+    KIND_REMINDER = 'reminder'
+    KIND_CHOICES = [
+        (KIND_OVERDUE, 'Pagamento atrasado'),
+        (KIND_REMINDER, 'Lembrete de vencimento'),
+    ]
+
+    DELIVERY_DELIVERED = 'delivered'
+    DELIVERY_READ = 'read'
+    DELIVERY_CHOICES = [
+        ('', 'Sem confirmação'),
+        (DELIVERY_DELIVERED, 'Entregue'),
+        (DELIVERY_READ, 'Lida'),
+    ]
+    # Valores de "ack" dos webhooks do UltraMsg que mudam o status de entrega
+    DELIVERY_ACKS = {
+        'device': DELIVERY_DELIVERED,
+        'delivered': DELIVERY_DELIVERED,
+        'read': DELIVERY_READ,
+        'played': DELIVERY_READ,
+    }
+
     member = models.ForeignKey('Member', on_delete=models.CASCADE, related_name='billing_messages')
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES, default=KIND_OVERDUE)
+    due_date = models.DateField(null=True, blank=True)  # Vencimento avisado pelos lembretes
     created_at = models.DateField(default=localdate)  # Data local em que a mensagem foi salva
-    is_sent = models.BooleanField(default=False)  # Flag para saber se já foi enviada
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone_now)
+    locked_until = models.DateTimeField(null=True, blank=True)  # Fim do lease do worker que reservou a mensagem
+    locked_by = models.CharField(max_length=100, blank=True)
+    last_error = models.TextField(blank=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    provider_message_id = models.CharField(max_length=100, blank=True, db_index=True)  # id retornado pelo UltraMsg
+    delivery_status = models.CharField(max_length=10, choices=DELIVERY_CHOICES, blank=True)
+    delivered_at = models.DateTimeField(null=True, blank=True)
+    read_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            # Garante no banco uma única mensagem de cada tipo na fila por membro, mesmo com execuções concorrentes
+            models.UniqueConstraint(
+                fields=['member', 'kind'],
+                condition=models.Q(status__in=['pending', 'sending']),
+                name='unique_pending_billing_message_per_member',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+        ]
 
     def __str__(self):
-        return f"BillingMessage for {self.member.full_name} - Sent: {self.is_sent}"
+        return f"BillingMessage ({self.kind}) for {self.member.full_name} - Status: {self.get_status_display()}"
+
+    @property
+    def is_sent(self):
+        return self.status == self.STATUS_SENT
+
+    @classmethod
+    def enqueue_for_members(cls, member_ids, batch_size=1000, paid_until=None):
+        """
+        Cria as mensagens de cobrança pendentes dos membros informados com um INSERT em lote.
+
+        Membros que já têm mensagem na fila são ignorados pela constraint
+        (ON CONFLICT DO NOTHING), sem risco de duplicidade. next_attempt_at recebe o
+        momento do vencimento (ver overdue_since), que define a ordem de envio.
+        paid_until ({id do membro: paid_until}) evita consultar os membros quando o
+        chamador já tem as datas.
+        """
+        if paid_until is None:
+            paid_until = dict(Member.objects.filter(id__in=member_ids).values_list('id', 'paid_until'))
+
+        return cls.objects.bulk_create(
+            [
+                cls(member_id=member_id, next_attempt_at=cls.overdue_since(paid_until.get(member_id)))
+                for member_id in member_ids
+            ],
+            batch_size=batch_size,
+            ignore_conflicts=True
+        )
+
+    @staticmethod
+    def overdue_since(paid_until):
+        """
+        Início do dia seguinte a paid_until (quando o pagamento venceu), limitado a agora.
+
+        Usado como next_attempt_at das cobranças: a fila sai pelo índice (status,
+        next_attempt_at) já na ordem das mais atrasadas para as mais recentes.
+        """
+        now = timezone_now()
+        if paid_until is None:
+            return now
+
+        return min(now, make_aware(datetime.combine(paid_until + timedelta(days=1), time_instance.min)))
+
+    @classmethod
+    def enqueue_reminders(cls, date=None, days_before=None, batch_size=1000):
+        """
+        Enfileira os lembretes dos membros ativos cujo pagamento vence daqui a N dias.
+
+        Para cada N em days_before (padrão: BILLING_REMINDER_DAYS) o vencimento é
+        date + N, ou seja, paid_until = date + N - 1. Uma única consulta pelo índice de
+        paid_until encontra todos eles, então o custo depende só de quantos vencem.
+        Membros que já têm lembrete na fila são ignorados pela constraint.
+        """
+        date = date or localdate()
+        days_before = settings.BILLING_REMINDER_DAYS if days_before is None else days_before
+        paid_until_dates = [date + timedelta(days=days - 1) for days in days_before]
+
+        due_members = Member.objects.filter(paid_until__in=paid_until_dates, is_active=True)
+        if not Member.get_phone_fallback():
+            due_members = due_members.filter(phone_failures__lt=settings.MESSAGING_PHONE_MAX_FAILURES)
+        due_members = due_members.values_list('id', 'paid_until')
+
+        return cls.objects.bulk_create(
+            [
+                cls(member_id=member_id, kind=cls.KIND_REMINDER, due_date=paid_until + timedelta(days=1))
+                for member_id, paid_until in due_members.iterator(chunk_size=batch_size)
+            ],
+            batch_size=batch_size,
+            ignore_conflicts=True
+        )
+
+    @classmethod
+    def cancel_paid(cls):
+        """
+        Cancela as mensagens pendentes que perderam o sentido.
+
+        Cobranças de membros que voltaram a ficar ativos e lembretes de membros que já
+        pagaram o próximo período (ou que ficaram inativos e vão receber a cobrança).
+        """
+        return cls.objects.filter(
+            models.Q(kind=cls.KIND_OVERDUE, member__is_active=True)
+            | models.Q(kind=cls.KIND_REMINDER, member__is_active=False)
+            | models.Q(kind=cls.KIND_REMINDER, member__paid_until__gte=models.F('due_date')),
+            status=cls.STATUS_PENDING,
+        ).update(
+            status=cls.STATUS_CANCELLED,
+            locked_until=None,
+            locked_by=''
+        )
+
+    @classmethod
+    def cancel_blocked_phones(cls):
+        """
+        Cancela as mensagens pendentes de membros cujo telefone falha seguidamente.
+
+        Com um canal de fallback configurado para o WhatsApp nada é cancelado: essas
+        mensagens seguem pelo fallback (ver BillingMessage.channel).
+        """
+        if Member.get_phone_fallback():
+            return 0
+
+        return cls.objects.filter(
+            status=cls.STATUS_PENDING, member__phone_failures__gte=settings.MESSAGING_PHONE_MAX_FAILURES
+        ).update(
+            status=cls.STATUS_CANCELLED,
+            last_error='Telefone recusado seguidamente pelo provedor.',
+        )
+
+    @classmethod
+    def claim_batch(cls, worker_id, batch_size=None, lease_seconds=None):
+        """
+        Reserva até batch_size mensagens prontas para envio para o worker informado.
+
+        Usa SELECT ... FOR UPDATE SKIP LOCKED, então vários workers podem reservar lotes
+        ao mesmo tempo sem pegar a mesma mensagem. Mensagens com lease vencido (worker
+        que morreu no meio do envio) voltam a ser reservadas. As mensagens saem na ordem
+        de next_attempt_at, que nas cobranças é o vencimento (ver overdue_since): das mais
+        atrasadas para as mais recentes, lendo só o início do índice (status, next_attempt_at).
+        """
+        batch_size = batch_size or settings.BILLING_OUTBOX_BATCH_SIZE
+        lease_seconds = lease_seconds or settings.BILLING_OUTBOX_LEASE_SECONDS
+        now = timezone_now()
+
+        reachable = models.Q()
+        if not Member.get_phone_fallback():
+            reachable = models.Q(member__phone_failures__lt=settings.MESSAGING_PHONE_MAX_FAILURES)
+
+        with transaction.atomic():
+            ids = list(
+                cls.objects.select_for_update(skip_locked=True, of=('self',))
+                .filter(
+                    models.Q(status=cls.STATUS_PENDING, next_attempt_at__lte=now)
+                    | models.Q(status=cls.STATUS_SENDING, locked_until__lt=now),
+                    models.Q(kind=cls.KIND_OVERDUE, member__is_active=False)
+                    | models.Q(kind=cls.KIND_REMINDER, member__is_active=True),
+                    reachable,
+                )
+                # Quem está vencido há mais tempo recebe primeiro (ver overdue_since)
+                .order_by('next_attempt_at', 'id')
+                .values_list('id', flat=True)[:batch_size]
+            )
+
+            cls.objects.filter(id__in=ids).update(
+                status=cls.STATUS_SENDING,
+                locked_by=worker_id,
+                locked_until=now + timedelta(seconds=lease_seconds),
+                attempts=models.F('attempts') + 1,
+            )
+
+        return list(cls.objects.filter(id__in=ids, locked_by=worker_id).select_related('member'))
+
+    @classmethod
+    def get_queue_metrics(cls):
+        """Profundidade da fila de envio, com uma única consulta agregada."""
+        now = timezone_now()
+        metrics = cls.objects.filter(status__in=cls.OPEN_STATUSES).aggregate(
+            depth=Count('id'),
+            ready=Count('id', filter=models.Q(status=cls.STATUS_PENDING, next_attempt_at__lte=now)),
+            sending=Count('id', filter=models.Q(status=cls.STATUS_SENDING)),
+            reminders=Count('id', filter=models.Q(kind=cls.KIND_REMINDER)),
+            oldest_paid_until=Min('member__paid_until', filter=models.Q(kind=cls.KIND_OVERDUE)),
+        )
+
+        oldest_paid_until = metrics.pop('oldest_paid_until')
+        metrics['max_overdue_days'] = (localdate() - oldest_paid_until).days if oldest_paid_until else 0
+        return metrics
+
+    @classmethod
+    def mark_sent(cls, provider_ids, worker_id):
+        """
+        Marca como enviadas, com um único UPDATE, as mensagens reservadas pelo worker.
+
+        provider_ids: {id da mensagem: id retornado pelo provedor}, usado para casar os webhooks de entrega.
+        """
+        return cls.objects.filter(id__in=provider_ids, locked_by=worker_id, status=cls.STATUS_SENDING).update(
+            status=cls.STATUS_SENT,
+            sent_at=timezone_now(),
+            locked_until=None,
+            last_error='',
+            provider_message_id=models.Case(
+                *[models.When(id=id, then=models.Value(str(provider_id or ''))) for id, provider_id in provider_ids.items()],
+                default=models.Value(''),
+            ),
+        )
+
+    @classmethod
+    def apply_delivery_events(cls, events):
+        """
+        Aplica um lote de eventos de entrega ({'id': id do provedor, 'ack': ...}) com um SELECT e no máximo dois UPDATEs.
+
+        O status só avança (entregue -> lida), então eventos repetidos ou fora de ordem
+        não desfazem uma leitura já registrada. Retorna (mensagens alteradas, eventos sem
+        mensagem correspondente), para que estes possam ser tentados de novo.
+        """
+        latest = {}
+        for event in events:
+            status = cls.DELIVERY_ACKS.get(event.get('ack'))
+            provider_id = str(event.get('id') or '')
+            if status and provider_id and latest.get(provider_id) != cls.DELIVERY_READ:
+                latest[provider_id] = status
+
+        known = set(cls.objects.filter(provider_message_id__in=latest).values_list('provider_message_id', flat=True))
+        unmatched = [event for event in events if str(event.get('id') or '') in latest.keys() - known]
+        latest = {provider_id: status for provider_id, status in latest.items() if provider_id in known}
+
+        now = timezone_now()
+        delivered_ids = [provider_id for provider_id, status in latest.items() if status == cls.DELIVERY_DELIVERED]
+        read_ids = [provider_id for provider_id, status in latest.items() if status == cls.DELIVERY_READ]
+        updated = 0
+
+        if delivered_ids:
+            updated += cls.objects.filter(provider_message_id__in=delivered_ids, delivery_status='').update(
+                delivery_status=cls.DELIVERY_DELIVERED,
+                delivered_at=now,
+            )
+        if read_ids:
+            updated += cls.objects.filter(provider_message_id__in=read_ids).exclude(
+                delivery_status=cls.DELIVERY_READ
+            ).update(
+                delivery_status=cls.DELIVERY_READ,
+                read_at=now,
+                delivered_at=Coalesce('delivered_at', models.Value(now)),
+            )
+
+        return updated, unmatched
+
+    @classmethod
+    def release(cls, ids, worker_id, delay_seconds=0):
+        """Devolve para a fila, sem contar a tentativa, mensagens que não chegaram a ser enviadas."""
+        return cls.objects.filter(id__in=ids, locked_by=worker_id, status=cls.STATUS_SENDING).update(
+            status=cls.STATUS_PENDING,
+            next_attempt_at=timezone_now() + timedelta(seconds=delay_seconds),
+            locked_until=None,
+            attempts=models.F('attempts') - 1,
+        )
+
+    @classmethod
+    def retry_delay(cls, attempts):
+        """Backoff exponencial entre as tentativas de envio."""
+        delay = settings.BILLING_OUTBOX_RETRY_BACKOFF * 2 ** max(attempts - 1, 0)
+        return timedelta(seconds=min(delay, settings.BILLING_OUTBOX_RETRY_BACKOFF_MAX))
+
+    @classmethod
+    def mark_failed(cls, failures, worker_id):
+        """
+        Devolve para a fila, com backoff, as mensagens que falharam (failures: {id: erro}).
+
+        Depois de BILLING_OUTBOX_MAX_ATTEMPTS tentativas a mensagem fica como falha definitiva.
+        """
+        messages = list(cls.objects.filter(id__in=failures, locked_by=worker_id, status=cls.STATUS_SENDING))
+        now = timezone_now()
+
+        for message in messages:
+            message.last_error = str(failures[message.id] or '')[:1000]
+            message.locked_until = None
+
+            if message.attempts >= settings.BILLING_OUTBOX_MAX_ATTEMPTS:
+                message.status = cls.STATUS_FAILED
+            else:
+                message.status = cls.STATUS_PENDING
+                message.next_attempt_at = now + cls.retry_delay(message.attempts)
+
+        cls.objects.bulk_update(messages, ['status', 'next_attempt_at', 'locked_until', 'last_error'])
+        return len(messages)
     
-    def send_message(self):
-        ultramsg = UltraMsgAPI()
-        
-        message = f"Olá, {self.member.full_name}! Seu pagamento está atrasado. Por favor, regularize sua situação."
-        response = ultramsg.send_message(to=f'55{self.member.phone}', message=message)
-        
-        if response.status_code == 200 and 'true' in response.text:
-            self.is_sent = True
-            self.save()
-        else:
-            print(f"Error sending message to {self.member.full_name}: {response.text}")
\ No newline at end of file
+    @property
+    def text(self):
+        if self.kind == self.KIND_REMINDER:
+            return (
+                f"Olá, {self.member.full_name}! Seu pagamento vence em {self.due_date:%d/%m/%Y}. "
+                "Evite atrasos e mantenha seu acesso à academia."
+            )
+        return f"Olá, {self.member.full_name}! Seu pagamento está atrasado. Por favor, regularize sua situação."
+
+    @property
+    def notification(self):
+        """A mensagem no formato dos canais de utils.notifications; telefone bloqueado não é usado."""
+        return {
+            'subject': 'Lembrete de pagamento' if self.kind == self.KIND_REMINDER else 'Pagamento em atraso',
+            'body': self.text,
+            'phone': None if self.member.is_phone_blocked else self.member.phone,
+            'email': self.member.email,
+        }
+
+    @property
+    def channel(self):
+        """Canal de envio: WhatsApp ou o fallback dele, quando o membro não tem telefone válido."""
+        channels = resolve_channels(self.notification, [MessageAttempt.CHANNEL_WHATSAPP])
+        return channels[0] if channels else None
+
+    def deliver(self, backend=None):
+        """
+        Envia a mensagem pelo WhatsApp sem gravar nada no banco.
+
+        Pode ser chamado em threads, pois usa o backend de mensagens compartilhado do processo
+        (MESSAGING_BACKEND). Retorna o SendResult do envio.
+        """
+        backend = backend or get_messaging_backend()
+        return backend.send_message(to=f'55{self.member.phone}', message=self.text)
+
+
+class MessageAttempt(models.Model):
+    """Registro compacto de cada tentativa de envio de mensagem, usado nas métricas de envio."""
+    CHANNEL_WHATSAPP = 'whatsapp'
+    CHANNEL_EMAIL = 'email'
+    # Limites superiores (ms) das faixas do histograma de latência; a última faixa é "acima de 5000"
+    LATENCY_BUCKETS = [100, 250, 500, 1000, 2500, 5000]
+
+    billing_message = models.ForeignKey(
+        'BillingMessage', on_delete=models.SET_NULL, null=True, blank=True, related_name='attempts_log'
+    )
+    member = models.ForeignKey('Member', on_delete=models.SET_NULL, null=True, blank=True, related_name='message_attempts')
+    recipient = models.CharField(max_length=254)  # Telefone ou e-mail, conforme o canal
+    channel = models.CharField(max_length=20, default=CHANNEL_WHATSAPP)
+    ok = models.BooleanField()
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    latency_ms = models.PositiveIntegerField(null=True, blank=True)
+    error_class = models.CharField(max_length=50, blank=True)
+    requests = models.PositiveSmallIntegerField(default=1)  # Requisições HTTP feitas, contando as retentativas
+    created_at = models.DateTimeField(default=timezone_now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['channel', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.channel} {self.recipient} - {'ok' if self.ok else self.error_class} ({self.latency_ms}ms)"
+
+    @classmethod
+    def from_result(cls, result, recipient, channel=CHANNEL_WHATSAPP, billing_message_id=None, member_id=None):
+        """Monta (sem salvar) a tentativa a partir do SendResult do envio."""
+        return cls(
+            billing_message_id=billing_message_id,
+            member_id=member_id,
+            recipient=recipient,
+            channel=channel,
+            ok=result.ok,
+            status_code=result.status_code,
+            latency_ms=result.latency_ms,
+            error_class=(result.error_class or '')[:50],
+            requests=result.attempts,
+        )
+
+    @classmethod
+    def get_latency_labels(cls):
+        labels, lower = [], 0
+        for upper in cls.LATENCY_BUCKETS:
+            labels.append(f'{lower}-{upper}ms')
+            lower = upper
+        labels.append(f'>{lower}ms')
+        return labels
+
+    @classmethod
+    def get_channel_stats(cls, since=None):
+        """
+        Taxa de sucesso, latência média, retentativas e histograma de latência por canal.
+
+        Tudo é calculado com uma única consulta agregada (COUNT com FILTER por faixa).
+        """
+        queryset = cls.objects.all()
+        if since is not None:
+            queryset = queryset.filter(created_at__gte=since)
+
+        buckets, lower = {}, None
+        for index, upper in enumerate(cls.LATENCY_BUCKETS + [None]):
+            bucket_filter = models.Q()
+            if lower is not None:
+                bucket_filter &= models.Q(latency_ms__gt=lower)
+            if upper is not None:
+                bucket_filter &= models.Q(latency_ms__lte=upper)
+            buckets[f'bucket_{index}'] = Count('id', filter=bucket_filter & models.Q(latency_ms__isnull=False))
+            lower = upper
+
+        rows = queryset.values('channel').annotate(
+            total=Count('id'),
+            sent=Count('id', filter=models.Q(ok=True)),
+            avg_latency_ms=Avg('latency_ms'),
+            retried=Count('id', filter=models.Q(requests__gt=1)),
+            **buckets,
+        ).order_by('channel')
+
+        labels = cls.get_latency_labels()
+        stats = []
+        for row in rows:
+            stats.append({
+                'channel': row['channel'],
+                'total': row['total'],
+                'sent': row['sent'],
+                'failed': row['total'] - row['sent'],
+                'success_rate': round(row['sent'] * 100 / row['total'], 1) if row['total'] else 0,
+                'retried': row['retried'],
+                'avg_latency_ms': round(row['avg_latency_ms'] or 0),
+                'histogram': [(label, row[f'bucket_{index}']) for index, label in enumerate(labels)],
+            })
+        return stats
+
+
+class ProcessingWatermark(models.Model):
+    """Guarda a última data processada por uma tarefa incremental."""
+    name = models.CharField(max_length=100, unique=True)
+    last_processed_date = models.DateField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'{self.name} - {self.last_processed_date}'
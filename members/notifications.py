@@ -0,0 +1,56 @@
+from django.conf import settings
+from utils.notifications import get_channel, resolve_channels
+from utils.spreadsheets import chunked
+from .tasks import send_bulk_email, send_notification
+
+
+def notify(notification, channels, member_id=None):
+    """
+    Enfileira a notificação em cada canal pedido, na fila do Celery do canal.
+
+    Canais sem destinatário válido são trocados pelo fallback (ver
+    utils.notifications.resolve_channels). Retorna os canais usados.
+    """
+    channels = resolve_channels(notification, channels)
+
+    for channel in channels:
+        send_notification.apply_async(
+            args=[notification, channel], kwargs={'member_id': member_id}, queue=get_channel(channel).queue
+        )
+
+    return channels
+
+
+def notify_member(member, subject, body, channels=('whatsapp',)):
+    """Notifica o membro; telefone bloqueado pelo provedor não é usado."""
+    notification = {
+        'subject': subject,
+        'body': body,
+        'phone': None if member.is_phone_blocked else member.phone,
+        'email': member.email,
+    }
+    return notify(notification, channels, member_id=member.id)
+
+
+def email_members(members, subject, body, batch_size=None):
+    """
+    Envia o mesmo e-mail para muitos membros, em tarefas send_bulk_email de até batch_size e-mails.
+
+    Cada tarefa usa uma única conexão SMTP e as tarefas rodam em paralelo nos workers da
+    fila de e-mail. body pode ser uma função que recebe o membro e retorna o texto.
+    Retorna a quantidade de tarefas enfileiradas.
+    """
+    batch_size = batch_size or settings.EMAIL_BATCH_SIZE
+    tasks = 0
+
+    for batch in chunked(members.only('full_name', 'email').iterator(chunk_size=batch_size), batch_size):
+        messages = [
+            {'subject': subject, 'body': body(member) if callable(body) else body, 'to': member.email}
+            for member in batch
+        ]
+        send_bulk_email.apply_async(
+            args=[messages], kwargs={'batch_size': batch_size}, queue=get_channel('email').queue
+        )
+        tasks += 1
+
+    return tasks
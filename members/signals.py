@@ -1,27 +1,34 @@
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from .models import Member, Payment
-from admin_panel.models import ActivityLog
+from .status import schedule_status_recompute
+from admin_panel.activity import log_activity
 
 @receiver(post_save, sender=Member)
 def log_member_activity(sender, instance, created, **kwargs):
     if created:
-        ActivityLog.objects.create(
+        log_activity(
             member=instance,
             event_type='created',
             description=f"Aluno {instance.full_name} foi cadastrado."
         )
     else:
-        ActivityLog.objects.create(
+        # saves sem nenhuma alteração (ex.: status recalculado igual) não geram registro
+        changes = getattr(instance, 'saved_changes', None)
+        if changes == {}:
+            return
+
+        log_activity(
             member=instance,
             event_type='updated',
-            description=f"Aluno {instance.full_name} foi atualizado."
+            description=f"Aluno {instance.full_name} foi atualizado.",
+            changes=changes
         )
 
 
 @receiver(post_delete, sender=Member)
 def log_member_deleted_activity(sender, instance, **kwargs):
-    ActivityLog.objects.create(
+    log_activity(
         event_type='deleted',
         description=f"Aluno {instance.full_name} foi excluído."
     )
@@ -30,8 +37,17 @@ def log_member_deleted_activity(sender, instance, **kwargs):
 @receiver(post_save, sender=Payment)
 def log_payment_activity(sender, instance, created, **kwargs):
     if created:
-        ActivityLog.objects.create(
+        log_activity(
             member=instance.member,
             event_type='payment',
             description=f"{f'Aluno {instance.member.full_name}' if instance.member else 'Pagamento sem aluno associado |'} realizou um pagamento de R$ {instance.amount}."
         )
+
+
+@receiver(post_delete, sender=Payment)
+def refresh_member_payment_dates(sender, instance, **kwargs):
+    member = Member.objects.filter(pk=instance.member_id).first() if instance.member_id else None
+
+    if member:
+        member.refresh_payment_dates()
+        schedule_status_recompute(member.pk)
@@ -0,0 +1,101 @@
+import threading
+from contextlib import contextmanager
+from django.db import transaction
+
+# Estado por thread: recálculo pendente da transação atual e membros retidos por deferred_status_recompute
+_state = threading.local()
+
+
+def _deferred_ids():
+    return getattr(_state, 'deferred_ids', None)
+
+
+def recompute_members_status(member_ids):
+    """Recalcula o status de atividade dos membros informados, uma vez por membro."""
+    from .models import Member
+
+    for member in Member.objects.filter(id__in=set(member_ids)):
+        member.update_activity_status()
+
+
+class PendingRecompute:
+    """Membros a recalcular no commit da transação (ou savepoint) em que este callback foi registrado."""
+
+    def __init__(self, connection):
+        self.member_ids = set()
+        self.savepoint_ids = list(connection.savepoint_ids)
+
+    def is_current(self, connection):
+        # Um rollback (da transação ou do savepoint em que foi registrado) descarta o callback
+        # junto com os ids; a partir daí os novos ids vão para outro PendingRecompute
+        return self.savepoint_ids == connection.savepoint_ids and any(
+            func is self for _, func, _ in connection.run_on_commit
+        )
+
+    def __call__(self):
+        if getattr(_state, 'pending', None) is self:
+            _state.pending = None
+        recompute_members_status(self.member_ids)
+
+
+def _schedule(member_ids):
+    connection = transaction.get_connection()
+    if not connection.in_atomic_block:
+        recompute_members_status(member_ids)
+        return
+
+    pending = getattr(_state, 'pending', None)
+    if pending is None or not pending.is_current(connection):
+        pending = _state.pending = PendingRecompute(connection)
+        transaction.on_commit(pending)
+
+    pending.member_ids.update(member_ids)
+
+
+def schedule_status_recompute(member_id):
+    """
+    Agenda o recálculo do status do membro para depois do commit da transação atual.
+
+    Os ids ficam num conjunto ligado ao callback de on_commit da transação (um por
+    savepoint), então N pagamentos do mesmo membro resultam em um único recálculo e
+    um rollback descarta os ids junto com o callback. Fora de uma transação o recálculo é imediato.
+    Dentro de deferred_status_recompute o id fica retido até o fim do bloco.
+    """
+    if member_id is None:
+        return
+
+    deferred_ids = _deferred_ids()
+    if deferred_ids is not None:
+        deferred_ids.add(member_id)
+        return
+
+    _schedule([member_id])
+
+
+@contextmanager
+def deferred_status_recompute():
+    """
+    Suspende os recálculos de status durante operações em lote.
+
+    Ao sair do bloco, mesmo com exceção, cada membro afetado é agendado uma única vez:
+    fora de uma transação as linhas já gravadas estão no banco e são recalculadas na
+    hora; dentro de uma, o rollback descarta o recálculo junto com as linhas.
+
+        with deferred_status_recompute():
+            for data in rows:
+                Payment.objects.create(**data)
+    """
+    outermost = _deferred_ids() is None
+
+    if outermost:
+        _state.deferred_ids = set()
+
+    try:
+        yield
+    finally:
+        if outermost:
+            member_ids = _state.deferred_ids
+            _state.deferred_ids = None
+
+            if member_ids:
+                _schedule(member_ids)
@@ -1,18 +1,246 @@
+import logging
+import math
+import time
 from celery import shared_task
-from .models import Member, BillingMessage
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.timezone import localdate, now as timezone_now
+from admin_panel.activity import buffered_activity_logs
+from utils.event_queue import get_event_queue
+from utils.notifications import get_channel
+from utils.utils import send_mass_email
+from utils.rate_limit import get_rate_limiter, get_rate_limiters_metrics
+from .models import Member, BillingMessage, MessageAttempt, ProcessingWatermark
+from .billing import (
+    DELIVERY_EVENTS_QUEUE, LAST_DRAIN_CACHE_KEY, drain_billing_outbox, get_next_send_window_start, get_send_window_end,
+    send_billing_messages_by_channel,
+)
+
+logger = logging.getLogger(__name__)
 
 @shared_task
-def update_members_activity_status():
-    """Verifica se o pagamento do membro foi feito há mais de 1 mês e atualiza o status."""
-    members = Member.objects.filter(is_active=True)
+def update_members_activity_status(bulk=False, full_scan=False):
+    """
+    Verifica se o pagamento do membro foi feito há mais de 1 mês e atualiza o status.
+
+    A tarefa é incremental: só processa quem venceu desde a última execução registrada
+    no ProcessingWatermark, o que também recupera noites em que ela não rodou.
+    full_scan=True ignora a marca e verifica todos os membros ativos vencidos.
+
+    Com bulk=True usa Member.bulk_update_activity_status, que resolve todos os membros
+    vencidos com um número constante de comandos SQL e retorna um relatório da execução.
+    """
+    today = localdate()
+    watermark, _ = ProcessingWatermark.objects.get_or_create(name='update_members_activity_status')
+    since = None if full_scan else watermark.last_processed_date
+
+    report = None
+
+    if bulk:
+        report = Member.bulk_update_activity_status(date=today, since=since)
+        logger.info(
+            'Status atualizado em lote: %(members_updated)s membro(s), '
+            '%(billing_messages_queued)s mensagem(ns) de cobrança enfileirada(s) em %(elapsed_seconds)ss.',
+            report
+        )
+    else:
+        # Somente membros ativos cujo pagamento venceu desde a última execução podem mudar de status.
+        # Os registros de atividade de cada save são gravados em lote.
+        with buffered_activity_logs():
+            for member in Member.get_overdue_members(today, since):
+                member.update_activity_status()
+
+    watermark.last_processed_date = today
+    watermark.save(update_fields=['last_processed_date', 'updated_at'])
 
-    for member in members:
-        member.update_activity_status()
+    return report
         
 @shared_task
-def send_billing_messages():
-    """Envia mensagens de cobrança para os membros inativos."""
-    pendent_messages = BillingMessage.objects.filter(is_sent=False, member__is_active=False)[:100]
-    
-    for message in pendent_messages:
-        message.send_message()
\ No newline at end of file
+def enqueue_payment_reminders(force=False):
+    """
+    Enfileira os lembretes de vencimento do dia (ver BillingMessage.enqueue_reminders).
+
+    Os lembretes são enviados pelo mesmo outbox das cobranças. A data processada fica
+    no ProcessingWatermark, então rodar a tarefa de novo no mesmo dia não repete os
+    lembretes já enviados, a menos que force=True.
+    """
+    today = localdate()
+    watermark, _ = ProcessingWatermark.objects.get_or_create(name='enqueue_payment_reminders')
+
+    if watermark.last_processed_date == today and not force:
+        return 0
+
+    queued = len(BillingMessage.enqueue_reminders(today))
+    logger.info('Lembretes de vencimento: %s mensagem(ns) enfileirada(s).', queued)
+
+    watermark.last_processed_date = today
+    watermark.save(update_fields=['last_processed_date', 'updated_at'])
+
+    return queued
+
+@shared_task
+def send_billing_messages(concurrency=None, limit=None):
+    """
+    Envia as mensagens de cobrança e os lembretes do outbox dentro das janelas de envio.
+
+    Fora de BILLING_SEND_WINDOWS as mensagens ficam retidas na fila. Com a janela
+    aberta o outbox é drenado até o fim dela, das cobranças mais atrasadas para as
+    mais recentes, com vazão máxima de BILLING_DRAIN_RATE mensagens por segundo
+    somando todos os workers.
+
+    Pode rodar em vários workers ao mesmo tempo: cada execução reserva lotes próprios
+    com SELECT ... FOR UPDATE SKIP LOCKED (ver BillingMessage.claim_batch) e os envios
+    de cada lote são feitos em paralelo, com até concurrency envios simultâneos
+    (padrão: BILLING_MESSAGES_CONCURRENCY). Execuções sobrepostas do beat dividem o
+    mesmo limitador billing_drain, então a vazão total não aumenta.
+    """
+    window_end = get_send_window_end()
+
+    if window_end is None:
+        summary = {'held': BillingMessage.get_queue_metrics()['depth'], 'next_window': get_next_send_window_start().isoformat()}
+        logger.info('Fora da janela de envio: %(held)s mensagem(ns) retida(s) até %(next_window)s.', summary)
+        return summary
+
+    drain_limiter = get_rate_limiter('billing_drain', rate=settings.BILLING_DRAIN_RATE, burst=settings.BILLING_DRAIN_BURST)
+    summary = drain_billing_outbox(max_workers=concurrency, limit=limit, deadline=window_end, rate_limiter=drain_limiter)
+
+    summary['queue'] = BillingMessage.get_queue_metrics()
+    summary['finished_at'] = timezone_now().isoformat()
+    # Última drenagem, exibida na página de mensagens do painel
+    cache.set(LAST_DRAIN_CACHE_KEY, summary, timeout=None)
+
+    logger.info(
+        'Mensagens de cobrança: %(sent)s enviada(s), %(failed)s com falha, %(cancelled)s cancelada(s), '
+        '%(handed_off)s repassada(s) ao fallback em %(elapsed_seconds)ss (%(messages_per_second)s/s).',
+        summary
+    )
+    logger.info(
+        'Fila de envio: %(depth)s mensagem(ns), %(ready)s pronta(s) para envio, '
+        'cobrança mais atrasada com %(max_overdue_days)s dia(s).',
+        summary['queue']
+    )
+    for metrics in get_rate_limiters_metrics():
+        logger.info(
+            'Rate limit %(name)s: %(tokens)s/%(capacity)s tokens, espera total de %(total_wait_seconds).2fs '
+            'em %(throttled)s envio(s), %(rejected)s devolvido(s) para a fila.',
+            metrics
+        )
+    return summary
+
+
+@shared_task
+def send_billing_notifications(message_ids, worker_id, channel):
+    """
+    Envia pelo canal de fallback (ex.: e-mail) as mensagens do outbox repassadas por drain_billing_outbox.
+
+    É enfileirada na fila do canal (NOTIFICATION_CHANNELS[channel]['queue']), atendida por
+    workers próprios, então envios lentos de um canal não seguram os dos outros.
+    """
+    summary = send_billing_messages_by_channel(message_ids, worker_id, channel)
+    logger.info('Mensagens de cobrança por %(channel)s: %(sent)s enviada(s), %(failed)s com falha.', summary)
+    return summary
+
+
+@shared_task(bind=True, max_retries=5)
+def send_notification(self, notification, channel, member_id=None):
+    """
+    Envia uma notificação por um canal e registra a tentativa em MessageAttempt.
+
+    Use members.notifications.notify, que escolhe os canais (com fallback) e enfileira
+    esta tarefa na fila de cada um. Envios adiados (rate limit ou circuito aberto) são
+    reagendados para depois do tempo sugerido.
+    """
+    channel = get_channel(channel)
+
+    with channel.connection() as connection:
+        result = channel.send(notification, connection)
+
+    if result.deferred:
+        raise self.retry(countdown=math.ceil(result.retry_after))
+
+    MessageAttempt.from_result(
+        result, recipient=channel.address(notification), channel=channel.name, member_id=member_id
+    ).save()
+
+    if not result.ok:
+        logger.warning('Erro ao enviar notificação por %s: %s', channel.name, result.error)
+
+    return result.ok
+
+
+@shared_task(bind=True)
+def send_bulk_email(self, messages, batch_size=None):
+    """
+    Envia e-mails em massa pela fila de e-mail, reaproveitando a conexão SMTP (ver utils.utils.send_mass_email).
+
+    Os e-mails que falharam são reenviados numa nova execução da tarefa, com backoff
+    exponencial a partir de EMAIL_RETRY_BACKOFF, até EMAIL_MAX_RETRIES vezes.
+    """
+    sent, failed = send_mass_email(messages, batch_size)
+    summary = {'sent': sent, 'failed': len(failed), 'retry': self.request.retries}
+    logger.info('E-mails em massa: %(sent)s enviado(s), %(failed)s com falha (reenvio %(retry)s).', summary)
+
+    if failed:
+        for message, error in failed:
+            logger.warning('Erro ao enviar e-mail para %s: %s', message['to'], error)
+
+        if self.request.retries < settings.EMAIL_MAX_RETRIES:
+            raise self.retry(
+                args=[[message for message, _ in failed]],
+                kwargs={'batch_size': batch_size},
+                countdown=settings.EMAIL_RETRY_BACKOFF * 2 ** self.request.retries,
+                max_retries=settings.EMAIL_MAX_RETRIES,
+            )
+
+    return summary
+
+
+@shared_task
+def apply_delivery_events(batch_size=1000, max_batches=100):
+    """
+    Aplica às mensagens de cobrança os eventos de entrega recebidos pelo webhook do UltraMsg.
+
+    Os eventos são consumidos da fila em lotes de batch_size e cada lote vira um SELECT e
+    no máximo dois UPDATEs. Se o lote não puder ser aplicado, ele volta para o início da fila.
+
+    O ack pode chegar antes de o envio gravar o provider_message_id; eventos sem mensagem
+    correspondente voltam para o fim da fila e são tentados de novo na próxima execução,
+    até completarem BILLING_DELIVERY_EVENT_MAX_AGE segundos, quando são descartados.
+    """
+    queue = get_event_queue(DELIVERY_EVENTS_QUEUE)
+    summary = {'events': 0, 'messages_updated': 0, 'requeued': 0, 'expired': 0}
+    pending = []
+    now = time.time()
+
+    for _ in range(max_batches):
+        events = queue.pop_batch(batch_size)
+        if not events:
+            break
+
+        try:
+            updated, unmatched = BillingMessage.apply_delivery_events(events)
+        except Exception:
+            queue.requeue(events)
+            raise
+
+        summary['events'] += len(events)
+        summary['messages_updated'] += updated
+
+        for event in unmatched:
+            # Eventos enfileirados sem received_at contam a partir de agora
+            event.setdefault('received_at', now)
+            if now - event['received_at'] < settings.BILLING_DELIVERY_EVENT_MAX_AGE:
+                pending.append(event)
+            else:
+                summary['expired'] += 1
+
+    # Só volta para a fila depois do loop, para não ser lido de novo nesta mesma execução
+    queue.push(*pending)
+    summary['requeued'] = len(pending)
+
+    logger.info(
+        'Eventos de entrega: %(events)s aplicado(s), %(messages_updated)s mensagem(ns) atualizada(s), '
+        '%(requeued)s devolvido(s) à fila e %(expired)s descartado(s) sem mensagem correspondente.',
+        summary,
+    )
+    return summary
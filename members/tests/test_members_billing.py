@@ -0,0 +1,376 @@
+from datetime import timedelta
+from django.core import mail
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.test import TestCase, override_settings
+from django.utils.timezone import localdate, localtime, now
+from unittest.mock import patch
+from members.billing import (
+    drain_billing_outbox, get_next_send_window_start, get_send_window_end, send_billing_messages_concurrently
+)
+from members.models import Member, BillingMessage, MessageAttempt
+from members.tasks import send_billing_messages
+from utils import messaging
+from utils.messaging import clear_outbox
+from utils.rate_limit import InMemoryTokenBucket
+from utils.ultramsg_stub import UltraMsgStubServer
+
+
+@override_settings(BILLING_SEND_WINDOWS=[], BILLING_DRAIN_RATE=1000, BILLING_DRAIN_BURST=1000)
+class ConcurrentBillingMessagesTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.members = [
+            Member.objects.create(email=f'aluno{i}@teste.com', full_name=f'Aluno {i}', phone=f'859888800{i:02d}')
+            for i in range(12)
+        ]
+        for member in cls.members:
+            BillingMessage.objects.create(member=member)
+
+    def setUp(self):
+        cache.clear()
+        self.stub = UltraMsgStubServer(failing_numbers={'5585988880003'}).start()
+        self.addCleanup(self.stub.stop)
+
+        ultramsg_settings = override_settings(
+            ULTRAMSG_TOKEN='token',
+            ULTRAMSG_INSTANCE='instance1',
+            ULTRAMSG_API_URL=self.stub.url,
+        )
+        ultramsg_settings.enable()
+        self.addCleanup(ultramsg_settings.disable)
+
+    def test_send_billing_messages_concurrently(self):
+        """Tests that messages are sent in parallel against the local stub and marked as sent."""
+        summary = send_billing_messages(concurrency=4)
+
+        self.assertEqual((summary['sent'], summary['failed'], summary['cancelled']), (11, 1, 0))
+        self.assertEqual(summary['queue']['depth'], 1)  # A mensagem que falhou aguarda o backoff
+        self.assertEqual(len(self.stub.requests), 12)
+        self.assertEqual(self.stub.requests[0]['path'], '/instance1/messages/chat')
+        self.assertEqual(BillingMessage.objects.filter(status=BillingMessage.STATUS_SENT).count(), 11)
+        self.assertFalse(BillingMessage.objects.get(member=self.members[3]).is_sent)
+        # O id retornado pelo provedor é guardado para casar os webhooks de entrega
+        self.assertEqual(
+            BillingMessage.objects.exclude(provider_message_id='').count(), 11
+        )
+
+    def test_sent_messages_are_marked_with_one_update_per_batch(self):
+        """Tests that each batch of successful sends is saved with a single UPDATE."""
+        messages = BillingMessage.claim_batch('worker-1', batch_size=12)
+
+        # Por lote: UPDATE das enviadas, INSERT das tentativas e UPDATE das falhas dos telefones;
+        # no lote com a falha: SELECT e UPDATE da mensagem e UPDATE do telefone recusado
+        with self.assertNumQueries(12):
+            summary = send_billing_messages_concurrently(messages, 'worker-1', max_workers=4, batch_size=5)
+
+        self.assertEqual(summary['sent'], 11)
+        self.assertEqual(len(summary['results']), 12)
+
+    @override_settings(BILLING_MESSAGES_CONCURRENCY=1)
+    def test_send_billing_messages_sequentially(self):
+        """Tests that a concurrency of 1 sends one message at a time."""
+        send_billing_messages()
+
+        self.assertEqual(BillingMessage.objects.filter(status=BillingMessage.STATUS_SENT).count(), 11)
+
+    def test_failed_message_is_rescheduled_with_backoff(self):
+        """Tests that a failed send goes back to the queue with the error and a later attempt."""
+        drain_billing_outbox(worker_id='worker-1')
+
+        message = BillingMessage.objects.get(member=self.members[3])
+        self.assertEqual(message.status, BillingMessage.STATUS_PENDING)
+        self.assertEqual(message.attempts, 1)
+        self.assertEqual(message.locked_until, None)
+        self.assertIn('Invalid WhatsApp number', message.last_error)
+        self.assertGreater(message.next_attempt_at, now())
+
+        # O backoff impede que a próxima execução tente de novo imediatamente
+        self.assertEqual(drain_billing_outbox(worker_id='worker-2')['failed'], 0)
+
+    @override_settings(BILLING_OUTBOX_MAX_ATTEMPTS=1)
+    def test_message_fails_permanently_after_max_attempts(self):
+        """Tests that a message stops being retried after BILLING_OUTBOX_MAX_ATTEMPTS."""
+        drain_billing_outbox(worker_id='worker-1')
+
+        message = BillingMessage.objects.get(member=self.members[3])
+        self.assertEqual(message.status, BillingMessage.STATUS_FAILED)
+
+
+    @override_settings(ULTRAMSG_RATE_LIMIT=0.1, ULTRAMSG_RATE_BURST=2, ULTRAMSG_RATE_LIMIT_MAX_WAIT=0.01)
+    def test_throttled_messages_are_requeued_without_counting_the_attempt(self):
+        """Tests that messages stopped by the rate limit go back to the queue for later."""
+        summary = drain_billing_outbox(worker_id='worker-1', max_workers=1)
+
+        self.assertEqual(summary['sent'], 2)
+        self.assertEqual(len(self.stub.requests), 2)
+
+        requeued = BillingMessage.objects.filter(status=BillingMessage.STATUS_PENDING)
+        self.assertEqual(requeued.count(), 10)
+        self.assertEqual(set(requeued.values_list('attempts', flat=True)), {0})
+        self.assertTrue(all(message.next_attempt_at > now() for message in requeued))
+
+    def test_each_try_is_logged_as_a_message_attempt(self):
+        """Tests that every send is recorded with its latency and error class."""
+        send_billing_messages(concurrency=4)
+
+        self.assertEqual(MessageAttempt.objects.count(), 12)
+        failed = MessageAttempt.objects.get(ok=False)
+        self.assertEqual(failed.recipient, '85988880003')
+        self.assertEqual(failed.member, self.members[3])
+        self.assertEqual(failed.error_class, 'HTTP200')
+        self.assertIsNotNone(failed.latency_ms)
+
+    @override_settings(MESSAGING_PHONE_MAX_FAILURES=1, NOTIFICATION_CHANNELS={
+        'whatsapp': {'queue': 'whatsapp', 'concurrency': 1, 'fallback': None},
+        'email': {'queue': 'email', 'concurrency': 1, 'fallback': None},
+    })
+    def test_rejected_phone_is_blocked_and_skipped(self):
+        """Tests that a number the provider keeps rejecting stops receiving billing messages."""
+        drain_billing_outbox(worker_id='worker-1')
+
+        member = Member.objects.get(pk=self.members[3].pk)
+        self.assertEqual(member.phone_failures, 1)
+        self.assertTrue(member.is_phone_blocked)
+
+        BillingMessage.objects.filter(member=member).update(next_attempt_at=now())
+        summary = drain_billing_outbox(worker_id='worker-2')
+
+        self.assertEqual(summary['cancelled'], 1)
+        self.assertEqual(len(self.stub.requests), 12)
+        self.assertEqual(BillingMessage.objects.get(member=member).status, BillingMessage.STATUS_CANCELLED)
+
+    @override_settings(MESSAGING_PHONE_MAX_FAILURES=1, ULTRAMSG_CIRCUIT_FAILURE_THRESHOLD=3)
+    def test_account_error_does_not_block_phones(self):
+        """Tests that an UltraMsg account error (e.g. wrong token) opens the circuit instead of blocking every phone."""
+        self.stub.valid_token = 'outro-token'
+
+        summary = drain_billing_outbox(worker_id='worker-1', max_workers=1)
+
+        self.assertFalse(Member.objects.filter(phone_failures__gt=0).exists())
+        self.assertEqual(summary['sent'], 0)
+        self.assertEqual(len(self.stub.requests), 3)
+        # As mensagens barradas pelo circuito aberto voltam para a fila sem contar tentativa
+        self.assertEqual(BillingMessage.objects.filter(status=BillingMessage.STATUS_PENDING, attempts=0).count(), 9)
+
+    @override_settings(MESSAGING_PHONE_MAX_FAILURES=1)
+    def test_blocked_phone_falls_back_to_email(self):
+        """Tests that a member whose phone is blocked receives the billing message by email."""
+        drain_billing_outbox(worker_id='worker-1')
+
+        member = Member.objects.get(pk=self.members[3].pk)
+        BillingMessage.objects.filter(member=member).update(next_attempt_at=now())
+        summary = drain_billing_outbox(worker_id='worker-2')
+
+        self.assertEqual((summary['cancelled'], summary['handed_off']), (0, 1))
+        self.assertEqual(len(self.stub.requests), 12)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, [member.email])
+        self.assertIn(member.full_name, mail.outbox[0].body)
+
+        message = BillingMessage.objects.get(member=member)
+        self.assertEqual(message.status, BillingMessage.STATUS_SENT)
+        attempt = MessageAttempt.objects.get(channel=MessageAttempt.CHANNEL_EMAIL)
+        self.assertEqual((attempt.recipient, attempt.ok, attempt.billing_message), (member.email, True, message))
+        # O e-mail entregue não conta como telefone válido
+        self.assertTrue(Member.objects.get(pk=member.pk).is_phone_blocked)
+
+    def test_member_without_valid_phone_is_billed_by_email(self):
+        """Tests that a member whose phone cannot receive WhatsApp is billed by email only."""
+        Member.objects.filter(pk=self.members[0].pk).update(phone='123')
+
+        summary = drain_billing_outbox(worker_id='worker-1')
+
+        self.assertEqual(summary['handed_off'], 1)
+        self.assertEqual(len(self.stub.requests), 11)
+        self.assertEqual([email.to for email in mail.outbox], [[self.members[0].email]])
+
+class BillingOutboxClaimTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.members = [
+            Member.objects.create(email=f'aluno{i}@teste.com', full_name=f'Aluno {i}', phone=f'859888800{i:02d}')
+            for i in range(5)
+        ]
+        for member in cls.members:
+            BillingMessage.objects.create(member=member)
+
+    def test_claimed_messages_are_not_claimed_by_another_worker(self):
+        """Tests that two workers receive disjoint batches."""
+        first = BillingMessage.claim_batch('worker-1', batch_size=3)
+        second = BillingMessage.claim_batch('worker-2', batch_size=3)
+
+        self.assertEqual(len(first), 3)
+        self.assertEqual(len(second), 2)
+        self.assertFalse({message.id for message in first} & {message.id for message in second})
+        self.assertEqual(BillingMessage.claim_batch('worker-3'), [])
+
+        claimed = BillingMessage.objects.get(id=first[0].id)
+        self.assertEqual(claimed.status, BillingMessage.STATUS_SENDING)
+        self.assertEqual(claimed.locked_by, 'worker-1')
+        self.assertEqual(claimed.attempts, 1)
+
+    def test_expired_lease_is_claimed_again(self):
+        """Tests that messages from a worker that died are recovered after the lease expires."""
+        claimed = BillingMessage.claim_batch('worker-1', batch_size=5)
+        BillingMessage.objects.update(locked_until=now() - timedelta(seconds=1))
+
+        reclaimed = BillingMessage.claim_batch('worker-2', batch_size=5)
+
+        self.assertEqual(len(reclaimed), len(claimed))
+        self.assertEqual(reclaimed[0].attempts, 2)
+        # O worker antigo não consegue mais gravar o resultado das mensagens
+        self.assertEqual(BillingMessage.mark_sent({message.id: None for message in claimed}, 'worker-1'), 0)
+
+    def test_messages_of_active_members_are_cancelled(self):
+        """Tests that pending messages of members who paid are cancelled instead of sent."""
+        Member.objects.filter(pk=self.members[0].pk).update(is_active=True)
+
+        self.assertEqual(BillingMessage.cancel_paid(), 1)
+        self.assertEqual(len(BillingMessage.claim_batch('worker-1', batch_size=10)), 4)
+        self.assertEqual(
+            BillingMessage.objects.get(member=self.members[0]).status, BillingMessage.STATUS_CANCELLED
+        )
+
+
+@override_settings(MESSAGING_BACKEND='utils.messaging.LocmemBackend', BILLING_SEND_WINDOWS=[])
+class LocmemBillingMessagesTest(TestCase):
+
+    def test_billing_pipeline_runs_offline_with_the_locmem_backend(self):
+        """Tests that the whole outbox can be drained without UltraMsg credentials."""
+        clear_outbox()
+        for i in range(3):
+            member = Member.objects.create(email=f'aluno{i}@teste.com', full_name=f'Aluno {i}', phone=f'859888800{i:02d}')
+            BillingMessage.objects.create(member=member)
+
+        summary = send_billing_messages()
+
+        self.assertEqual(summary['sent'], 3)
+        self.assertEqual(sorted(message['to'] for message in messaging.outbox), [
+            '5585988880000', '5585988880001', '5585988880002'
+        ])
+
+
+class SendWindowTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        today = localdate()
+        cls.recent = Member.objects.create(
+            email='recente@teste.com', full_name='Recente', phone='85988880001', paid_until=today - timedelta(days=1)
+        )
+        cls.oldest = Member.objects.create(
+            email='antigo@teste.com', full_name='Antigo', phone='85988880002', paid_until=today - timedelta(days=40)
+        )
+        BillingMessage.enqueue_for_members([cls.recent.pk, cls.oldest.pk])
+
+    def at(self, hour, minute=0):
+        return localtime().replace(hour=hour, minute=minute, second=0, microsecond=0)
+
+    def test_send_window_end(self):
+        windows = ['09:00-12:00', '14:00-20:00']
+
+        self.assertEqual(get_send_window_end(self.at(10), windows), self.at(12))
+        self.assertEqual(get_send_window_end(self.at(19, 59), windows), self.at(20))
+        self.assertIsNone(get_send_window_end(self.at(12, 30), windows))
+        self.assertIsNone(get_send_window_end(self.at(23, 30), windows))
+
+    def test_send_window_crossing_midnight(self):
+        windows = ['22:00-02:00']
+
+        self.assertEqual(get_send_window_end(self.at(23), windows), self.at(2) + timedelta(days=1))
+        self.assertEqual(get_send_window_end(self.at(1, 30), windows), self.at(2))
+        self.assertIsNone(get_send_window_end(self.at(2), windows))
+        self.assertIsNone(get_send_window_end(self.at(12), windows))
+
+    def test_empty_send_window_is_rejected(self):
+        with self.assertRaises(ImproperlyConfigured):
+            get_send_window_end(self.at(10), ['10:00-10:00'])
+
+    def test_next_send_window_start(self):
+        windows = ['09:00-12:00', '14:00-20:00']
+
+        self.assertEqual(get_next_send_window_start(self.at(12, 30), windows), self.at(14))
+        self.assertEqual(get_next_send_window_start(self.at(23, 30), windows), self.at(9) + timedelta(days=1))
+
+    @override_settings(MESSAGING_BACKEND='utils.messaging.LocmemBackend')
+    def test_messages_are_held_outside_the_window(self):
+        """Tests that nothing is sent outside the send windows."""
+        clear_outbox()
+
+        with patch('members.tasks.get_send_window_end', return_value=None):
+            summary = send_billing_messages()
+
+        self.assertEqual(summary['held'], 2)
+        self.assertEqual(messaging.outbox, [])
+        self.assertEqual(BillingMessage.objects.filter(status=BillingMessage.STATUS_PENDING).count(), 2)
+
+    def test_most_overdue_members_are_claimed_first(self):
+        claimed = BillingMessage.claim_batch('worker-1', batch_size=1)
+
+        self.assertEqual(claimed[0].member, self.oldest)
+        # A prioridade fica em next_attempt_at, coberto pelo índice (status, next_attempt_at)
+        self.assertEqual(localtime(claimed[0].next_attempt_at).date(), self.oldest.paid_until + timedelta(days=1))
+
+    @override_settings(MESSAGING_BACKEND='utils.messaging.LocmemBackend', BILLING_SEND_WINDOWS=[])
+    def test_overlapping_runs_drain_different_messages(self):
+        """Tests that a run started while another drain holds a batch sends only the messages left in the queue."""
+        clear_outbox()
+        claimed = BillingMessage.claim_batch('other-worker', batch_size=1)
+
+        summary = send_billing_messages()
+
+        self.assertEqual(summary['sent'], 1)
+        self.assertEqual(len(messaging.outbox), 1)
+        self.assertEqual(BillingMessage.objects.get(locked_by='other-worker'), claimed[0])
+        self.assertEqual(BillingMessage.objects.get(pk=claimed[0].pk).status, BillingMessage.STATUS_SENDING)
+
+    @override_settings(MESSAGING_BACKEND='utils.messaging.LocmemBackend', BILLING_OUTBOX_LEASE_SECONDS=2)
+    def test_batch_size_fits_in_the_lease_at_the_drain_rate(self):
+        """Tests that a batch is never larger than what the rate limiter can send in half the lease."""
+        with patch.object(BillingMessage, 'claim_batch', wraps=BillingMessage.claim_batch) as claim_batch:
+            drain_billing_outbox(worker_id='worker-1', rate_limiter=InMemoryTokenBucket('test', rate=1000, capacity=1000))
+            drain_billing_outbox(worker_id='worker-2', rate_limiter=InMemoryTokenBucket('test', rate=1, capacity=1))
+
+        self.assertEqual(claim_batch.call_args_list[0].kwargs['batch_size'], 50)
+        self.assertEqual(claim_batch.call_args_list[-1].kwargs['batch_size'], 1)
+
+    @override_settings(MESSAGING_BACKEND='utils.messaging.LocmemBackend')
+    def test_rate_limit_wait_does_not_outlive_the_lease(self):
+        """Tests that a message whose lease would expire while waiting for a token goes back to the queue unsent."""
+        clear_outbox()
+        messages = BillingMessage.claim_batch('worker-1', batch_size=2, lease_seconds=1)
+        rate_limiter = InMemoryTokenBucket('test', rate=0.1, capacity=1)
+
+        summary = send_billing_messages_concurrently(messages, 'worker-1', max_workers=1, rate_limiter=rate_limiter)
+
+        self.assertEqual((summary['sent'], summary['failed']), (1, 1))
+        self.assertEqual(len(messaging.outbox), 1)
+        released = BillingMessage.objects.get(status=BillingMessage.STATUS_PENDING)
+        self.assertEqual(released.attempts, 0)
+        self.assertGreater(released.next_attempt_at, now())
+
+    @override_settings(MESSAGING_BACKEND='utils.messaging.LocmemBackend')
+    def test_drain_stops_at_the_deadline(self):
+        summary = drain_billing_outbox(worker_id='worker-1', deadline=now() - timedelta(seconds=1))
+
+        self.assertEqual(summary['sent'], 0)
+        self.assertIn('elapsed_seconds', summary)
+
+    @override_settings(MESSAGING_BACKEND='utils.messaging.LocmemBackend', BILLING_SEND_WINDOWS=[])
+    def test_drain_rate_is_limited(self):
+        """Tests that the drain does not send faster than BILLING_DRAIN_RATE."""
+        with self.settings(BILLING_DRAIN_RATE=20, BILLING_DRAIN_BURST=1):
+            summary = send_billing_messages()
+
+        self.assertEqual(summary['sent'], 2)
+        self.assertGreaterEqual(summary['elapsed_seconds'], 0.04)
+
+    def test_queue_metrics(self):
+        metrics = BillingMessage.get_queue_metrics()
+
+        self.assertEqual(metrics['depth'], 2)
+        self.assertEqual(metrics['ready'], 2)
+        self.assertEqual(metrics['max_overdue_days'], 40)
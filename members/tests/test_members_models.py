@@ -2,8 +2,11 @@ from datetime import timedelta, date, datetime
 from django.test import TestCase
 from django.utils.timezone import localdate
 from parameterized import parameterized
-from members.models import Member, Payment
+from members.models import Member, Payment, BillingMessage, MessageAttempt
+from django.db import IntegrityError, transaction
 from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from io import StringIO
 
 class TestBase(TestCase):
     @classmethod
@@ -37,6 +40,42 @@ class MemberModelTestCase(TestBase):
         Payment.objects.create(member=self.member, payment_date=localdate())
         self.assertEqual(self.member.last_payment_date, localdate())
 
+    def test_payment_dates_are_stored_on_member(self):
+        """Tests that last_payment_date and paid_until are persisted when a payment is created."""
+        Payment.objects.create(member=self.member, payment_date=localdate() - timedelta(days=5))
+        Payment.objects.create(member=self.member, payment_date=localdate() - timedelta(days=10))
+        self.member.refresh_from_db()
+        self.assertEqual(self.member.last_payment_date, localdate() - timedelta(days=5))
+        self.assertEqual(self.member.paid_until, localdate() + timedelta(days=25))
+
+    def test_payment_dates_are_refreshed_when_payment_is_edited(self):
+        """Tests that editing the latest payment recalculates the member payment dates."""
+        Payment.objects.create(member=self.member, payment_date=localdate() - timedelta(days=20))
+        payment = Payment.objects.create(member=self.member, payment_date=localdate())
+        payment.payment_date = localdate() - timedelta(days=40)
+        payment.save()
+        self.member.refresh_from_db()
+        self.assertEqual(self.member.last_payment_date, localdate() - timedelta(days=20))
+
+    def test_payment_dates_are_refreshed_when_payment_is_deleted(self):
+        """Tests that deleting a payment recalculates the member payment dates."""
+        payment = Payment.objects.create(member=self.member, payment_date=localdate())
+        payment.delete()
+        self.member.refresh_from_db()
+        self.assertIsNone(self.member.last_payment_date)
+        self.assertIsNone(self.member.paid_until)
+
+    def test_backfill_payment_dates_command(self):
+        """Tests that the backfill command fills the payment dates from existing payments."""
+        Payment.objects.create(member=self.member, payment_date=localdate() - timedelta(days=3))
+        Member.objects.filter(pk=self.member.pk).update(last_payment_date=None, paid_until=None)
+
+        call_command('backfill_payment_dates', stdout=StringIO())
+
+        self.member.refresh_from_db()
+        self.assertEqual(self.member.last_payment_date, localdate() - timedelta(days=3))
+        self.assertEqual(self.member.paid_until, localdate() + timedelta(days=27))
+
     @parameterized.expand([
         (timedelta(days=15), True),  # Delta of 15 days -> should be active
         (timedelta(days=31), False),  # Delta of 31 days -> should be inactive
@@ -64,7 +103,8 @@ class PaymentModelTestCase(TestBase):
     def test_payment_save_updates_member_status(self, payment_date, expected_status):
         """Tests if the payment save method updates the member status based on payment date."""
         member = Member.objects.create(email="teste@teste.com", full_name="Teste", phone="5585966667888", is_active=False)
-        payment = Payment.objects.create(member=member, amount=100.00, payment_date=payment_date)
+        with self.captureOnCommitCallbacks(execute=True):
+            payment = Payment.objects.create(member=member, amount=100.00, payment_date=payment_date)
         
         member.refresh_from_db()
         self.assertEqual(member.is_active, expected_status)
@@ -129,3 +169,108 @@ class PaymentModelTestCase(TestBase):
         
         total_profit = Payment.get_current_year_profit()
         self.assertEqual(total_profit, 300.00)
+
+
+class BillingMessageModelTestCase(TestBase):
+
+    def test_enqueue_for_members_ignores_existing_pending_message(self):
+        """Tests that enqueueing twice keeps a single pending billing message per member."""
+        BillingMessage.enqueue_for_members([self.member.pk])
+        BillingMessage.enqueue_for_members([self.member.pk])
+        self.assertEqual(BillingMessage.objects.filter(member=self.member, status=BillingMessage.STATUS_PENDING).count(), 1)
+
+    def test_enqueue_for_members_allows_new_message_after_sent(self):
+        """Tests that a new pending message can be created once the previous one was sent."""
+        BillingMessage.objects.create(member=self.member, status=BillingMessage.STATUS_SENT)
+        BillingMessage.enqueue_for_members([self.member.pk])
+        self.assertEqual(BillingMessage.objects.filter(member=self.member).count(), 2)
+
+    def test_duplicated_pending_message_is_rejected_by_the_database(self):
+        """Tests the partial unique constraint on pending billing messages."""
+        BillingMessage.objects.create(member=self.member)
+        with self.assertRaises(IntegrityError):
+            with transaction.atomic():
+                BillingMessage.objects.create(member=self.member)
+
+
+class PaymentReminderTestCase(TestBase):
+
+    def setUp(self):
+        self.today = localdate()
+        # Vencimento (paid_until + 1) daqui a 3 dias
+        self.due = Member.objects.create(
+            full_name='Vence em 3 dias', email='due@example.com', phone='85999999999',
+            is_active=True, paid_until=self.today + timedelta(days=2)
+        )
+        Member.objects.create(
+            full_name='Vence em 4 dias', email='later@example.com', is_active=True, paid_until=self.today + timedelta(days=3)
+        )
+        Member.objects.create(
+            full_name='Inativo', email='inactive@example.com', is_active=False, paid_until=self.today + timedelta(days=2)
+        )
+
+    def test_enqueue_reminders_uses_a_single_query_for_the_due_members(self):
+        """Tests that reminders are found with one indexed query and created with one INSERT."""
+        with self.assertNumQueries(2):
+            created = BillingMessage.enqueue_reminders(self.today, days_before=[3])
+
+        self.assertEqual([message.member_id for message in created], [self.due.pk])
+        reminder = BillingMessage.objects.get(member=self.due)
+        self.assertEqual(reminder.kind, BillingMessage.KIND_REMINDER)
+        self.assertEqual(reminder.due_date, self.today + timedelta(days=3))
+        self.assertIn(f"{reminder.due_date:%d/%m/%Y}", reminder.text)
+
+    def test_reminder_and_overdue_message_can_coexist(self):
+        """Tests that the unique constraint is per member and kind."""
+        BillingMessage.enqueue_reminders(self.today, days_before=[3])
+        BillingMessage.enqueue_reminders(self.today, days_before=[3])
+        BillingMessage.enqueue_for_members([self.due.pk])
+
+        self.assertEqual(BillingMessage.objects.filter(member=self.due).count(), 2)
+
+    def test_reminder_is_claimed_for_active_members(self):
+        BillingMessage.enqueue_reminders(self.today, days_before=[3])
+
+        claimed = BillingMessage.claim_batch('worker-1')
+
+        self.assertEqual([message.member_id for message in claimed], [self.due.pk])
+
+    def test_reminder_is_cancelled_after_payment(self):
+        BillingMessage.enqueue_reminders(self.today, days_before=[3])
+        Member.objects.filter(pk=self.due.pk).update(paid_until=self.today + timedelta(days=32))
+
+        self.assertEqual(BillingMessage.cancel_paid(), 1)
+        self.assertEqual(BillingMessage.claim_batch('worker-1'), [])
+
+
+class MessageAttemptModelTestCase(TestBase):
+
+    def test_get_channel_stats_builds_latency_histogram(self):
+        """Tests success rate and latency histogram aggregation per channel."""
+        MessageAttempt.objects.bulk_create([
+            MessageAttempt(recipient='1', ok=True, latency_ms=50),
+            MessageAttempt(recipient='1', ok=True, latency_ms=100),
+            MessageAttempt(recipient='1', ok=True, latency_ms=700),
+            MessageAttempt(recipient='1', ok=False, latency_ms=9000, error_class='ReadTimeout', requests=4),
+            MessageAttempt(recipient='1', ok=True, latency_ms=200, channel='email'),
+        ])
+
+        stats = {row['channel']: row for row in MessageAttempt.get_channel_stats()}
+
+        self.assertEqual(stats['whatsapp']['total'], 4)
+        self.assertEqual(stats['whatsapp']['success_rate'], 75.0)
+        self.assertEqual(stats['whatsapp']['retried'], 1)
+        self.assertEqual(dict(stats['whatsapp']['histogram']), {
+            '0-100ms': 2, '100-250ms': 0, '250-500ms': 0, '500-1000ms': 1,
+            '1000-2500ms': 0, '2500-5000ms': 0, '>5000ms': 1,
+        })
+        self.assertEqual(dict(stats['email']['histogram'])['100-250ms'], 1)
+
+    def test_register_phone_results(self):
+        """Tests that rejections add up and a delivery resets the counter."""
+        Member.register_phone_results(rejected_ids=[self.member.pk])
+        Member.register_phone_results(rejected_ids=[self.member.pk])
+        self.assertEqual(Member.objects.get(pk=self.member.pk).phone_failures, 2)
+
+        Member.register_phone_results(delivered_ids=[self.member.pk])
+        self.assertEqual(Member.objects.get(pk=self.member.pk).phone_failures, 0)
@@ -0,0 +1,131 @@
+from django.core import mail
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from io import StringIO
+from unittest.mock import patch
+from members.models import Member, MessageAttempt
+from members.notifications import email_members, notify_member
+from members.tasks import send_bulk_email, send_notification
+from utils import messaging
+from utils.messaging import clear_outbox
+from utils.tests.test_utils import FlakyBackend
+
+
+@override_settings(MESSAGING_BACKEND='utils.messaging.LocmemBackend', MESSAGING_PHONE_MAX_FAILURES=1)
+class NotifyMemberTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.member = Member.objects.create(email='aluno@teste.com', full_name='Aluno Teste', phone='85999999999')
+
+    def setUp(self):
+        clear_outbox()
+
+    def notify(self, member, channels=('whatsapp',)):
+        with patch.object(send_notification, 'apply_async', wraps=send_notification.apply_async) as apply_async:
+            channels = notify_member(member, 'Aviso', 'Olá!', channels)
+        return channels, [call.kwargs['queue'] for call in apply_async.call_args_list]
+
+    def test_each_channel_goes_to_its_own_queue(self):
+        """Tests that the notification is sent once per channel, each on the channel's Celery queue."""
+        channels, queues = self.notify(self.member, ('whatsapp', 'email'))
+
+        self.assertEqual(channels, ['whatsapp', 'email'])
+        self.assertEqual(queues, ['whatsapp', 'email'])
+        self.assertEqual(messaging.outbox[0]['to'], '5585999999999')
+        self.assertEqual(mail.outbox[0].to, ['aluno@teste.com'])
+        self.assertEqual(
+            set(MessageAttempt.objects.values_list('channel', 'recipient', 'member')),
+            {('whatsapp', '85999999999', self.member.id), ('email', 'aluno@teste.com', self.member.id)},
+        )
+
+    def test_blocked_phone_falls_back_to_email(self):
+        """Tests that a member whose phone is blocked is notified by email instead."""
+        Member.objects.filter(pk=self.member.pk).update(phone_failures=1)
+
+        channels, queues = self.notify(Member.objects.get(pk=self.member.pk))
+
+        self.assertEqual((channels, queues), (['email'], ['email']))
+        self.assertEqual(messaging.outbox, [])
+        self.assertEqual(len(mail.outbox), 1)
+
+
+class RunChannelWorkerCommandTest(TestCase):
+
+    @override_settings(NOTIFICATION_CHANNELS={
+        'whatsapp': {'queue': 'whatsapp', 'concurrency': 8, 'fallback': 'email'},
+        'email': {'queue': 'email', 'concurrency': 2, 'fallback': None},
+    })
+    @patch('project.celery.app.worker_main')
+    def test_worker_consumes_only_the_channel_queue(self, worker_main):
+        call_command('run_channel_worker', 'email', stdout=StringIO())
+
+        argv = worker_main.call_args[0][0]
+        self.assertIn('--queues=email', argv)
+        self.assertIn('--concurrency=2', argv)
+        self.assertIn('--hostname=email@%h', argv)
+
+
+@override_settings(EMAIL_RETRY_BACKOFF=0)
+class TaskRoutesTest(TestCase):
+
+    def test_billing_drain_runs_on_the_default_queue(self):
+        """Tests that the billing drain is consumed by the default worker, so it never stops for lack of a channel worker."""
+        from project.celery import app
+
+        route = app.amqp.router.route({}, 'members.tasks.send_billing_messages')
+
+        self.assertEqual(route['queue'].name, app.conf.task_default_queue)
+
+
+class BulkEmailTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.members = [
+            Member.objects.create(email=f'aluno{i}@teste.com', full_name=f'Aluno {i}', phone=f'859888800{i:02d}')
+            for i in range(5)
+        ]
+
+    def test_members_are_emailed_in_batches(self):
+        """Tests that each batch becomes one task on the email queue and every member gets the email."""
+        with patch.object(send_bulk_email, 'apply_async', wraps=send_bulk_email.apply_async) as apply_async:
+            tasks = email_members(Member.objects.all(), 'Extrato', lambda member: f'Olá, {member.full_name}!', batch_size=2)
+
+        self.assertEqual(tasks, 3)
+        self.assertEqual({call.kwargs['queue'] for call in apply_async.call_args_list}, {'email'})
+        self.assertEqual(sorted(email.to[0] for email in mail.outbox), [member.email for member in self.members])
+        self.assertIn('Olá, Aluno', mail.outbox[0].body)
+
+    @override_settings(EMAIL_MAX_RETRIES=2)
+    def test_failed_emails_are_retried(self):
+        """Tests that only the emails that failed are sent again, up to EMAIL_MAX_RETRIES times."""
+        messages = [{'subject': 'Aviso', 'body': 'Olá', 'to': member.email} for member in self.members[:2]]
+        outcomes = [(1, [(messages[1], 'SMTPServerDisconnected')]), (0, [(messages[1], 'SMTPServerDisconnected')]), (1, [])]
+
+        with patch('members.tasks.send_mass_email', side_effect=outcomes) as send_mass_email:
+            send_bulk_email.delay(messages)
+
+        self.assertEqual(send_mass_email.call_count, 3)
+        self.assertEqual(send_mass_email.call_args_list[1].args[0], [messages[1]])
+
+    @override_settings(EMAIL_MAX_RETRIES=2)
+    def test_connection_failure_is_retried(self):
+        """Tests that a batch lost because the SMTP connection could not be opened is sent on the retry."""
+        messages = [{'subject': 'Aviso', 'body': 'Olá', 'to': member.email} for member in self.members[:2]]
+
+        connections = [FlakyBackend(failing_opens=1), FlakyBackend()]
+
+        with patch('utils.utils.get_connection', side_effect=connections):
+            send_bulk_email.delay(messages)
+
+        self.assertEqual(sorted(email.to[0] for email in mail.outbox), [message['to'] for message in messages])
+
+    @override_settings(EMAIL_MAX_RETRIES=1)
+    def test_retries_stop_after_max_retries(self):
+        messages = [{'subject': 'Aviso', 'body': 'Olá', 'to': 'aluno0@teste.com'}]
+
+        with patch('members.tasks.send_mass_email', return_value=(0, [(messages[0], 'erro')])) as send_mass_email:
+            send_bulk_email.delay(messages)
+
+        self.assertEqual(send_mass_email.call_count, 2)
@@ -1,5 +1,8 @@
+from django.db import connection
 from django.test import TestCase
-from datetime import timedelta
+from django.test.utils import CaptureQueriesContext
+from datetime import date, timedelta
+from admin_panel.models import ActivityLog
 from members.models import Member, Payment
 from django.utils.timezone import localdate
 from unittest.mock import patch
@@ -64,7 +67,8 @@ class PaymentSignalsTest(TestCase):
         Tests that creating a Payment calls update_activity_status and logs 
         the payment in ActivityLog.
         """
-        Payment.objects.create(member=self.member, **self.payment_data)
+        with self.captureOnCommitCallbacks(execute=True):
+            Payment.objects.create(member=self.member, **self.payment_data)
         mock_update_status.assert_called_once()
         self.assertEqual(mock_create.call_count, 1)
         self.assertIn('realizou um pagamento de R$ 100.0', mock_create.call_args[1]['description'])
@@ -85,10 +89,89 @@ class PaymentSignalsTest(TestCase):
         """
         # Update a payment field (e.g., payment_date)
         self.payment_update.payment_date = localdate() - timedelta(days=1)
-        self.payment_update.save()  # Triggers post_save, but `created` will be False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.payment_update.save()  # Triggers post_save, but `created` will be False
         
         # Ensure no ActivityLog is created for the Payment update
         mock_create.assert_not_called()
 
         # Ensure Member's activity status update is called
         mock_update_status.assert_called_once()
+
+
+class MemberChangeTrackingTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.member = Member.objects.create(
+            email='teste@teste.com', full_name='Aluno Teste', phone='5585966667843', is_active=True
+        )
+
+    def test_save_without_changes_is_not_logged(self):
+        """Tests that saving a Member without changing any field does not write an 'updated' log."""
+        member = Member.objects.get(pk=self.member.pk)
+        member.save()
+
+        self.assertFalse(ActivityLog.objects.filter(event_type='updated').exists())
+
+    def test_changed_fields_are_recorded(self):
+        """Tests that the 'updated' log stores only the fields that changed, with the old and new values."""
+        member = Member.objects.get(pk=self.member.pk)
+        member.full_name = 'Aluno Renomeado'
+        member.phone = '5585966667843'
+        member.save()
+
+        log = ActivityLog.objects.get(event_type='updated')
+        self.assertEqual(log.changes, {'full_name': ['Aluno Teste', 'Aluno Renomeado']})
+
+    def test_get_changes_tracks_fields_since_load(self):
+        member = Member.objects.get(pk=self.member.pk)
+        self.assertEqual(member.get_changes(), {})
+
+        member.start_date = '2024-01-10'
+        self.assertEqual(member.get_changes(), {'start_date': [self.member.start_date, date(2024, 1, 10)]})
+
+        member.save()
+        self.assertEqual(member.get_changes(), {})
+
+    def test_refresh_from_db_resets_tracked_values(self):
+        """Tests that, after refresh_from_db, saving an unchanged member does not log stale changes."""
+        member = Member.objects.get(pk=self.member.pk)
+        Member.objects.filter(pk=member.pk).update(full_name='Aluno Atualizado')
+
+        member.refresh_from_db()
+        self.assertEqual(member.get_changes(), {})
+        member.save()
+
+        self.assertFalse(ActivityLog.objects.filter(event_type='updated').exists())
+
+    def test_refresh_from_db_of_some_fields(self):
+        member = Member.objects.get(pk=self.member.pk)
+        member.phone = '5585911112222'
+        Member.objects.filter(pk=member.pk).update(full_name='Aluno Atualizado')
+
+        member.refresh_from_db(fields=['full_name'])
+
+        self.assertEqual(member.get_changes(), {'phone': ['5585966667843', '5585911112222']})
+
+    def test_update_activity_status_writes_only_changed_columns(self):
+        """Tests that the nightly status update saves only is_active (and updated_at) when it changes."""
+        Member.objects.filter(pk=self.member.pk).update(paid_until=localdate() - timedelta(days=1))
+        member = Member.objects.get(pk=self.member.pk)
+
+        with CaptureQueriesContext(connection) as queries:
+            member.update_activity_status()
+
+        updates = [query['sql'] for query in queries if query['sql'].startswith('UPDATE "members_member"')]
+        self.assertEqual(len(updates), 1)
+        self.assertIn('"is_active"', updates[0])
+        self.assertNotIn('"full_name"', updates[0])
+        self.assertEqual(ActivityLog.objects.get(event_type='updated').changes, {'is_active': [True, False]})
+
+    def test_update_activity_status_without_change_does_not_save(self):
+        member = Member.objects.get(pk=self.member.pk)
+
+        with self.assertNumQueries(0):
+            member.update_activity_status()
+
+        self.assertFalse(ActivityLog.objects.filter(event_type='updated').exists())
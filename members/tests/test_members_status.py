@@ -0,0 +1,97 @@
+from datetime import timedelta
+from unittest.mock import patch
+from django.db import transaction
+from django.test import TestCase
+from django.utils.timezone import localdate
+from members.models import Member, Payment
+from members.status import deferred_status_recompute
+
+
+class StatusRecomputeTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.member = Member.objects.create(
+            email='teste@teste.com',
+            full_name='Aluno Teste',
+            phone='5585966667843',
+            is_active=False
+        )
+
+    @patch('members.models.Member.update_activity_status')
+    def test_recompute_runs_only_after_commit(self, mock_update_status):
+        """Tests that the status is not recomputed before the transaction commits."""
+        with self.captureOnCommitCallbacks(execute=True):
+            Payment.objects.create(member=self.member, payment_date=localdate())
+            mock_update_status.assert_not_called()
+
+        mock_update_status.assert_called_once()
+
+    @patch('members.models.Member.update_activity_status')
+    def test_many_payments_for_one_member_recompute_once(self, mock_update_status):
+        """Tests that N payments for the same member in one transaction trigger a single recompute."""
+        with self.captureOnCommitCallbacks(execute=True):
+            for days in range(5):
+                Payment.objects.create(member=self.member, payment_date=localdate() - timedelta(days=days))
+
+        mock_update_status.assert_called_once()
+
+    @patch('members.models.Member.update_activity_status')
+    def test_deferred_status_recompute_runs_once_at_the_end(self, mock_update_status):
+        """Tests that deferred_status_recompute holds the recomputes until the block exits."""
+        other = Member.objects.create(email='outro@teste.com', full_name='Outro Aluno', phone='5585966667844')
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with deferred_status_recompute():
+                for member in [self.member, other, self.member]:
+                    Payment.objects.create(member=member, payment_date=localdate())
+                self.assertEqual(len(callbacks), 0)
+
+        self.assertEqual(mock_update_status.call_count, 2)
+
+    @patch('members.models.Member.update_activity_status')
+    def test_deferred_status_recompute_is_dropped_on_rollback(self, mock_update_status):
+        """Tests that held recomputes are dropped when the block raises and its transaction rolls back."""
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertRaises(ValueError):
+                with transaction.atomic():
+                    with deferred_status_recompute():
+                        Payment.objects.create(member=self.member, payment_date=localdate())
+                        raise ValueError
+
+        mock_update_status.assert_not_called()
+
+    @patch('members.models.Member.update_activity_status')
+    def test_deferred_status_recompute_keeps_saved_rows_on_error(self, mock_update_status):
+        """Tests that rows saved before an error still get their recompute when they are committed."""
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertRaises(ValueError):
+                with deferred_status_recompute():
+                    Payment.objects.create(member=self.member, payment_date=localdate())
+                    raise ValueError
+
+        mock_update_status.assert_called_once()
+
+    @patch('members.status.recompute_members_status')
+    def test_rolled_back_ids_do_not_leak_into_the_next_commit(self, mock_recompute):
+        """Tests that members scheduled in a rolled-back transaction are not recomputed by the next one."""
+        other = Member.objects.create(email='outro@teste.com', full_name='Outro Aluno', phone='5585966667844')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertRaises(ValueError):
+                with transaction.atomic():
+                    Payment.objects.create(member=self.member, payment_date=localdate())
+                    raise ValueError
+
+            with transaction.atomic():
+                Payment.objects.create(member=other, payment_date=localdate())
+
+        mock_recompute.assert_called_once_with({other.pk})
+
+    def test_status_is_updated_after_commit(self):
+        """Tests that the member status reflects the payment once the transaction commits."""
+        with self.captureOnCommitCallbacks(execute=True):
+            Payment.objects.create(member=self.member, payment_date=localdate())
+
+        self.member.refresh_from_db()
+        self.assertTrue(self.member.is_active)
@@ -1,7 +1,9 @@
 from django.test import TestCase
+from django.utils.timezone import localdate
+from datetime import timedelta
 from unittest.mock import patch
-from members.models import Member
-from members.tasks import update_members_activity_status
+from members.models import Member, BillingMessage, ProcessingWatermark
+from members.tasks import enqueue_payment_reminders, update_members_activity_status
 
 class CeleryTasksTest(TestCase):
     
@@ -9,9 +11,12 @@ class CeleryTasksTest(TestCase):
     def test_update_members_activity_status_task(self, mock_update_status):
         """Testa a task de atualização de status dos membros."""
     
-        # Cria membros com status 'is_active=True'
-        member1 = Member.objects.create(full_name="Membro 1", email="membro1@example.com", is_active=True)
-        member2 = Member.objects.create(full_name="Membro 2", email="membro2@example.com", is_active=True)
+        # Cria membros com status 'is_active=True' e pagamento vencido
+        overdue = localdate() - timedelta(days=1)
+        member1 = Member.objects.create(full_name="Membro 1", email="membro1@example.com", is_active=True, paid_until=overdue)
+        member2 = Member.objects.create(full_name="Membro 2", email="membro2@example.com", is_active=True, paid_until=overdue)
+        # Membro em dia não precisa ser verificado
+        Member.objects.create(full_name="Membro 3", email="membro3@example.com", is_active=True, paid_until=localdate())
     
         # Executa a task
         update_members_activity_status()
@@ -21,3 +26,90 @@ class CeleryTasksTest(TestCase):
     
         # Apenas garante que o mock foi chamado. Não precisa verificar os argumentos.
         mock_update_status.assert_any_call()
+
+    def test_update_members_activity_status_bulk(self):
+        """Testa o modo em lote da task de atualização de status."""
+        overdue = localdate() - timedelta(days=1)
+        member1 = Member.objects.create(full_name="Membro 1", email="membro1@example.com", is_active=True, paid_until=overdue)
+        member2 = Member.objects.create(full_name="Membro 2", email="membro2@example.com", is_active=True, paid_until=overdue)
+        member3 = Member.objects.create(full_name="Membro 3", email="membro3@example.com", is_active=True, paid_until=localdate())
+        BillingMessage.objects.create(member=member2)
+
+        report = update_members_activity_status(bulk=True)
+
+        self.assertEqual(report['members_updated'], 2)
+        self.assertEqual(report['billing_messages_queued'], 2)
+        self.assertIn('elapsed_seconds', report)
+
+        self.assertFalse(Member.objects.get(pk=member1.pk).is_active)
+        self.assertFalse(Member.objects.get(pk=member2.pk).is_active)
+        self.assertTrue(Member.objects.get(pk=member3.pk).is_active)
+        self.assertEqual(BillingMessage.objects.filter(member__in=[member1, member2], status=BillingMessage.STATUS_PENDING).count(), 2)
+
+    def test_update_members_activity_status_bulk_uses_constant_queries(self):
+        """Testa que o modo em lote não faz consultas por membro."""
+        overdue = localdate() - timedelta(days=1)
+        for i in range(20):
+            Member.objects.create(full_name=f"Membro {i}", email=f"membro{i}@example.com", is_active=True, paid_until=overdue)
+
+        # SAVEPOINT, SELECT, UPDATE, 2 INSERTs e RELEASE
+        with self.assertNumQueries(6):
+            report = Member.bulk_update_activity_status()
+
+        self.assertEqual(report['members_updated'], 20)
+
+    def test_update_members_activity_status_saves_watermark(self):
+        """Testa que a task registra a data processada."""
+        update_members_activity_status(bulk=True)
+
+        watermark = ProcessingWatermark.objects.get(name='update_members_activity_status')
+        self.assertEqual(watermark.last_processed_date, localdate())
+
+    def test_update_members_activity_status_only_checks_members_due_since_last_run(self):
+        """Testa que a task só verifica quem venceu depois da última execução, inclusive noites perdidas."""
+        ProcessingWatermark.objects.create(
+            name='update_members_activity_status',
+            last_processed_date=localdate() - timedelta(days=3)
+        )
+        # Venceu antes da última execução (status já tratado ou alterado manualmente)
+        old = Member.objects.create(full_name="Antigo", email="antigo@example.com", is_active=True, paid_until=localdate() - timedelta(days=10))
+        # Venceu nas noites em que a task não rodou
+        missed = Member.objects.create(full_name="Perdido", email="perdido@example.com", is_active=True, paid_until=localdate() - timedelta(days=3))
+        recent = Member.objects.create(full_name="Recente", email="recente@example.com", is_active=True, paid_until=localdate() - timedelta(days=1))
+
+        report = update_members_activity_status(bulk=True)
+
+        self.assertEqual(report['members_updated'], 2)
+        self.assertTrue(Member.objects.get(pk=old.pk).is_active)
+        self.assertFalse(Member.objects.get(pk=missed.pk).is_active)
+        self.assertFalse(Member.objects.get(pk=recent.pk).is_active)
+
+        # Uma segunda execução no mesmo dia não encontra ninguém
+        report = update_members_activity_status(bulk=True)
+        self.assertEqual(report['members_updated'], 0)
+
+    def test_update_members_activity_status_full_scan(self):
+        """Testa que full_scan ignora a marca da última execução."""
+        ProcessingWatermark.objects.create(name='update_members_activity_status', last_processed_date=localdate())
+        member = Member.objects.create(full_name="Antigo", email="antigo@example.com", is_active=True, paid_until=localdate() - timedelta(days=10))
+
+        update_members_activity_status(bulk=True, full_scan=True)
+
+        self.assertFalse(Member.objects.get(pk=member.pk).is_active)
+
+    def test_enqueue_payment_reminders_runs_once_per_day(self):
+        """Testa que os lembretes do dia são enfileirados uma única vez."""
+        due = Member.objects.create(
+            full_name="Membro 1", email="membro1@example.com", is_active=True,
+            paid_until=localdate() + timedelta(days=2)
+        )
+
+        with self.settings(BILLING_REMINDER_DAYS=[3]):
+            self.assertEqual(enqueue_payment_reminders(), 1)
+            BillingMessage.objects.filter(member=due).update(status=BillingMessage.STATUS_SENT)
+            self.assertEqual(enqueue_payment_reminders(), 0)
+
+        self.assertEqual(
+            ProcessingWatermark.objects.get(name='enqueue_payment_reminders').last_processed_date, localdate()
+        )
+        self.assertEqual(BillingMessage.objects.filter(member=due, kind=BillingMessage.KIND_REMINDER).count(), 1)
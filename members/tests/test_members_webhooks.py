@@ -0,0 +1,125 @@
+import json
+import time
+from unittest.mock import patch
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from members.models import Member, BillingMessage
+from members.tasks import apply_delivery_events
+from members.billing import DELIVERY_EVENTS_QUEUE
+from utils.event_queue import get_event_queue, reset_event_queues
+
+
+@override_settings(ULTRAMSG_WEBHOOK_TOKEN='secret')
+class UltraMsgWebhookTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.members = [
+            Member.objects.create(email=f'aluno{i}@teste.com', full_name=f'Aluno {i}', phone=f'859888800{i:02d}')
+            for i in range(3)
+        ]
+        cls.messages = [
+            BillingMessage.objects.create(
+                member=member, status=BillingMessage.STATUS_SENT, provider_message_id=str(100 + i)
+            )
+            for i, member in enumerate(cls.members)
+        ]
+
+    def setUp(self):
+        reset_event_queues()
+        self.url = reverse('members:ultramsg_webhook', kwargs={'token': 'secret'})
+
+    def post_ack(self, message_id, ack, url=None):
+        payload = {'event_type': 'message_ack', 'instanceId': '1', 'id': message_id, 'data': {'id': 'wa-id', 'ack': ack}}
+        return self.client.post(url or self.url, json.dumps(payload), content_type='application/json')
+
+    def test_webhook_queues_the_event_without_touching_the_database(self):
+        with self.assertNumQueries(0):
+            response = self.post_ack('100', 'device')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(get_event_queue(DELIVERY_EVENTS_QUEUE)), 1)
+        self.assertEqual(BillingMessage.objects.get(pk=self.messages[0].pk).delivery_status, '')
+
+    def test_webhook_rejects_invalid_token(self):
+        response = self.post_ack('100', 'device', url=reverse('members:ultramsg_webhook', kwargs={'token': 'wrong'}))
+
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(len(get_event_queue(DELIVERY_EVENTS_QUEUE)), 0)
+
+    def test_webhook_rejects_invalid_json(self):
+        response = self.client.post(self.url, 'not json', content_type='application/json')
+
+        self.assertEqual(response.status_code, 400)
+
+    def test_webhook_ignores_other_events(self):
+        payload = {'event_type': 'message_received', 'data': {'id': 'x', 'body': 'Oi'}}
+        response = self.client.post(self.url, json.dumps(payload), content_type='application/json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(get_event_queue(DELIVERY_EVENTS_QUEUE)), 0)
+
+    def test_events_are_applied_in_batched_updates(self):
+        """Tests that a burst of callbacks becomes one SELECT and at most two UPDATEs per batch."""
+        for _ in range(50):
+            self.post_ack('100', 'device')
+        self.post_ack('101', 'device')
+        self.post_ack('101', 'read')
+        self.post_ack('999', 'read')
+
+        with self.assertNumQueries(3):
+            summary = apply_delivery_events()
+
+        self.assertEqual(summary, {'events': 53, 'messages_updated': 2, 'requeued': 1, 'expired': 0})
+        first, second, third = BillingMessage.objects.filter(pk__in=[m.pk for m in self.messages]).order_by('pk')
+        self.assertEqual(first.delivery_status, BillingMessage.DELIVERY_DELIVERED)
+        self.assertIsNotNone(first.delivered_at)
+        self.assertEqual(second.delivery_status, BillingMessage.DELIVERY_READ)
+        self.assertIsNotNone(second.read_at)
+        self.assertIsNotNone(second.delivered_at)
+        self.assertEqual(third.delivery_status, '')
+
+    def test_late_delivered_event_does_not_undo_read(self):
+        self.post_ack('100', 'read')
+        apply_delivery_events()
+        self.post_ack('100', 'device')
+        apply_delivery_events()
+
+        self.assertEqual(BillingMessage.objects.get(pk=self.messages[0].pk).delivery_status, BillingMessage.DELIVERY_READ)
+
+    def test_failed_batch_goes_back_to_the_queue(self):
+        self.post_ack('100', 'device')
+
+        with self.assertRaises(RuntimeError):
+            with patch.object(BillingMessage, 'apply_delivery_events', side_effect=RuntimeError):
+                apply_delivery_events()
+
+        self.assertEqual(len(get_event_queue(DELIVERY_EVENTS_QUEUE)), 1)
+
+    def test_ack_before_provider_id_is_saved_is_applied_later(self):
+        """Tests that an ack for a message whose provider id is not saved yet goes back to the queue."""
+        message = BillingMessage.objects.create(member=self.members[0], status=BillingMessage.STATUS_SENDING)
+        self.post_ack('200', 'read')
+
+        summary = apply_delivery_events()
+
+        self.assertEqual(summary['requeued'], 1)
+        self.assertEqual(len(get_event_queue(DELIVERY_EVENTS_QUEUE)), 1)
+
+        BillingMessage.objects.filter(pk=message.pk).update(status=BillingMessage.STATUS_SENT, provider_message_id='200')
+        summary = apply_delivery_events()
+
+        self.assertEqual(summary['messages_updated'], 1)
+        self.assertEqual(len(get_event_queue(DELIVERY_EVENTS_QUEUE)), 0)
+        self.assertEqual(BillingMessage.objects.get(pk=message.pk).delivery_status, BillingMessage.DELIVERY_READ)
+
+    @override_settings(BILLING_DELIVERY_EVENT_MAX_AGE=60)
+    def test_unmatched_events_expire(self):
+        self.post_ack('999', 'read')
+
+        with patch('members.tasks.time') as task_time:
+            task_time.time.return_value = time.time() + 61
+            summary = apply_delivery_events()
+
+        self.assertEqual(summary['expired'], 1)
+        self.assertEqual(len(get_event_queue(DELIVERY_EVENTS_QUEUE)), 0)
@@ -1,7 +1,8 @@
-# from django.urls import path
-# from . import views
+from django.urls import path
+from . import views
 
-# app_name = 'members'
+app_name = 'members'
 
-# urlpatterns = [
-    
+urlpatterns = [
+    path('webhooks/ultramsg/<str:token>/', views.ultramsg_webhook, name='ultramsg_webhook'),
+]
@@ -0,0 +1,44 @@
+import json
+import time
+from django.conf import settings
+from django.http import JsonResponse
+from django.utils.crypto import constant_time_compare
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+from utils.event_queue import get_event_queue
+from .billing import DELIVERY_EVENTS_QUEUE
+
+
+@csrf_exempt
+@require_POST
+def ultramsg_webhook(request, token):
+    """
+    Recebe os webhooks de entrega e leitura do UltraMsg.
+
+    Responde na hora: o evento só é colocado na fila e é aplicado às mensagens de
+    cobrança em lote pela tarefa apply_delivery_events.
+    """
+    if not settings.ULTRAMSG_WEBHOOK_TOKEN or not constant_time_compare(token, settings.ULTRAMSG_WEBHOOK_TOKEN):
+        return JsonResponse({'error': 'forbidden'}, status=403)
+
+    try:
+        payload = json.loads(request.body)
+    except ValueError:
+        payload = None
+
+    if not isinstance(payload, dict):
+        return JsonResponse({'error': 'invalid json'}, status=400)
+
+    data = payload.get('data') or {}
+
+    # Somente as confirmações (ack) de mensagens enviadas interessam; os demais eventos são ignorados
+    if payload.get('event_type') == 'message_ack' and data.get('ack'):
+        get_event_queue(DELIVERY_EVENTS_QUEUE).push({
+            # id do UltraMsg (o mesmo retornado no envio), com o id do WhatsApp como alternativa
+            'id': str(payload.get('id') or data.get('id') or ''),
+            'ack': data['ack'],
+            # O ack pode chegar antes do envio gravar o provider_message_id: a idade limita as novas tentativas
+            'received_at': time.time(),
+        })
+
+    return JsonResponse({'status': 'ok'})
@@ -53,6 +53,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'admin_panel.middleware.ActivityLogBufferMiddleware',
 ]
 
 ROOT_URLCONF = 'project.urls'
@@ -165,13 +166,91 @@ EMAIL_USE_TLS = True
 EMAIL_HOST_USER = config('EMAIL_HOST', cast=str)
 EMAIL_HOST_PASSWORD = config('EMAIL_HOST_PASSWORD', cast=str)  # Use uma senha de app se a autenticação de dois fatores estiver ativada
 DEFAULT_FROM_EMAIL = config('EMAIL_HOST', cast=str)
+# Envio em massa (ver utils.utils.send_mass_email e members.tasks.send_bulk_email)
+EMAIL_BATCH_SIZE = config('EMAIL_BATCH_SIZE', default=100, cast=int)  # e-mails por conexão SMTP
+EMAIL_MAX_RETRIES = config('EMAIL_MAX_RETRIES', default=3, cast=int)  # reenvios dos e-mails que falharam
+EMAIL_RETRY_BACKOFF = config('EMAIL_RETRY_BACKOFF', default=60, cast=int)  # segundos, dobra a cada reenvio
+# Latência simulada (segundos por envio) do utils.email_stub.SlowLocmemEmailBackend, usado nos benchmarks
+EMAIL_STUB_LATENCY = config('EMAIL_STUB_LATENCY', default=0.0, cast=float)
 
 # Celery settings
+REDIS_URL = config('REDIS_URL', default='redis://localhost:6379/0')
+# Timeout (segundos) de conexão e leitura dos clientes Redis do app (ver utils.redis_client); com o Redis
+# fora do ar as atividades recentes caem no banco em vez de prender a requisição
+REDIS_SOCKET_TIMEOUT = config('REDIS_SOCKET_TIMEOUT', default=0.5, cast=float)
+
 CELERY_BROKER_URL = config('REDIS_URL', default='redis://localhost:6379/0')  # Endereço do Redis
 CELERY_ACCEPT_CONTENT = ['json']  # Aceitar apenas mensagens em JSON
 CELERY_TASK_SERIALIZER = 'json'  # Serializar as tarefas em formato JSON
 CELERY_RESULT_BACKEND = config('REDIS_URL', default='redis://localhost:6379/0')  # Backend para armazenar resultados
 CELERY_TIMEZONE = 'America/Sao_Paulo'  # Definir o fuso horário (se necessário)
+# Os envios de e-mail rodam na fila de e-mail e as notificações na fila do seu canal (NOTIFICATION_CHANNELS);
+# as demais tarefas, inclusive a drenagem do outbox, ficam na fila padrão "celery", atendida por qualquer worker
+CELERY_TASK_ROUTES = {
+    'members.tasks.send_bulk_email': {'queue': 'email'},
+    'users.tasks.send_password_reset_email': {'queue': 'email'},
+}
+
+# Backend de mensagens do WhatsApp, no estilo do EMAIL_BACKEND:
+# utils.messaging.UltraMsgBackend, utils.messaging.LocmemBackend ou utils.messaging.HttpStubBackend
+MESSAGING_BACKEND = config('MESSAGING_BACKEND', default='utils.messaging.UltraMsgBackend')
+MESSAGING_STUB_URL = config('MESSAGING_STUB_URL', default='http://127.0.0.1:8765')  # Servidor do run_messaging_stub
+# Falhas seguidas (número recusado pelo provedor) até o telefone deixar de receber cobranças
+MESSAGING_PHONE_MAX_FAILURES = config('MESSAGING_PHONE_MAX_FAILURES', default=3, cast=int)
+
+# UltraMsg (WhatsApp)
+ULTRAMSG_TOKEN = config('ULTRAMSG_TOKEN', default=None)
+ULTRAMSG_INSTANCE = config('ULTRAMSG_INSTANCE', default=None)
+ULTRAMSG_API_URL = config('ULTRAMSG_API_URL', default='https://api.ultramsg.com')
+ULTRAMSG_CONNECT_TIMEOUT = config('ULTRAMSG_CONNECT_TIMEOUT', default=5, cast=float)  # segundos
+ULTRAMSG_READ_TIMEOUT = config('ULTRAMSG_READ_TIMEOUT', default=15, cast=float)  # segundos
+ULTRAMSG_MAX_RETRIES = config('ULTRAMSG_MAX_RETRIES', default=3, cast=int)  # em erros de conexão e 5xx
+ULTRAMSG_BACKOFF_INITIAL = config('ULTRAMSG_BACKOFF_INITIAL', default=0.5, cast=float)  # segundos
+ULTRAMSG_BACKOFF_MAX = config('ULTRAMSG_BACKOFF_MAX', default=8, cast=float)  # segundos
+# Token bucket compartilhado por todos os workers (ver utils.rate_limit)
+ULTRAMSG_RATE_LIMIT = config('ULTRAMSG_RATE_LIMIT', default=5, cast=float)  # mensagens por segundo
+ULTRAMSG_RATE_BURST = config('ULTRAMSG_RATE_BURST', default=10, cast=int)  # mensagens seguidas sem espera
+ULTRAMSG_RATE_LIMIT_MAX_WAIT = config('ULTRAMSG_RATE_LIMIT_MAX_WAIT', default=30, cast=float)  # segundos
+# Circuit breaker (ver utils.circuit_breaker): abre após N falhas seguidas e testa de novo após o timeout
+ULTRAMSG_CIRCUIT_FAILURE_THRESHOLD = config('ULTRAMSG_CIRCUIT_FAILURE_THRESHOLD', default=5, cast=int)
+ULTRAMSG_CIRCUIT_RECOVERY_TIMEOUT = config('ULTRAMSG_CIRCUIT_RECOVERY_TIMEOUT', default=60, cast=int)  # segundos
+# Token secreto da URL do webhook de entrega: /members/webhooks/ultramsg/<token>/
+ULTRAMSG_WEBHOOK_TOKEN = config('ULTRAMSG_WEBHOOK_TOKEN', default='')
+
+# Canais de notificação (ver utils.notifications). Cada canal tem a sua fila do Celery e o seu
+# número de processos no worker (python manage.py run_channel_worker <canal>), então um SMTP lento
+# não atrasa o WhatsApp. Sem telefone válido (ou bloqueado) a mensagem segue pelo fallback.
+NOTIFICATION_CHANNELS = {
+    'whatsapp': {
+        'queue': 'whatsapp',
+        'concurrency': config('NOTIFICATION_WHATSAPP_CONCURRENCY', default=2, cast=int),
+        'fallback': config('NOTIFICATION_WHATSAPP_FALLBACK', default='email') or None,
+    },
+    'email': {
+        'queue': 'email',
+        'concurrency': config('NOTIFICATION_EMAIL_CONCURRENCY', default=2, cast=int),
+        'fallback': None,
+    },
+}
+
+# Quantidade máxima de mensagens de cobrança enviadas em paralelo
+BILLING_MESSAGES_CONCURRENCY = config('BILLING_MESSAGES_CONCURRENCY', default=8, cast=int)
+
+# Outbox das mensagens de cobrança
+BILLING_OUTBOX_BATCH_SIZE = config('BILLING_OUTBOX_BATCH_SIZE', default=50, cast=int)  # mensagens reservadas por vez
+BILLING_OUTBOX_LEASE_SECONDS = config('BILLING_OUTBOX_LEASE_SECONDS', default=300, cast=int)  # tempo de reserva do lote
+BILLING_OUTBOX_MAX_ATTEMPTS = config('BILLING_OUTBOX_MAX_ATTEMPTS', default=5, cast=int)
+BILLING_OUTBOX_RETRY_BACKOFF = config('BILLING_OUTBOX_RETRY_BACKOFF', default=60, cast=int)  # segundos
+BILLING_OUTBOX_RETRY_BACKOFF_MAX = config('BILLING_OUTBOX_RETRY_BACKOFF_MAX', default=3600, cast=int)  # segundos
+# Janelas (horário local) em que as mensagens podem ser enviadas; fora delas ficam retidas na fila.
+# Vazio libera o envio a qualquer hora. Uma janela pode atravessar a meia-noite (ex.: 22:00-02:00).
+BILLING_SEND_WINDOWS = config('BILLING_SEND_WINDOWS', default='09:00-12:00,14:00-20:00', cast=Csv())
+BILLING_DRAIN_RATE = config('BILLING_DRAIN_RATE', default=2, cast=float)  # mensagens por segundo ao drenar a fila
+BILLING_DRAIN_BURST = config('BILLING_DRAIN_BURST', default=10, cast=int)
+# Dias antes do vencimento em que os lembretes de pagamento são enviados (ex.: 3,1)
+BILLING_REMINDER_DAYS = config('BILLING_REMINDER_DAYS', default='3', cast=Csv(int))
+# Por quanto tempo (segundos) um evento de entrega sem mensagem correspondente volta para a fila
+BILLING_DELIVERY_EVENT_MAX_AGE = config('BILLING_DELIVERY_EVENT_MAX_AGE', default=3600, cast=int)
 
 from celery.schedules import crontab
 
@@ -179,14 +258,27 @@ CELERY_BEAT_SCHEDULE = {
     'update-members-status-every-midnight': {
         'task': 'members.tasks.update_members_activity_status',
         'schedule': crontab(minute=25, hour=23, ), 
+        'kwargs': {'bulk': True},
     },
     'save-daily-report': {
         'task': 'admin_panel.tasks.save_daily_report',
         'schedule': crontab(minute=50, hour=23, )
     },
+    'archive-activity-logs': {
+        'task': 'admin_panel.tasks.archive_activity_logs',
+        'schedule': crontab(minute=30, hour=3, )
+    },
+    'enqueue-payment-reminders': {
+        'task': 'members.tasks.enqueue_payment_reminders',
+        'schedule': crontab(minute=0, hour=9, )
+    },
     'send-billing-messages': {
         'task': 'members.tasks.send_billing_messages',
-        'schedule': crontab(minute=30, hour=23, )
+        'schedule': crontab(minute='*/5')
+    },
+    'apply-delivery-events': {
+        'task': 'members.tasks.apply_delivery_events',
+        'schedule': crontab(minute='*')
     }
 }
 
@@ -197,6 +289,47 @@ import sys
 # Verifica se o pytest está sendo executado
 TESTING = 'pytest' in sys.modules
 
+# Registros de atividade (ver admin_panel.activity): com ACTIVITY_LOG_SYNC cada registro é gravado na hora,
+# senão são acumulados e gravados em lote no commit ou a cada ACTIVITY_LOG_BUFFER_SIZE registros
+ACTIVITY_LOG_SYNC = config('ACTIVITY_LOG_SYNC', default=TESTING, cast=bool)
+ACTIVITY_LOG_BUFFER_SIZE = config('ACTIVITY_LOG_BUFFER_SIZE', default=500, cast=int)
+
+# Retenção do ActivityLog: registros mais antigos que N dias vão para arquivos .jsonl.gz em ACTIVITY_LOG_ARCHIVE_DIR
+ACTIVITY_LOG_RETENTION_DAYS = config('ACTIVITY_LOG_RETENTION_DAYS', default=365, cast=int)
+ACTIVITY_LOG_ARCHIVE_DIR = config('ACTIVITY_LOG_ARCHIVE_DIR', default=str(BASE_DIR / 'archives' / 'activity_logs'))
+ACTIVITY_LOG_ARCHIVE_BATCH_SIZE = config('ACTIVITY_LOG_ARCHIVE_BATCH_SIZE', default=1000, cast=int)  # registros por DELETE
+
+# Feed de atividades (paginação por cursor): registros por página e máximo aceito no parâmetro limit do JSON
+ACTIVITY_FEED_PAGE_SIZE = config('ACTIVITY_FEED_PAGE_SIZE', default=50, cast=int)
+ACTIVITY_FEED_MAX_PAGE_SIZE = config('ACTIVITY_FEED_MAX_PAGE_SIZE', default=200, cast=int)
+
+# Atividades recentes da página inicial (ver admin_panel.recent_activity): os últimos RECENT_ACTIVITY_SIZE
+# registros ficam numa lista do Redis, já serializados; sem RECENT_ACTIVITY_RING_BUFFER a página consulta o banco
+RECENT_ACTIVITY_SIZE = config('RECENT_ACTIVITY_SIZE', default=20, cast=int)
+RECENT_ACTIVITY_RING_BUFFER = config('RECENT_ACTIVITY_RING_BUFFER', default=not TESTING, cast=bool)
+
+# Nos testes as tarefas enviadas com delay/apply_async rodam na hora, sem broker
+CELERY_TASK_ALWAYS_EAGER = config('CELERY_TASK_ALWAYS_EAGER', default=TESTING, cast=bool)
+
+# 'redis' compartilha o rate limit do UltraMsg entre os workers; nos testes o padrão é o bucket em memória
+ULTRAMSG_RATE_LIMIT_BACKEND = config('ULTRAMSG_RATE_LIMIT_BACKEND', default='memory' if TESTING else 'redis')
+# Filas de eventos (ex.: webhooks de entrega do UltraMsg, ver utils.event_queue): 'redis' ou 'memory'
+EVENT_QUEUE_BACKEND = config('EVENT_QUEUE_BACKEND', default='memory' if TESTING else 'redis')
+# Listas limitadas (ex.: atividades recentes, ver utils.ring_buffer): 'redis' ou 'memory'
+RING_BUFFER_BACKEND = config('RING_BUFFER_BACKEND', default='memory' if TESTING else 'redis')
+
+# Cache compartilhado entre os processos (ex.: estado do circuit breaker do UltraMsg); nos testes fica em memória.
+# CACHE_BACKEND=django.core.cache.backends.locmem.LocMemCache permite rodar sem Redis (ex.: testes de carga locais).
+CACHES = {
+    'default': {
+        'BACKEND': config(
+            'CACHE_BACKEND',
+            default='django.core.cache.backends.locmem.LocMemCache' if TESTING else 'django.core.cache.backends.redis.RedisCache'
+        ),
+        'LOCATION': config('CACHE_URL', default=REDIS_URL),
+    }
+}
+
 if DEBUG:  # Ativar somente em DEBUG
     INSTALLED_APPS += ['debug_toolbar', 'django_extensions',]
     MIDDLEWARE += ['debug_toolbar.middleware.DebugToolbarMiddleware']
@@ -1,10 +1,10 @@
-from utils.ultramsg import UltraMsgAPI
+from utils.ultramsg import get_ultramsg_client
 
-ultramsg = UltraMsgAPI()
+ultramsg = get_ultramsg_client()
 
 # Send a text message
 response_message = ultramsg.send_message(to='The-number', message='Hello, this is a test message!')
-print(response_message.text)
+print(response_message)
 
 # Send an image
 response_image = ultramsg.send_image(
@@ -12,4 +12,4 @@ response_image = ultramsg.send_image(
     image_url='https://blog.emania.com.br/wp-content/uploads/2016/02/direitos-autorais-e-de-imagem.jpg',
     caption='Test image'
 )
-print(response_image.text)
\ No newline at end of file
+print(response_image)
\ No newline at end of file
@@ -1,6 +1,5 @@
 from django import forms
 from utils.utils import verify_email, is_valid_cpf
-from .models import User
 import re
 
 class LoginForm(forms.Form):
@@ -39,9 +38,8 @@ class PasswordResetRequestForm(forms.Form):
         
         if not verify_email(email):  # pragma: no cover
             raise forms.ValidationError('O e-mail fornecido não é válido.')
-        
-        if not User.objects.filter(email=email).exists():
-            raise forms.ValidationError('Este e-mail não está registrado. Verifique novamente.')
+
+        # Não informa se o e-mail está cadastrado, para não revelar quais contas existem
         return email
     
 
@@ -0,0 +1,91 @@
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import Client, override_settings
+from django.urls import reverse
+from users.models import User
+from utils.utils import percentile
+
+
+class Command(BaseCommand):
+    help = (
+        'Mede a latência (p50/p95) do envio do formulário de redefinição de senha, alternando um '
+        'e-mail cadastrado e e-mails inexistentes. Por padrão o e-mail é enviado dentro da '
+        'requisição (tarefa eager) por um backend em memória que espera --smtp-latency segundos, '
+        'simulando o SMTP sem enviar nada de verdade. ATENÇÃO: com --queue a tarefa vai para o '
+        'broker e os workers em execução enviam e-mails reais pelo EMAIL_BACKEND deles, que '
+        '--email-backend não altera. As requisições rodam numa transação desfeita ao final.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=100, help='Quantidade de requisições.')
+        parser.add_argument('--email', default=None, help='E-mail cadastrado. Padrão: o do primeiro usuário.')
+        parser.add_argument('--host', default=None, help='Host das requisições. Padrão: o primeiro de ALLOWED_HOSTS.')
+        parser.add_argument(
+            '--queue', action='store_true',
+            help='Mede só o enfileiramento na fila do Celery. Os workers enviam e-mails REAIS aos usuários.'
+        )
+        parser.add_argument(
+            '--email-backend', default='utils.email_stub.SlowLocmemEmailBackend',
+            help='Backend usado no envio dentro da requisição. Padrão: em memória com a latência de --smtp-latency.'
+        )
+        parser.add_argument(
+            '--smtp-latency', type=float, default=0.3,
+            help='Segundos por e-mail simulados pelo backend padrão (ida e volta ao SMTP).'
+        )
+
+    def get_host(self, host):
+        if host:
+            return host
+        hosts = [host.lstrip('.') for host in settings.ALLOWED_HOSTS if host != '*']
+        return hosts[0] if hosts else 'localhost'
+
+    def handle(self, *args, **options):
+        # Importado aqui para que o Celery só seja carregado quando o comando roda
+        from project.celery import app
+
+        email = options['email'] or User.objects.order_by('id').values_list('email', flat=True).first()
+        if not email:
+            raise CommandError('Nenhum usuário cadastrado: informe --email.')
+
+        if options['queue']:
+            self.stdout.write(self.style.WARNING(
+                f'Modo fila: os workers vão enviar {(options["requests"] + 1) // 2} e-mail(s) reais para {email}.'
+            ))
+
+        client = Client(HTTP_HOST=self.get_host(options['host']))
+        url = reverse('users:password_reset_send')
+        latencies = {'cadastrado': [], 'inexistente': []}
+        always_eager = app.conf.task_always_eager
+        app.conf.task_always_eager = not options['queue']
+
+        try:
+            # As sessões e demais gravações das requisições são desfeitas ao final
+            with transaction.atomic(), override_settings(
+                EMAIL_BACKEND=options['email_backend'], EMAIL_STUB_LATENCY=options['smtp_latency']
+            ):
+                for number in range(options['requests']):
+                    exists = number % 2 == 0
+                    started_at = time.perf_counter()
+                    client.post(url, {'email': email if exists else f'inexistente{number}@example.com'})
+                    latencies['cadastrado' if exists else 'inexistente'].append((time.perf_counter() - started_at) * 1000)
+
+                transaction.set_rollback(True)
+        finally:
+            app.conf.task_always_eager = always_eager
+
+        self.stdout.write(f"Modo: {'fila do Celery' if options['queue'] else 'envio na requisição'}")
+        if options['queue']:
+            self.stdout.write('Backend de e-mail: o EMAIL_BACKEND dos workers.')
+        elif options['email_backend'] == 'utils.email_stub.SlowLocmemEmailBackend':
+            self.stdout.write(f"Backend de e-mail: {options['email_backend']} ({options['smtp_latency'] * 1000:.0f}ms por e-mail).")
+        else:
+            self.stdout.write(f"Backend de e-mail: {options['email_backend']}.")
+        for name, values in latencies.items():
+            self.stdout.write(
+                f'E-mail {name}: {len(values)} requisição(ões), p50 {percentile(values, 0.5):.1f}ms, '
+                f'p95 {percentile(values, 0.95):.1f}ms, p99 {percentile(values, 0.99):.1f}ms.'
+            )
+        every = latencies['cadastrado'] + latencies['inexistente']
+        self.stdout.write(f'Geral: p95 {percentile(every, 0.95):.1f}ms.')
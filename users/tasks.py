@@ -0,0 +1,41 @@
+import logging
+from celery import shared_task
+from django.contrib.auth.tokens import PasswordResetTokenGenerator
+from django.urls import reverse
+from django.utils.encoding import smart_bytes
+from django.utils.http import urlsafe_base64_encode
+from users.models import User
+from utils.utils import send_email
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(bind=True, max_retries=3, default_retry_delay=30)
+def send_password_reset_email(self, email, domain):
+    """
+    Envia o link de redefinição de senha para o usuário com o e-mail informado.
+
+    A view enfileira esta tarefa para qualquer e-mail válido, existindo ou não, e é aqui
+    que o usuário é procurado: assim a resposta da view leva o mesmo tempo nos dois casos.
+    Falhas de SMTP são tentadas de novo depois de 30 segundos, até 3 vezes.
+    """
+    user = User.objects.filter(email=email).first()
+    if user is None:
+        return False
+
+    uidb64 = urlsafe_base64_encode(smart_bytes(user.id))
+    token = PasswordResetTokenGenerator().make_token(user)
+    relative_link = reverse('users:password_reset_confirm', kwargs={'uidb64': uidb64, 'token': token})
+    absurl = f'http://{domain}{relative_link}'
+
+    full_name = user.full_name or ' '
+    first_name = full_name.split(' ')[0]
+    email_body = f'Olá, {first_name}.\n Redefina sua senha usando o link abaixo: \n {absurl}'
+
+    try:
+        send_email(subject='Reset da senha', message=email_body, to_email=user.email)
+    except Exception as error:
+        logger.warning('Erro ao enviar o e-mail de redefinição de senha: %s', error)
+        raise self.retry(exc=error)
+
+    return True
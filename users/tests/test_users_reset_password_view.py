@@ -1,7 +1,12 @@
-from django.test import TestCase
+from django.core import mail
+from django.core.management import call_command
+from io import StringIO
+from django.test import TestCase, override_settings
+from unittest.mock import patch
 from django.urls import reverse
 from django.contrib.auth import get_user_model
 from django.contrib.messages import get_messages
+from django.contrib.sessions.models import Session
 from django.utils.http import urlsafe_base64_encode
 from django.contrib.auth.tokens import PasswordResetTokenGenerator
 from django.utils.encoding import smart_bytes
@@ -53,15 +58,31 @@ class PasswordResetViewTests(TestCase):
         self.assertRedirects(response, self.login_url)
         messages = list(get_messages(response.wsgi_request))
         self.assertEqual(str(messages[0]), "Se o e-mail existir, um link para redefinir sua senha foi enviado.")
-    
+        # Nos testes a tarefa do Celery roda na hora
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['user@example.com'])
+        self.assertIn(reverse('users:password_reset_confirm', kwargs={
+            'uidb64': urlsafe_base64_encode(smart_bytes(self.user.id)),
+            'token': PasswordResetTokenGenerator().make_token(self.user),
+        }), mail.outbox[0].body)
+
+    def test_password_reset_send_queues_the_email(self):
+        """Testa se o e-mail é enfileirado no Celery em vez de enviado durante a requisição"""
+        with patch('users.views.send_password_reset_email.delay') as delay:
+            self.client.post(self.password_reset_send_url, {'email': 'user@example.com'})
+
+        delay.assert_called_once_with('user@example.com', 'testserver')
+        self.assertEqual(len(mail.outbox), 0)
+
     def test_password_reset_send_invalid_email(self):
-        """Testa se o envio de um e-mail inválido gera um erro"""
+        """Testa se um e-mail não cadastrado recebe a mesma resposta, sem enviar nada"""
         response = self.client.post(self.password_reset_send_url, {
             'email': 'nonexistent@example.com'
         })
-        self.assertRedirects(response, self.password_reset_url)
+        self.assertRedirects(response, self.login_url)
         messages = list(get_messages(response.wsgi_request))
-        self.assertEqual(str(messages[0]), 'Por favor, corrija os erros abaixo.')
+        self.assertEqual(str(messages[0]), "Se o e-mail existir, um link para redefinir sua senha foi enviado.")
+        self.assertEqual(len(mail.outbox), 0)
     
     def test_password_reset_send_invalid_email_format(self):
         """Testa se o formato do e-mail inválido gera um erro"""
@@ -199,3 +220,44 @@ class PasswordResetViewTests(TestCase):
         self.assertRedirects(response, self.password_reset_url)
         messages = list(get_messages(response.wsgi_request))
         self.assertEqual(str(messages[0]), 'Link inválido.')
+
+
+class BenchmarkPasswordResetCommandTests(TestCase):
+
+    def test_reports_p95_for_existing_and_unknown_emails(self):
+        get_user_model().objects.create_user(cpf='12345678901', email='user@example.com', password='password123')
+        out = StringIO()
+
+        call_command('benchmark_password_reset', requests=4, smtp_latency=0, stdout=out)
+
+        output = out.getvalue()
+        self.assertIn('E-mail cadastrado: 2 requisição(ões)', output)
+        self.assertIn('E-mail inexistente: 2 requisição(ões)', output)
+        self.assertIn('p95', output)
+        self.assertIn('Backend de e-mail: utils.email_stub.SlowLocmemEmailBackend (0ms por e-mail).', output)
+        self.assertEqual(len(mail.outbox), 2)
+        # As sessões criadas pelas requisições são desfeitas
+        self.assertEqual(Session.objects.count(), 0)
+
+    def test_baseline_includes_the_simulated_smtp_latency(self):
+        get_user_model().objects.create_user(cpf='12345678901', email='user@example.com', password='password123')
+        out = StringIO()
+
+        with patch('utils.email_stub.time.sleep') as sleep:
+            call_command('benchmark_password_reset', requests=2, smtp_latency=0.25, stdout=out)
+
+        sleep.assert_called_once_with(0.25)
+        self.assertIn('(250ms por e-mail)', out.getvalue())
+
+    @override_settings(EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend')
+    def test_default_run_does_not_send_real_emails(self):
+        """Tests that, without --queue, the emails go to the in-memory backend even if SMTP is configured."""
+        get_user_model().objects.create_user(cpf='12345678901', email='user@example.com', password='password123')
+        out = StringIO()
+
+        with patch('django.core.mail.backends.smtp.EmailBackend.send_messages') as send_messages:
+            call_command('benchmark_password_reset', requests=2, smtp_latency=0, stdout=out)
+
+        send_messages.assert_not_called()
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertIn('Modo: envio na requisição', out.getvalue())
@@ -4,13 +4,12 @@ from django.contrib import messages
 from .forms import LoginForm, PasswordResetRequestForm, PasswordResetForm
 from users.models import User
 from django.urls import reverse
-from django.shortcuts import get_object_or_404
 
-from django.utils.encoding import smart_bytes, smart_str
-from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
+from django.utils.encoding import smart_str
+from django.utils.http import urlsafe_base64_decode
 from django.contrib.auth.tokens import PasswordResetTokenGenerator
 from django.contrib.sites.shortcuts import get_current_site
-from utils.utils import send_email
+from .tasks import send_password_reset_email
 
 
     
@@ -80,7 +79,7 @@ def password_reset(request):
     return render(request, 'users/pages/password_reset_email_form.html', context)
 
 def password_reset_send(request):
-    """ Recebe o formulario de redefinição com o email para redefinição de senha e envia um e-mail com o link para redefinir a senha."""
+    """ Recebe o formulario de redefinição com o email para redefinição de senha e enfileira o e-mail com o link para redefinir a senha."""
     if request.method != 'POST':
         return redirect('users:password_reset')
     
@@ -90,24 +89,8 @@ def password_reset_send(request):
     request.session['reset_password_form_data'] = request.POST
 
     if form.is_valid():
-        email = form.cleaned_data['email']
-        user = get_object_or_404(User, email=email)
-
-        uidb64 = urlsafe_base64_encode(smart_bytes(user.id))
-        token = PasswordResetTokenGenerator().make_token(user)
-        current_site = get_current_site(request).domain
-        relative_link = reverse('users:password_reset_confirm', kwargs={'uidb64': uidb64, 'token': token})
-        absurl = f'http://{current_site}{relative_link}'
-        
-        full_name = user.full_name or ' '
-        first_name = full_name.split(' ')[0]
-        email_body = f'Olá, {first_name}.\n Redefina sua senha usando o link abaixo: \n {absurl}'
-        
-        send_email(
-            subject='Reset da senha',
-            message=email_body,
-            to_email=user.email
-        )
+        # O usuário é procurado na tarefa: a resposta leva o mesmo tempo exista ou não o e-mail
+        send_password_reset_email.delay(form.cleaned_data['email'], get_current_site(request).domain)
         messages.success(request, "Se o e-mail existir, um link para redefinir sua senha foi enviado.")
         return redirect('users:login_view') 
     else:
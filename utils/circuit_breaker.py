@@ -0,0 +1,98 @@
+import time
+
+from django.core.cache import caches
+
+
+class CircuitOpenError(Exception):
+    """O circuito está aberto: a chamada nem é feita."""
+
+    def __init__(self, name, retry_after):
+        super().__init__(f'Circuito {name} aberto, tente novamente em {retry_after:.0f}s')
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker com o estado guardado no cache do Django, compartilhado entre os workers.
+
+    Depois de failure_threshold falhas seguidas o circuito abre e as chamadas falham na hora
+    com CircuitOpenError. Passados recovery_timeout segundos, uma única chamada de teste
+    (half-open) é liberada: se der certo o circuito fecha, se falhar abre de novo.
+
+        breaker.before_call()
+        try:
+            response = call()
+        except ConnectionError:
+            breaker.record_failure()
+            raise
+        breaker.record_success()
+    """
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, name, failure_threshold=5, recovery_timeout=60, cache_alias='default'):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.cache = caches[cache_alias]
+        self.failures_key = f'circuit:{name}:failures'
+        self.opened_at_key = f'circuit:{name}:opened_at'
+        self.probe_key = f'circuit:{name}:probe'
+
+    def _remaining(self, opened_at):
+        return max(0.0, opened_at + self.recovery_timeout - time.time())
+
+    @property
+    def state(self):
+        opened_at = self.cache.get(self.opened_at_key)
+
+        if opened_at is None:
+            return self.CLOSED
+        if self._remaining(opened_at) > 0:
+            return self.OPEN
+        return self.HALF_OPEN
+
+    def before_call(self):
+        """Levanta CircuitOpenError se a chamada não deve ser feita agora."""
+        opened_at = self.cache.get(self.opened_at_key)
+        if opened_at is None:
+            return
+
+        remaining = self._remaining(opened_at)
+        if remaining > 0:
+            raise CircuitOpenError(self.name, remaining)
+
+        # cache.add é atômico: só um worker consegue fazer a chamada de teste
+        if not self.cache.add(self.probe_key, 1, timeout=self.recovery_timeout):
+            raise CircuitOpenError(self.name, self.recovery_timeout)
+
+    def record_success(self):
+        if self.cache.get(self.opened_at_key) is not None:
+            self.cache.delete_many([self.failures_key, self.opened_at_key, self.probe_key])
+        else:
+            self.cache.delete(self.failures_key)
+
+    def record_failure(self):
+        if self.cache.get(self.opened_at_key) is not None:
+            # A chamada de teste falhou: reabre o circuito por mais recovery_timeout segundos
+            self.open()
+            return
+
+        self.cache.add(self.failures_key, 0, timeout=None)
+        if self.cache.incr(self.failures_key) >= self.failure_threshold:
+            self.open()
+
+    def open(self):
+        self.cache.set(self.opened_at_key, time.time(), timeout=None)
+        self.cache.delete(self.probe_key)
+
+    def reset(self):
+        self.cache.delete_many([self.failures_key, self.opened_at_key, self.probe_key])
+
+    def metrics(self):
+        return {
+            'name': self.name,
+            'state': self.state,
+            'failures': self.cache.get(self.failures_key, 0),
+        }
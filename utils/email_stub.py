@@ -0,0 +1,18 @@
+import time
+
+from django.conf import settings
+from django.core.mail.backends.locmem import EmailBackend
+
+
+class SlowLocmemEmailBackend(EmailBackend):
+    """
+    Backend em memória (django.core.mail.outbox) que espera EMAIL_STUB_LATENCY segundos por envio.
+
+    Simula a ida e volta ao servidor SMTP sem enviar e-mails de verdade, para medir
+    o custo de enviar dentro da requisição (ver o comando benchmark_password_reset).
+    """
+
+    def send_messages(self, messages):
+        if messages and settings.EMAIL_STUB_LATENCY:
+            time.sleep(settings.EMAIL_STUB_LATENCY)
+        return super().send_messages(messages)
@@ -0,0 +1,93 @@
+import json
+import threading
+from collections import deque
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from utils.redis_client import make_redis_client
+
+
+class InMemoryEventQueue:
+    """Fila FIFO local ao processo, usada nos testes e quando não há Redis."""
+
+    def __init__(self, name):
+        self.name = name
+        self._events = deque()
+        self._lock = threading.Lock()
+
+    def push(self, *events):
+        with self._lock:
+            self._events.extend(events)
+
+    def requeue(self, events):
+        """Devolve eventos para o início da fila (ex.: o lote não pôde ser aplicado)."""
+        with self._lock:
+            self._events.extendleft(reversed(events))
+
+    def pop_batch(self, size):
+        with self._lock:
+            return [self._events.popleft() for _ in range(min(size, len(self._events)))]
+
+    def __len__(self):
+        return len(self._events)
+
+
+class RedisEventQueue:
+    """Fila FIFO numa lista do Redis, compartilhada entre o servidor web e os workers."""
+
+    def __init__(self, name, redis_url):
+        self.name = name
+        self.key = f'event_queue:{name}'
+        self.client = make_redis_client(redis_url)
+
+    def push(self, *events):
+        if events:
+            self.client.rpush(self.key, *[json.dumps(event) for event in events])
+
+    def requeue(self, events):
+        if events:
+            self.client.lpush(self.key, *[json.dumps(event) for event in reversed(events)])
+
+    def pop_batch(self, size):
+        # LRANGE + LTRIM numa transação: dois consumidores nunca recebem o mesmo evento
+        pipeline = self.client.pipeline(transaction=True)
+        pipeline.lrange(self.key, 0, size - 1)
+        pipeline.ltrim(self.key, size, -1)
+        events, _ = pipeline.execute()
+        return [json.loads(event) for event in events]
+
+    def __len__(self):
+        return self.client.llen(self.key)
+
+
+_queues = {}
+_queues_lock = threading.Lock()
+
+
+def get_event_queue(name):
+    """
+    Retorna a fila de eventos name (EVENT_QUEUE_BACKEND: 'redis' ou 'memory').
+
+    Os eventos devem ser serializáveis em JSON.
+    """
+    if name not in _queues:
+        with _queues_lock:
+            if name not in _queues:
+                if settings.EVENT_QUEUE_BACKEND == 'redis':
+                    _queues[name] = RedisEventQueue(name, settings.REDIS_URL)
+                else:
+                    _queues[name] = InMemoryEventQueue(name)
+
+    return _queues[name]
+
+
+def reset_event_queues():
+    with _queues_lock:
+        _queues.clear()
+
+
+@receiver(setting_changed)
+def reset_event_queues_on_setting_changed(setting, **kwargs):
+    if setting in ('EVENT_QUEUE_BACKEND', 'REDIS_URL', 'REDIS_SOCKET_TIMEOUT'):
+        reset_event_queues()
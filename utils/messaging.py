@@ -0,0 +1,106 @@
+import itertools
+import threading
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+from utils.ultramsg import SendResult, UltraMsgAPI
+
+# Mensagens registradas pelo LocmemBackend, como o django.core.mail.outbox
+outbox = []
+_outbox_lock = threading.Lock()
+_message_ids = itertools.count(1)
+
+
+class BaseMessagingBackend:
+    """
+    Interface dos backends de mensagens (setting MESSAGING_BACKEND, no estilo do EMAIL_BACKEND).
+
+    Os métodos de envio retornam um utils.ultramsg.SendResult. A mesma instância é
+    compartilhada pelas threads do processo, então os backends devem ser thread-safe.
+    """
+
+    def send_message(self, to, message):
+        raise NotImplementedError
+
+    def send_image(self, to, image_url, caption=''):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class UltraMsgBackend(UltraMsgAPI, BaseMessagingBackend):
+    """Envia pelo UltraMsg usando os settings ULTRAMSG_*."""
+
+
+class HttpStubBackend(UltraMsgAPI, BaseMessagingBackend):
+    """
+    Envia para o servidor local do utils.ultramsg_stub em MESSAGING_STUB_URL.
+
+    Passa pelo mesmo cliente HTTP, rate limit e circuit breaker do UltraMsg, então
+    serve para medir o desempenho do envio sem acessar a internet:
+
+        python manage.py run_messaging_stub --latency 0.2 --error-rate 0.05
+    """
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault('token', 'stub')
+        kwargs.setdefault('instance', 'stub')
+        kwargs.setdefault('api_url', settings.MESSAGING_STUB_URL)
+        super().__init__(**kwargs)
+
+
+class LocmemBackend(BaseMessagingBackend):
+    """Não envia nada: registra as mensagens em utils.messaging.outbox."""
+
+    def _record(self, **message):
+        with _outbox_lock:
+            message['id'] = next(_message_ids)
+            outbox.append(message)
+
+        return SendResult(ok=True, status_code=200, body={'sent': 'true', 'message': 'ok', 'id': message['id']}, latency_ms=0)
+
+    def send_message(self, to, message):
+        return self._record(to=to, body=message)
+
+    def send_image(self, to, image_url, caption=''):
+        return self._record(to=to, image=image_url, caption=caption)
+
+
+def clear_outbox():
+    with _outbox_lock:
+        outbox.clear()
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_messaging_backend():
+    """Retorna o backend de mensagens do processo (MESSAGING_BACKEND), criado na primeira chamada."""
+    global _backend
+
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = import_string(settings.MESSAGING_BACKEND)()
+
+    return _backend
+
+
+def reset_messaging_backend():
+    global _backend
+
+    with _backend_lock:
+        if _backend is not None:
+            _backend.close()
+        _backend = None
+
+
+@receiver(setting_changed)
+def reset_backend_on_setting_changed(setting, **kwargs):
+    if setting.startswith(('MESSAGING_', 'ULTRAMSG_')) or setting == 'BILLING_MESSAGES_CONCURRENCY':
+        reset_messaging_backend()
@@ -0,0 +1,135 @@
+import re
+import time
+from contextlib import nullcontext
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+
+from utils.messaging import get_messaging_backend
+from utils.ultramsg import SendResult
+from utils.utils import verify_email
+
+
+class Channel:
+    """
+    Canal de notificação (WhatsApp, e-mail...).
+
+    address retorna o destinatário da notificação neste canal ou None quando ela não
+    pode ser entregue por ele (ex.: aluno sem telefone válido). send retorna um SendResult.
+    connection abre uma conexão que pode ser reaproveitada em vários envios:
+
+        with channel.connection() as connection:
+            for notification in notifications:
+                channel.send(notification, connection)
+
+    Notificações são dicionários serializáveis em JSON, para poderem ir para o Celery:
+    {'subject': ..., 'body': ..., 'phone': ..., 'email': ...}.
+    """
+    name = None
+
+    @property
+    def config(self):
+        return settings.NOTIFICATION_CHANNELS[self.name]
+
+    @property
+    def queue(self):
+        return self.config['queue']
+
+    @property
+    def fallback(self):
+        return self.config.get('fallback')
+
+    @property
+    def concurrency(self):
+        return self.config['concurrency']
+
+    def address(self, notification):
+        raise NotImplementedError
+
+    def connection(self):
+        return nullcontext()
+
+    def send(self, notification, connection=None):
+        raise NotImplementedError
+
+
+class WhatsAppChannel(Channel):
+    name = 'whatsapp'
+
+    def address(self, notification):
+        phone = re.sub(r'\D', '', str(notification.get('phone') or ''))
+        # Mesma regra do formulário de membros: entre 10 e 15 dígitos
+        return phone if 10 <= len(phone) <= 15 else None
+
+    def connection(self):
+        return nullcontext(get_messaging_backend())
+
+    def send(self, notification, connection=None):
+        backend = connection or get_messaging_backend()
+        return backend.send_message(to=f'55{self.address(notification)}', message=notification['body'])
+
+
+class EmailChannel(Channel):
+    name = 'email'
+
+    def address(self, notification):
+        email = str(notification.get('email') or '').strip()
+        return email if email and verify_email(email) else None
+
+    def connection(self):
+        # Uma única conexão SMTP para todos os envios do bloco
+        return get_connection()
+
+    def send(self, notification, connection=None):
+        started_at = time.monotonic()
+        email = EmailMessage(
+            subject=notification.get('subject', ''),
+            body=notification['body'],
+            to=[self.address(notification)],
+            connection=connection,
+        )
+
+        try:
+            email.send()
+        except Exception as error:
+            return SendResult(
+                ok=False,
+                error=str(error),
+                error_class=type(error).__name__,
+                latency_ms=int((time.monotonic() - started_at) * 1000),
+            )
+
+        return SendResult(ok=True, latency_ms=int((time.monotonic() - started_at) * 1000))
+
+
+CHANNELS = {channel.name: channel for channel in (WhatsAppChannel(), EmailChannel())}
+
+
+def get_channel(name):
+    try:
+        return CHANNELS[name]
+    except KeyError:
+        raise ValueError(f'Canal de notificação desconhecido: {name}')
+
+
+def resolve_channels(notification, channels):
+    """
+    Define por quais canais a notificação será enviada.
+
+    Cada canal pedido sem destinatário válido é trocado pelo seu fallback
+    (NOTIFICATION_CHANNELS[canal]['fallback']), sem repetir canais.
+    """
+    resolved = []
+
+    for name in channels:
+        channel = get_channel(name)
+        seen = set()
+
+        while channel is not None and channel.name not in seen and channel.address(notification) is None:
+            seen.add(channel.name)
+            channel = get_channel(channel.fallback) if channel.fallback else None
+
+        if channel is not None and channel.address(notification) is not None and channel.name not in resolved:
+            resolved.append(channel.name)
+
+    return resolved
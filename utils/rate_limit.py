@@ -0,0 +1,200 @@
+import threading
+import time
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from utils.redis_client import make_redis_client
+
+
+class RateLimitExceeded(Exception):
+    """O token não ficou disponível dentro do tempo máximo de espera."""
+
+    def __init__(self, retry_after):
+        super().__init__(f'Limite de envios atingido, tente novamente em {retry_after:.2f}s')
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """
+    Token bucket: rate tokens por segundo, acumulando no máximo capacity (burst).
+
+    As subclasses implementam _take, que consome os tokens se houver saldo e
+    retorna (conseguiu, saldo atual, segundos até haver saldo suficiente).
+    """
+
+    def __init__(self, name, rate, capacity):
+        if rate <= 0 or capacity < 1:
+            raise ValueError('O rate deve ser positivo e o burst de pelo menos 1 token.')
+
+        self.name = name
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self._stats_lock = threading.Lock()
+        self._stats = {'acquired': 0, 'throttled': 0, 'rejected': 0, 'total_wait_seconds': 0.0, 'last_wait_seconds': 0.0}
+
+    def _take(self, tokens):
+        raise NotImplementedError
+
+    def _record(self, waited, acquired):
+        with self._stats_lock:
+            self._stats['acquired' if acquired else 'rejected'] += 1
+            if waited:
+                self._stats['throttled'] += 1
+            self._stats['total_wait_seconds'] += waited
+            self._stats['last_wait_seconds'] = waited
+
+    def try_acquire(self, tokens=1):
+        """Tenta consumir os tokens sem esperar. Retorna (conseguiu, segundos até haver saldo)."""
+        allowed, _, wait = self._take(tokens)
+        self._record(0.0, allowed)
+        return allowed, wait
+
+    def acquire(self, tokens=1, timeout=None):
+        """
+        Espera até conseguir os tokens e retorna quantos segundos esperou.
+
+        Se o saldo não ficar disponível em até timeout segundos, levanta
+        RateLimitExceeded com o tempo sugerido para tentar de novo.
+        """
+        started_at = time.monotonic()
+        slept = False
+
+        while True:
+            allowed, _, wait = self._take(tokens)
+            waited = time.monotonic() - started_at if slept else 0.0
+
+            if allowed:
+                self._record(waited, True)
+                return waited
+
+            if timeout is not None and waited + wait > timeout:
+                self._record(waited, False)
+                raise RateLimitExceeded(wait)
+
+            time.sleep(wait)
+            slept = True
+
+    def metrics(self):
+        """Saldo atual do bucket e estatísticas de espera deste processo."""
+        _, level, _ = self._take(0)
+
+        with self._stats_lock:
+            stats = dict(self._stats)
+
+        return {
+            'name': self.name,
+            'rate': self.rate,
+            'capacity': self.capacity,
+            'tokens': round(level, 3),
+            'fill_ratio': round(level / self.capacity, 3),
+            'wait_seconds': round(max(0.0, (1 - level) / self.rate), 3),
+            **stats,
+        }
+
+
+class InMemoryTokenBucket(TokenBucket):
+    """Token bucket local ao processo, usado nos testes e quando não há Redis."""
+
+    def __init__(self, name, rate, capacity):
+        super().__init__(name, rate, capacity)
+        self._lock = threading.Lock()
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+
+    def _take(self, tokens):
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+            self._updated_at = now
+
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return True, self._tokens, 0.0
+
+            return False, self._tokens, (tokens - self._tokens) / self.rate
+
+
+# Recarrega e consome o bucket de forma atômica, usando o relógio do Redis para
+# que todos os workers enxerguem o mesmo tempo.
+TAKE_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local requested = tonumber(ARGV[3])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated_at')
+local tokens = tonumber(bucket[1]) or capacity
+local updated_at = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated_at) * rate)
+
+local allowed = 0
+local wait = 0
+if tokens >= requested then
+    tokens = tokens - requested
+    allowed = 1
+else
+    wait = (requested - tokens) / rate
+end
+
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated_at', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 60)
+return {allowed, tostring(tokens), tostring(wait)}
+"""
+
+
+class RedisTokenBucket(TokenBucket):
+    """Token bucket compartilhado por todos os workers através do Redis."""
+
+    def __init__(self, name, rate, capacity, redis_url):
+        super().__init__(name, rate, capacity)
+        self.key = f'rate_limit:{name}'
+        self.client = make_redis_client(redis_url)
+        self._script = self.client.register_script(TAKE_SCRIPT)
+
+    def _take(self, tokens):
+        allowed, level, wait = self._script(keys=[self.key], args=[self.rate, self.capacity, tokens])
+        return bool(allowed), float(level), float(wait)
+
+
+_buckets = {}
+_buckets_lock = threading.Lock()
+
+
+def get_rate_limiter(name, rate=None, burst=None):
+    """
+    Retorna o token bucket do processo para name.
+
+    rate e burst são usados na criação do bucket e têm como padrão os settings
+    ULTRAMSG_RATE_LIMIT e ULTRAMSG_RATE_BURST. Com ULTRAMSG_RATE_LIMIT_BACKEND='redis'
+    o saldo é compartilhado entre os workers; com 'memory' cada processo tem o seu.
+    """
+    if name not in _buckets:
+        with _buckets_lock:
+            if name not in _buckets:
+                rate = rate or settings.ULTRAMSG_RATE_LIMIT
+                burst = burst or settings.ULTRAMSG_RATE_BURST
+
+                if settings.ULTRAMSG_RATE_LIMIT_BACKEND == 'redis':
+                    _buckets[name] = RedisTokenBucket(name, rate, burst, settings.REDIS_URL)
+                else:
+                    _buckets[name] = InMemoryTokenBucket(name, rate, burst)
+
+    return _buckets[name]
+
+
+def get_rate_limiters_metrics():
+    """Métricas de todos os token buckets criados neste processo."""
+    return [bucket.metrics() for bucket in list(_buckets.values())]
+
+
+def reset_rate_limiters():
+    with _buckets_lock:
+        _buckets.clear()
+
+
+@receiver(setting_changed)
+def reset_rate_limiters_on_setting_changed(setting, **kwargs):
+    if setting.startswith(('ULTRAMSG_RATE_', 'BILLING_DRAIN_')) or setting in ('REDIS_URL', 'REDIS_SOCKET_TIMEOUT'):
+        reset_rate_limiters()
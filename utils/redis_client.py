@@ -0,0 +1,18 @@
+from django.conf import settings
+
+
+def make_redis_client(redis_url):
+    """
+    Cria um cliente Redis com timeouts curtos de conexão e leitura (REDIS_SOCKET_TIMEOUT).
+
+    Sem eles um Redis fora do ar ou travado prende a requisição no socket em vez de
+    deixar o chamador cair no fallback (ex.: consultar o banco).
+    """
+    # Importado aqui para que o redis só seja carregado quando um backend Redis for usado
+    import redis
+
+    return redis.Redis.from_url(
+        redis_url,
+        socket_connect_timeout=settings.REDIS_SOCKET_TIMEOUT,
+        socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+    )
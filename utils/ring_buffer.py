@@ -0,0 +1,111 @@
+import json
+import threading
+from collections import deque
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from utils.redis_client import make_redis_client
+
+
+class InMemoryRingBuffer:
+    """Lista limitada local ao processo (mais recente primeiro), usada nos testes e quando não há Redis."""
+
+    def __init__(self, name, size):
+        self.name = name
+        self.size = size
+        self._items = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def push(self, *items):
+        with self._lock:
+            self._items.extendleft(items)
+
+    def fill_if_empty(self, items):
+        """Preenche a lista (items do mais recente para o mais antigo) só se ela estiver vazia."""
+        with self._lock:
+            if not self._items:
+                self._items.extend(items[:self.size])
+
+    def items(self, count=None):
+        with self._lock:
+            return list(self._items)[:count]
+
+    def __len__(self):
+        return len(self._items)
+
+
+# Só preenche se a lista ainda estiver vazia: um push feito enquanto o banco era
+# consultado não é apagado nem duplicado
+FILL_IF_EMPTY_SCRIPT = """
+if redis.call('LLEN', KEYS[1]) > 0 then
+    return 0
+end
+for i = 2, #ARGV do
+    redis.call('RPUSH', KEYS[1], ARGV[i])
+end
+redis.call('LTRIM', KEYS[1], 0, tonumber(ARGV[1]) - 1)
+return 1
+"""
+
+
+class RedisRingBuffer:
+    """Lista do Redis cortada em size itens (LPUSH + LTRIM), compartilhada entre os processos."""
+
+    def __init__(self, name, size, redis_url):
+        self.name = name
+        self.size = size
+        self.key = f'ring_buffer:{name}'
+        self.client = make_redis_client(redis_url)
+        self._fill_script = self.client.register_script(FILL_IF_EMPTY_SCRIPT)
+
+    def push(self, *items):
+        if items:
+            pipeline = self.client.pipeline(transaction=True)
+            pipeline.lpush(self.key, *[json.dumps(item) for item in items])
+            pipeline.ltrim(self.key, 0, self.size - 1)
+            pipeline.execute()
+
+    def fill_if_empty(self, items):
+        if items:
+            self._fill_script(keys=[self.key], args=[self.size, *[json.dumps(item) for item in items]])
+
+    def items(self, count=None):
+        end = (count or self.size) - 1
+        return [json.loads(item) for item in self.client.lrange(self.key, 0, end)]
+
+    def __len__(self):
+        return self.client.llen(self.key)
+
+
+_buffers = {}
+_buffers_lock = threading.Lock()
+
+
+def get_ring_buffer(name, size):
+    """
+    Retorna a lista limitada name, com no máximo size itens (RING_BUFFER_BACKEND: 'redis' ou 'memory').
+
+    push coloca os itens no início da lista (o último passado fica em primeiro) e descarta
+    os que passarem de size. Os itens devem ser serializáveis em JSON.
+    """
+    if name not in _buffers:
+        with _buffers_lock:
+            if name not in _buffers:
+                if settings.RING_BUFFER_BACKEND == 'redis':
+                    _buffers[name] = RedisRingBuffer(name, size, settings.REDIS_URL)
+                else:
+                    _buffers[name] = InMemoryRingBuffer(name, size)
+
+    return _buffers[name]
+
+
+def reset_ring_buffers():
+    with _buffers_lock:
+        _buffers.clear()
+
+
+@receiver(setting_changed)
+def reset_ring_buffers_on_setting_changed(setting, **kwargs):
+    if setting in ('RING_BUFFER_BACKEND', 'REDIS_URL', 'REDIS_SOCKET_TIMEOUT') or setting.startswith('RECENT_ACTIVITY_'):
+        reset_ring_buffers()
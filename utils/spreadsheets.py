@@ -0,0 +1,114 @@
+import codecs
+import csv
+import io
+from itertools import islice
+from zipfile import BadZipFile
+
+
+SUPPORTED_EXTENSIONS = ('.csv', '.xlsx')
+
+
+class SpreadsheetError(ValueError):
+    """Arquivo que não pode ser lido como planilha (formato inválido ou corrompido)."""
+
+
+def normalize_header(value):
+    return str(value or '').strip().lower().replace(' ', '_')
+
+
+def detect_csv_encoding(file, chunk_size=64 * 1024):
+    """
+    Retorna 'utf-8-sig' se o arquivo inteiro for UTF-8 válido, senão 'cp1252' (padrão do Excel em pt-BR).
+
+    O arquivo é lido em blocos, sem carregá-lo inteiro na memória, e volta para o início.
+    """
+    decoder = codecs.getincrementaldecoder('utf-8')()
+
+    try:
+        while chunk := file.read(chunk_size):
+            decoder.decode(chunk)
+        decoder.decode(b'', final=True)
+        return 'utf-8-sig'
+    except UnicodeDecodeError:
+        return 'cp1252'
+    finally:
+        file.seek(0)
+
+
+def _iter_csv_rows(file, encoding):
+    # errors='replace': os poucos bytes sem caractere no cp1252 não interrompem a importação
+    text = io.TextIOWrapper(file, encoding=encoding, errors='replace', newline='')
+    sample = text.read(4096)
+    text.seek(0)
+
+    try:
+        dialect = csv.Sniffer().sniff(sample, delimiters=',;')
+    except csv.Error:
+        dialect = csv.excel
+
+    try:
+        reader = csv.reader(text, dialect)
+        header = [normalize_header(column) for column in next(reader, [])]
+
+        for row in reader:
+            if any(cell.strip() for cell in row):
+                yield reader.line_num, dict(zip(header, row))
+    except csv.Error as error:
+        raise SpreadsheetError(f'Arquivo CSV inválido: {error}')
+    finally:
+        # Evita que o TextIOWrapper feche o arquivo enviado ao ser coletado
+        text.detach()
+
+
+def open_workbook(file):
+    # Importado aqui para que o openpyxl só seja carregado quando houver planilhas XLSX
+    from openpyxl import load_workbook
+    from openpyxl.utils.exceptions import InvalidFileException
+
+    try:
+        # read_only lê a planilha sob demanda, sem carregar todas as linhas na memória
+        return load_workbook(file, read_only=True, data_only=True)
+    except (BadZipFile, InvalidFileException, KeyError, OSError):
+        raise SpreadsheetError('Arquivo XLSX inválido ou corrompido.')
+
+
+def _iter_xlsx_rows(workbook):
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = [normalize_header(column) for column in next(rows, ())]
+
+        for line_number, row in enumerate(rows, start=2):
+            if any(cell not in (None, '') for cell in row):
+                yield line_number, dict(zip(header, row))
+    finally:
+        workbook.close()
+
+
+def iter_spreadsheet_rows(file, file_name=None):
+    """
+    Percorre as linhas de um arquivo CSV ou XLSX sem carregá-lo inteiro na memória.
+
+    Gera tuplas (número da linha, dicionário coluna -> valor) usando a primeira linha
+    como cabeçalho, com os nomes das colunas em minúsculas. CSVs que não são UTF-8 são
+    lidos como cp1252. Levanta SpreadsheetError se o arquivo não puder ser lido; a
+    codificação e o XLSX são verificados aqui, antes de a primeira linha ser importada.
+    """
+    file_name = (file_name or getattr(file, 'name', '') or '').lower()
+
+    if file_name.endswith('.csv'):
+        return _iter_csv_rows(file, detect_csv_encoding(file))
+    if file_name.endswith('.xlsx'):
+        return _iter_xlsx_rows(open_workbook(file))
+
+    raise SpreadsheetError('Formato de arquivo não suportado. Envie um arquivo CSV ou XLSX.')
+
+
+def chunked(iterable, size):
+    """Divide um iterável em listas de até size itens, sem materializá-lo inteiro."""
+    iterator = iter(iterable)
+
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
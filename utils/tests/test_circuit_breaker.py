@@ -0,0 +1,99 @@
+from unittest.mock import patch
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+from utils.circuit_breaker import CircuitBreaker, CircuitOpenError
+from utils.ultramsg import UltraMsgAPI
+from utils.ultramsg_stub import UltraMsgStubServer
+
+
+class CircuitBreakerTestCase(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.breaker = CircuitBreaker('test', failure_threshold=3, recovery_timeout=60)
+
+    def test_opens_after_consecutive_failures(self):
+        for _ in range(3):
+            self.breaker.before_call()
+            self.breaker.record_failure()
+
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+        with self.assertRaises(CircuitOpenError) as context:
+            self.breaker.before_call()
+        self.assertGreater(context.exception.retry_after, 59)
+
+    def test_success_resets_the_failure_count(self):
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.breaker.record_success()
+        self.breaker.record_failure()
+
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+        self.assertEqual(self.breaker.metrics()['failures'], 1)
+
+    def test_half_open_allows_a_single_probe(self):
+        self.breaker.open()
+
+        with patch('utils.circuit_breaker.time.time', return_value=cache.get(self.breaker.opened_at_key) + 61):
+            self.assertEqual(self.breaker.state, CircuitBreaker.HALF_OPEN)
+            self.breaker.before_call()
+
+            with self.assertRaises(CircuitOpenError):
+                self.breaker.before_call()
+
+        self.breaker.record_success()
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+        self.breaker.before_call()
+
+    def test_failed_probe_reopens_the_circuit(self):
+        self.breaker.open()
+
+        with patch('utils.circuit_breaker.time.time', return_value=cache.get(self.breaker.opened_at_key) + 61):
+            self.breaker.before_call()
+            self.breaker.record_failure()
+            self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+
+    def test_state_is_shared_between_instances(self):
+        """Two breakers with the same name share the state through the cache, as separate workers do."""
+        self.breaker.open()
+
+        with self.assertRaises(CircuitOpenError):
+            CircuitBreaker('test', failure_threshold=3, recovery_timeout=60).before_call()
+
+
+@override_settings(
+    ULTRAMSG_TOKEN='token',
+    ULTRAMSG_INSTANCE='instance1',
+    ULTRAMSG_BACKOFF_INITIAL=0.01,
+    ULTRAMSG_BACKOFF_MAX=0.02,
+    ULTRAMSG_CIRCUIT_FAILURE_THRESHOLD=2,
+)
+class UltraMsgCircuitBreakerTestCase(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.stub = UltraMsgStubServer().start()
+        self.addCleanup(self.stub.stop)
+        self.client = UltraMsgAPI(api_url=self.stub.url, max_retries=0)
+        self.addCleanup(self.client.close)
+
+    def test_fails_fast_while_the_endpoint_is_down(self):
+        self.stub.forced_statuses = [500, 503, 500]
+
+        self.client.send_message(to='5585999999999', message='Olá')
+        self.client.send_message(to='5585999999999', message='Olá')
+        result = self.client.send_message(to='5585999999999', message='Olá')
+
+        self.assertFalse(result.ok)
+        self.assertTrue(result.deferred)
+        self.assertEqual(result.error_class, 'CircuitOpenError')
+        self.assertEqual(len(self.stub.requests), 2)
+
+    def test_api_errors_do_not_open_the_circuit(self):
+        self.stub.failing_numbers = {'5585000000000'}
+
+        for _ in range(3):
+            self.assertFalse(self.client.send_message(to='5585000000000', message='Olá').ok)
+
+        self.assertEqual(self.client.circuit_breaker.state, CircuitBreaker.CLOSED)
+        self.assertEqual(len(self.stub.requests), 3)
@@ -0,0 +1,66 @@
+import time
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+from utils import messaging
+from utils.messaging import HttpStubBackend, LocmemBackend, UltraMsgBackend, clear_outbox, get_messaging_backend
+from utils.ultramsg_stub import UltraMsgStubServer
+
+
+class MessagingBackendTestCase(SimpleTestCase):
+
+    def setUp(self):
+        clear_outbox()
+
+    @override_settings(MESSAGING_BACKEND='utils.messaging.LocmemBackend')
+    def test_locmem_backend_records_messages(self):
+        backend = get_messaging_backend()
+
+        result = backend.send_message(to='5585999999999', message='Olá')
+
+        self.assertIsInstance(backend, LocmemBackend)
+        self.assertTrue(result.ok)
+        self.assertEqual(messaging.outbox[0]['to'], '5585999999999')
+        self.assertEqual(messaging.outbox[0]['body'], 'Olá')
+        self.assertEqual(result.message_id, messaging.outbox[0]['id'])
+
+    @override_settings(MESSAGING_BACKEND='utils.messaging.LocmemBackend')
+    def test_backend_is_reused(self):
+        self.assertIs(get_messaging_backend(), get_messaging_backend())
+
+    @override_settings(ULTRAMSG_TOKEN='token', ULTRAMSG_INSTANCE='instance1')
+    def test_ultramsg_backend_is_the_default(self):
+        self.assertIsInstance(get_messaging_backend(), UltraMsgBackend)
+
+    @override_settings(ULTRAMSG_TOKEN=None, ULTRAMSG_INSTANCE=None)
+    def test_http_stub_backend_does_not_need_ultramsg_credentials(self):
+        cache.clear()
+
+        with UltraMsgStubServer() as stub:
+            with override_settings(MESSAGING_BACKEND='utils.messaging.HttpStubBackend', MESSAGING_STUB_URL=stub.url):
+                backend = get_messaging_backend()
+                result = backend.send_message(to='5585999999999', message='Olá')
+
+        self.assertIsInstance(backend, HttpStubBackend)
+        self.assertTrue(result.ok)
+        self.assertEqual(stub.requests[0]['path'], '/stub/messages/chat')
+
+
+class UltraMsgStubInjectionTestCase(SimpleTestCase):
+
+    def test_error_rate_injects_server_errors(self):
+        stub = UltraMsgStubServer(error_rate=0.5, seed=1, keep_requests=False)
+
+        statuses = [stub.handle('/stub/messages/chat', {'to': '5585999999999'})[0] for _ in range(200)]
+
+        self.assertEqual(stub.stats, {'requests': 200, 'errors': statuses.count(500)})
+        self.assertGreater(statuses.count(500), 60)
+        self.assertLess(statuses.count(500), 140)
+        self.assertEqual(stub.requests, [])
+
+    def test_latency_delays_the_response(self):
+        stub = UltraMsgStubServer(latency=0.05)
+
+        started_at = time.monotonic()
+        stub.handle('/stub/messages/chat', {'to': '5585999999999'})
+
+        self.assertGreaterEqual(time.monotonic() - started_at, 0.05)
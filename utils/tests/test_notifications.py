@@ -0,0 +1,61 @@
+from django.core import mail
+from django.test import SimpleTestCase, override_settings
+from unittest.mock import patch
+from utils import messaging
+from utils.messaging import clear_outbox
+from utils.notifications import get_channel, resolve_channels
+
+NOTIFICATION = {'subject': 'Aviso', 'body': 'Olá', 'phone': '85999999999', 'email': 'aluno@teste.com'}
+
+
+@override_settings(MESSAGING_BACKEND='utils.messaging.LocmemBackend')
+class NotificationChannelsTestCase(SimpleTestCase):
+
+    def setUp(self):
+        clear_outbox()
+
+    def test_whatsapp_channel_sends_with_country_code(self):
+        result = get_channel('whatsapp').send(NOTIFICATION)
+
+        self.assertTrue(result.ok)
+        self.assertEqual(messaging.outbox[0]['to'], '5585999999999')
+
+    def test_email_channel_reuses_the_connection(self):
+        channel = get_channel('email')
+
+        with channel.connection() as connection:
+            results = [channel.send(NOTIFICATION, connection) for _ in range(2)]
+
+        self.assertTrue(all(result.ok for result in results))
+        self.assertEqual([email.to for email in mail.outbox], [['aluno@teste.com']] * 2)
+
+    def test_email_channel_returns_the_error(self):
+        with patch('django.core.mail.EmailMessage.send', side_effect=ConnectionRefusedError('smtp')):
+            result = get_channel('email').send(NOTIFICATION)
+
+        self.assertFalse(result.ok)
+        self.assertEqual(result.error_class, 'ConnectionRefusedError')
+
+    def test_unknown_channel(self):
+        with self.assertRaises(ValueError):
+            get_channel('sms')
+
+    def test_resolve_channels_keeps_channels_with_address(self):
+        self.assertEqual(resolve_channels(NOTIFICATION, ['whatsapp', 'email']), ['whatsapp', 'email'])
+
+    def test_resolve_channels_uses_fallback_without_valid_phone(self):
+        notification = {**NOTIFICATION, 'phone': '123'}
+
+        self.assertEqual(resolve_channels(notification, ['whatsapp']), ['email'])
+        # O fallback não duplica um canal já pedido
+        self.assertEqual(resolve_channels(notification, ['whatsapp', 'email']), ['email'])
+
+    def test_resolve_channels_without_any_address(self):
+        self.assertEqual(resolve_channels({'body': 'Olá', 'phone': '', 'email': 'invalido'}, ['whatsapp']), [])
+
+    @override_settings(NOTIFICATION_CHANNELS={
+        'whatsapp': {'queue': 'whatsapp', 'concurrency': 1, 'fallback': None},
+        'email': {'queue': 'email', 'concurrency': 1, 'fallback': None},
+    })
+    def test_resolve_channels_without_fallback(self):
+        self.assertEqual(resolve_channels({**NOTIFICATION, 'phone': None}, ['whatsapp']), [])
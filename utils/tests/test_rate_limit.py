@@ -0,0 +1,96 @@
+from unittest.mock import patch
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+from utils.rate_limit import InMemoryTokenBucket, RateLimitExceeded, get_rate_limiter, get_rate_limiters_metrics
+from utils.ultramsg import UltraMsgAPI
+from utils.ultramsg_stub import UltraMsgStubServer
+
+
+class InMemoryTokenBucketTestCase(SimpleTestCase):
+
+    def test_burst_is_available_immediately(self):
+        bucket = InMemoryTokenBucket('test', rate=1, capacity=3)
+
+        self.assertEqual([bucket.try_acquire()[0] for _ in range(4)], [True, True, True, False])
+
+    def test_wait_time_follows_the_rate(self):
+        bucket = InMemoryTokenBucket('test', rate=10, capacity=1)
+        bucket.try_acquire()
+
+        allowed, wait = bucket.try_acquire()
+
+        self.assertFalse(allowed)
+        self.assertAlmostEqual(wait, 0.1, delta=0.02)
+
+    def test_acquire_blocks_until_a_token_is_available(self):
+        bucket = InMemoryTokenBucket('test', rate=50, capacity=1)
+        bucket.acquire()
+
+        waited = bucket.acquire(timeout=1)
+
+        self.assertGreater(waited, 0)
+        self.assertEqual(bucket.metrics()['throttled'], 1)
+
+    def test_acquire_raises_when_the_wait_exceeds_the_timeout(self):
+        bucket = InMemoryTokenBucket('test', rate=1, capacity=1)
+        bucket.acquire()
+
+        with self.assertRaises(RateLimitExceeded) as context:
+            bucket.acquire(timeout=0.01)
+
+        self.assertGreater(context.exception.retry_after, 0.9)
+        self.assertEqual(bucket.metrics()['rejected'], 1)
+
+    def test_metrics_expose_fill_level(self):
+        bucket = InMemoryTokenBucket('test', rate=1, capacity=4)
+        bucket.try_acquire()
+        bucket.try_acquire()
+
+        metrics = bucket.metrics()
+
+        self.assertAlmostEqual(metrics['tokens'], 2, delta=0.1)
+        self.assertAlmostEqual(metrics['fill_ratio'], 0.5, delta=0.05)
+        self.assertEqual(metrics['acquired'], 2)
+
+    @override_settings(ULTRAMSG_RATE_LIMIT=2, ULTRAMSG_RATE_BURST=5, ULTRAMSG_RATE_LIMIT_BACKEND='memory')
+    def test_get_rate_limiter_is_shared_by_name(self):
+        bucket = get_rate_limiter('ultramsg:instance1')
+
+        self.assertIs(bucket, get_rate_limiter('ultramsg:instance1'))
+        self.assertIsInstance(bucket, InMemoryTokenBucket)
+        self.assertEqual(bucket.capacity, 5)
+        self.assertIn('ultramsg:instance1', [metrics['name'] for metrics in get_rate_limiters_metrics()])
+
+    @override_settings(ULTRAMSG_RATE_LIMIT_BACKEND='redis', REDIS_URL='redis://localhost:6379/0')
+    def test_redis_backend_is_selected_by_setting(self):
+        with patch('utils.rate_limit.RedisTokenBucket') as redis_bucket:
+            self.assertIs(get_rate_limiter('ultramsg:instance1'), redis_bucket.return_value)
+
+        redis_bucket.assert_called_once_with('ultramsg:instance1', 5, 10, 'redis://localhost:6379/0')
+
+
+@override_settings(
+    ULTRAMSG_TOKEN='token',
+    ULTRAMSG_INSTANCE='instance1',
+    ULTRAMSG_RATE_LIMIT=1,
+    ULTRAMSG_RATE_BURST=1,
+    ULTRAMSG_RATE_LIMIT_MAX_WAIT=0.01,
+)
+class UltraMsgRateLimitTestCase(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.stub = UltraMsgStubServer().start()
+        self.addCleanup(self.stub.stop)
+
+    def test_send_is_requeued_when_the_bucket_is_empty(self):
+        client = UltraMsgAPI(api_url=self.stub.url)
+        self.addCleanup(client.close)
+
+        self.assertTrue(client.send_message(to='5585999999999', message='Olá').ok)
+        result = client.send_message(to='5585999999999', message='Olá')
+
+        self.assertFalse(result.ok)
+        self.assertTrue(result.deferred)
+        self.assertEqual(result.error_class, 'RateLimitExceeded')
+        self.assertEqual(len(self.stub.requests), 1)
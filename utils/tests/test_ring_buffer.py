@@ -0,0 +1,49 @@
+from unittest.mock import patch
+from django.test import SimpleTestCase, override_settings
+from utils.ring_buffer import InMemoryRingBuffer, RedisRingBuffer, get_ring_buffer, reset_ring_buffers
+
+
+class InMemoryRingBufferTestCase(SimpleTestCase):
+
+    def test_push_keeps_newest_first_and_trims_to_size(self):
+        buffer = InMemoryRingBuffer('test', size=3)
+        buffer.push(1, 2)
+        buffer.push(3, 4)
+
+        self.assertEqual(buffer.items(), [4, 3, 2])
+        self.assertEqual(buffer.items(2), [4, 3])
+
+    def test_fill_if_empty_does_not_overwrite_items(self):
+        buffer = InMemoryRingBuffer('test', size=3)
+        buffer.fill_if_empty([3, 2, 1, 0])
+        self.assertEqual(buffer.items(), [3, 2, 1])
+
+        buffer.fill_if_empty([9])
+        self.assertEqual(buffer.items(), [3, 2, 1])
+
+
+class GetRingBufferTestCase(SimpleTestCase):
+
+    def setUp(self):
+        reset_ring_buffers()
+        self.addCleanup(reset_ring_buffers)
+
+    def test_returns_the_same_buffer_per_name(self):
+        self.assertIs(get_ring_buffer('test', 5), get_ring_buffer('test', 5))
+
+    @override_settings(RING_BUFFER_BACKEND='redis', REDIS_URL='redis://redis:6379/1')
+    def test_redis_backend(self):
+        with patch('utils.ring_buffer.RedisRingBuffer') as redis_buffer:
+            buffer = get_ring_buffer('test', 5)
+
+        redis_buffer.assert_called_once_with('test', 5, 'redis://redis:6379/1')
+        self.assertIs(buffer, redis_buffer.return_value)
+
+    @override_settings(REDIS_SOCKET_TIMEOUT=0.2)
+    def test_redis_client_uses_short_timeouts(self):
+        """Tests that an unreachable Redis fails fast instead of blocking on the socket."""
+        buffer = RedisRingBuffer('test', 5, 'redis://127.0.0.1:1/0')
+        connection_kwargs = buffer.client.connection_pool.connection_kwargs
+
+        self.assertEqual(connection_kwargs['socket_connect_timeout'], 0.2)
+        self.assertEqual(connection_kwargs['socket_timeout'], 0.2)
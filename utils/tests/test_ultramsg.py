@@ -0,0 +1,114 @@
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+from utils.ultramsg import UltraMsgAPI, get_ultramsg_client
+from utils.ultramsg_stub import UltraMsgStubServer
+
+
+@override_settings(
+    ULTRAMSG_TOKEN='token',
+    ULTRAMSG_INSTANCE='instance1',
+    ULTRAMSG_BACKOFF_INITIAL=0.01,
+    ULTRAMSG_BACKOFF_MAX=0.02,
+)
+class UltraMsgAPITestCase(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.stub = UltraMsgStubServer(failing_numbers={'5585000000000'}).start()
+        self.addCleanup(self.stub.stop)
+
+    def make_client(self, **kwargs):
+        client = UltraMsgAPI(api_url=self.stub.url, **kwargs)
+        self.addCleanup(client.close)
+        return client
+
+    def test_send_message_returns_typed_result(self):
+        result = self.make_client().send_message(to='5585999999999', message='Olá')
+
+        self.assertTrue(result.ok)
+        self.assertEqual(result.status_code, 200)
+        self.assertEqual(result.message_id, 1)
+        self.assertEqual(result.attempts, 1)
+        self.assertIsNotNone(result.latency_ms)
+        self.assertEqual(self.stub.requests[0]['payload']['body'], 'Olá')
+
+    def test_send_message_api_error_is_not_retried(self):
+        result = self.make_client().send_message(to='5585000000000', message='Olá')
+
+        self.assertFalse(result.ok)
+        self.assertEqual(result.error, 'Invalid WhatsApp number')
+        self.assertEqual(len(self.stub.requests), 1)
+
+    def test_invalid_number_is_rejected(self):
+        result = self.make_client().send_message(to='5585000000000', message='Olá')
+
+        self.assertTrue(result.rejected)
+
+    def test_account_error_is_not_a_rejected_number_and_opens_the_circuit(self):
+        """Tests that an account error (HTTP 200 with an error body) is not blamed on the member's phone."""
+        self.stub.valid_token = 'outro-token'
+        with self.settings(ULTRAMSG_CIRCUIT_FAILURE_THRESHOLD=2):
+            client = self.make_client()
+            results = [client.send_message(to='5585999999999', message='Olá') for _ in range(3)]
+
+        self.assertEqual(results[0].status_code, 200)
+        self.assertFalse(any(result.rejected for result in results))
+        self.assertEqual(results[2].error_class, 'CircuitOpenError')
+        self.assertTrue(results[2].deferred)
+        self.assertEqual(len(self.stub.requests), 2)
+
+    def test_send_message_retries_server_errors(self):
+        self.stub.forced_statuses = [500, 503]
+
+        result = self.make_client(max_retries=3).send_message(to='5585999999999', message='Olá')
+
+        self.assertTrue(result.ok)
+        self.assertEqual(result.attempts, 3)
+        self.assertEqual(len(self.stub.requests), 3)
+
+    def test_send_message_gives_up_after_max_retries(self):
+        self.stub.forced_statuses = [500, 500, 500]
+
+        result = self.make_client(max_retries=1).send_message(to='5585999999999', message='Olá')
+
+        self.assertFalse(result.ok)
+        self.assertEqual(result.status_code, 500)
+        self.assertEqual(result.error_class, 'RetryableResponseError')
+        self.assertEqual(len(self.stub.requests), 2)
+
+    def test_send_message_connection_error(self):
+        client = self.make_client(max_retries=1)
+        client.base_url = 'http://127.0.0.1:1/instance1/messages'
+
+        result = client.send_message(to='5585999999999', message='Olá')
+
+        self.assertFalse(result.ok)
+        self.assertEqual(result.error_class, 'ConnectionError')
+        self.assertEqual(result.attempts, 2)
+
+    def test_send_message_retries_too_many_requests(self):
+        self.stub.forced_statuses = [429]
+
+        result = self.make_client(max_retries=1).send_message(to='5585999999999', message='Olá')
+
+        self.assertTrue(result.ok)
+        self.assertEqual(len(self.stub.requests), 2)
+
+    def test_read_timeout_is_not_retried(self):
+        """Tests that a read timeout, where UltraMsg may already have accepted the message, is posted only once."""
+        self.stub.latency = 0.3
+
+        result = self.make_client(max_retries=3, timeout=(1, 0.05)).send_message(to='5585999999999', message='Olá')
+
+        self.assertFalse(result.ok)
+        self.assertIsNone(result.status_code)
+        self.assertEqual(result.error_class, 'ReadTimeout')
+        self.assertEqual(result.attempts, 1)
+        self.assertEqual(len(self.stub.requests), 1)
+
+    def test_get_ultramsg_client_is_reused(self):
+        self.assertIs(get_ultramsg_client(), get_ultramsg_client())
+
+    def test_missing_configuration_raises(self):
+        with override_settings(ULTRAMSG_TOKEN=None):
+            with self.assertRaises(ValueError):
+                UltraMsgAPI()
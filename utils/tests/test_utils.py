@@ -1,7 +1,10 @@
-from django.test import TestCase
+from django.test import SimpleTestCase, TestCase
+from django.core import mail
 from django.core.exceptions import ValidationError
+from django.core.mail.backends import locmem
 from django.http import HttpRequest
-from utils.utils import verify_email, is_valid_cpf, make_pagination, make_pagination_range
+from smtplib import SMTPRecipientsRefused, SMTPServerDisconnected
+from utils.utils import verify_email, is_valid_cpf, make_pagination, make_pagination_range, send_mass_email
 from django.core.paginator import Paginator
 from faker import Faker
 
@@ -86,3 +89,71 @@ class UtilsTestCase(TestCase):
         result = make_pagination_range(page_range, qty_pages, current_page)
         self.assertEqual(list(result['pagination']), expected)
 
+
+
+class FlakyBackend(locmem.EmailBackend):
+    """Backend em memória que recusa os destinatários de fail_to e conta as conexões abertas."""
+
+    def __init__(self, fail_to=(), failing_opens=0, silent_to=(), **kwargs):
+        super().__init__(**kwargs)
+        self.fail_to = set(fail_to)
+        self.silent_to = set(silent_to)
+        self.failing_opens = failing_opens
+        self.opened = 0
+
+    def open(self):
+        self.opened += 1
+        if self.failing_opens:
+            self.failing_opens -= 1
+            raise SMTPServerDisconnected('Connection unexpectedly closed')
+
+    def send_messages(self, messages):
+        if any(recipient in self.fail_to for message in messages for recipient in message.to):
+            raise SMTPRecipientsRefused({})
+        if any(recipient in self.silent_to for message in messages for recipient in message.to):
+            return 0
+        return super().send_messages(messages)
+
+
+class SendMassEmailTestCase(SimpleTestCase):
+
+    def messages(self, count):
+        return [{'subject': 'Aviso', 'body': f'Olá {i}', 'to': f'aluno{i}@teste.com'} for i in range(count)]
+
+    def test_one_connection_per_batch(self):
+        connection = FlakyBackend()
+
+        sent, failed = send_mass_email(self.messages(5), batch_size=2, connection=connection)
+
+        self.assertEqual((sent, failed), (5, []))
+        self.assertEqual(len(mail.outbox), 5)
+        self.assertEqual(connection.opened, 3)
+
+    def test_failure_does_not_stop_the_batch(self):
+        connection = FlakyBackend(fail_to={'aluno1@teste.com'})
+
+        sent, failed = send_mass_email(self.messages(3), batch_size=10, connection=connection)
+
+        self.assertEqual(sent, 2)
+        self.assertEqual([message['to'] for message, _ in failed], ['aluno1@teste.com'])
+        self.assertIn('SMTPRecipientsRefused', failed[0][1])
+        # A conexão é reaberta depois da falha
+        self.assertEqual(connection.opened, 2)
+
+    def test_connection_failure_fails_the_whole_batch(self):
+        """Tests that a batch whose connection cannot be opened is reported as failed instead of raising."""
+        connection = FlakyBackend(failing_opens=1)
+
+        sent, failed = send_mass_email(self.messages(3), batch_size=2, connection=connection)
+
+        self.assertEqual(sent, 1)
+        self.assertEqual([message['to'] for message, _ in failed], ['aluno0@teste.com', 'aluno1@teste.com'])
+        self.assertIn('SMTPServerDisconnected', failed[0][1])
+
+    def test_message_not_accepted_is_a_failure(self):
+        connection = FlakyBackend(silent_to={'aluno0@teste.com'})
+
+        sent, failed = send_mass_email(self.messages(2), connection=connection)
+
+        self.assertEqual(sent, 1)
+        self.assertEqual([message['to'] for message, _ in failed], ['aluno0@teste.com'])
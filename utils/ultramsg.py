@@ -1,20 +1,193 @@
-import requests
+import threading
+import time
 import urllib.parse
-from decouple import config
+from dataclasses import dataclass, field
+from typing import Optional
+
+import requests
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from requests.adapters import HTTPAdapter
+from tenacity import Retrying, retry_if_exception_type, stop_after_attempt, wait_exponential_jitter
+
+from utils.circuit_breaker import CircuitBreaker, CircuitOpenError
+from utils.rate_limit import RateLimitExceeded, get_rate_limiter
+
+
+class RetryableResponseError(Exception):
+    """Resposta 5xx ou 429 do UltraMsg, que vale a pena tentar novamente."""
+
+    def __init__(self, response):
+        super().__init__(f'UltraMsg respondeu {response.status_code}')
+        self.response = response
+
+
+# Só é seguro refazer o POST quando a mensagem certamente não foi aceita: falha ao conectar
+# ou resposta 5xx/429. Um ReadTimeout (requests.Timeout) não entra aqui, porque o UltraMsg
+# pode ter aceitado a mensagem e a retentativa enviaria a cobrança em duplicidade.
+RETRYABLE_EXCEPTIONS = (requests.ConnectionError, requests.ConnectTimeout, RetryableResponseError)
+RETRYABLE_STATUS_CODES = (429,)
+
+# Trechos das mensagens de erro do UltraMsg que dizem respeito ao número do destinatário
+# (ex.: 'Invalid WhatsApp number'). Os demais erros, mesmo com HTTP 200 (token errado,
+# instância desconectada ou sem pagamento), são da conta e não do aluno.
+NUMBER_ERROR_KEYWORDS = ('number', 'phone', 'chatid')
+
+
+def is_number_error(error):
+    """O erro retornado pelo UltraMsg se refere ao número do destinatário."""
+    error = str(error or '').lower()
+    return any(keyword in error for keyword in NUMBER_ERROR_KEYWORDS)
+
+
+@dataclass
+class SendResult:
+    """Resultado de um envio pelo UltraMsg."""
+    ok: bool
+    status_code: Optional[int] = None
+    body: dict = field(default_factory=dict)
+    error: Optional[str] = None
+    error_class: Optional[str] = None
+    attempts: int = 1
+    latency_ms: Optional[int] = None
+    retry_after: Optional[float] = None  # Preenchido quando o envio foi adiado (rate limit ou circuito aberto)
+
+    @property
+    def deferred(self):
+        """O envio nem foi tentado e pode ser refeito depois de retry_after segundos."""
+        return self.retry_after is not None
+
+    @property
+    def rejected(self):
+        """
+        O provedor recusou o número do destinatário (ex.: número inválido ou sem WhatsApp).
+
+        Erros da conta (token errado, instância desconectada...) não contam: não são culpa do telefone do aluno.
+        """
+        return not self.ok and self.status_code is not None and self.status_code < 500 and is_number_error(self.error)
+
+    @property
+    def message_id(self):
+        return self.body.get('id')
 
 
 class UltraMsgAPI:
-    def __init__(self):
+    def __init__(self, token=None, instance=None, api_url=None, timeout=None, max_retries=None, pool_size=None):
         """
-        Initializes the UltraMsg API with data from the .env file.
+        Initializes the UltraMsg API with data from the Django settings (ULTRAMSG_*).
+
+        The client keeps a pooled requests.Session (keep-alive), so it should be shared
+        through get_ultramsg_client() instead of being created for each message.
+        Every request first takes a token from the instance's rate limiter (ULTRAMSG_RATE_*)
+        and goes through the instance's circuit breaker (ULTRAMSG_CIRCUIT_*).
         """
-        self.token = config('ULTRAMSG_TOKEN', default=None, cast=str)
-        self.instance = config('ULTRAMSG_INSTANCE', default=None, cast=str)
+        self.token = token or settings.ULTRAMSG_TOKEN
+        self.instance = instance or settings.ULTRAMSG_INSTANCE
         if not self.token or not self.instance:
             raise ValueError('ULTRAMSG_TOKEN or ULTRAMSG_INSTANCE not configured in .env')
 
-        self.base_url = f'https://api.ultramsg.com/{self.instance}/messages'
+        api_url = (api_url or settings.ULTRAMSG_API_URL).rstrip('/')
+        self.base_url = f'{api_url}/{self.instance}/messages'
         self.headers = {'content-type': 'application/x-www-form-urlencoded'}
+        self.timeout = timeout or (settings.ULTRAMSG_CONNECT_TIMEOUT, settings.ULTRAMSG_READ_TIMEOUT)
+        self.max_retries = settings.ULTRAMSG_MAX_RETRIES if max_retries is None else max_retries
+        self.rate_limiter = get_rate_limiter(f'ultramsg:{self.instance}')
+        self.circuit_breaker = CircuitBreaker(
+            f'ultramsg:{self.instance}',
+            failure_threshold=settings.ULTRAMSG_CIRCUIT_FAILURE_THRESHOLD,
+            recovery_timeout=settings.ULTRAMSG_CIRCUIT_RECOVERY_TIMEOUT,
+        )
+
+        pool_size = pool_size or settings.BILLING_MESSAGES_CONCURRENCY
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def _post(self, url, payload):
+        # Espera o token do rate limit; cada retentativa também consome um token
+        self.rate_limiter.acquire(timeout=settings.ULTRAMSG_RATE_LIMIT_MAX_WAIT)
+        response = self.session.post(url, data=payload, headers=self.headers, timeout=self.timeout)
+        if response.status_code >= 500 or response.status_code in RETRYABLE_STATUS_CODES:
+            raise RetryableResponseError(response)
+        return response
+
+    def _send(self, url, payload):
+        """
+        Faz o POST com retentativas (backoff exponencial com jitter) em erros de conexão, 5xx e 429.
+
+        Um ReadTimeout não é repetido: o resultado fica sem status_code (desfecho
+        desconhecido) e cabe ao chamador decidir se reenvia mais tarde.
+        """
+        started_at = time.monotonic()
+        retrying = Retrying(
+            stop=stop_after_attempt(self.max_retries + 1),
+            wait=wait_exponential_jitter(initial=settings.ULTRAMSG_BACKOFF_INITIAL, max=settings.ULTRAMSG_BACKOFF_MAX),
+            retry=retry_if_exception_type(RETRYABLE_EXCEPTIONS),
+            reraise=True,
+        )
+
+        try:
+            # Com o circuito aberto a chamada falha na hora, sem esperar os timeouts
+            self.circuit_breaker.before_call()
+            response = retrying(self._post, url, payload)
+        except (CircuitOpenError, RateLimitExceeded) as error:
+            return SendResult(
+                ok=False,
+                error=str(error),
+                error_class=type(error).__name__,
+                attempts=retrying.statistics.get('attempt_number', 1),
+                latency_ms=int((time.monotonic() - started_at) * 1000),
+                retry_after=error.retry_after,
+            )
+        except RetryableResponseError as error:
+            self.circuit_breaker.record_failure()
+            return self._result(error.response, started_at, retrying, error=str(error), error_class=type(error).__name__)
+        except requests.RequestException as error:
+            self.circuit_breaker.record_failure()
+            return SendResult(
+                ok=False,
+                error=str(error),
+                error_class=type(error).__name__,
+                attempts=retrying.statistics.get('attempt_number', 1),
+                latency_ms=int((time.monotonic() - started_at) * 1000),
+            )
+
+        result = self._result(response, started_at, retrying)
+
+        if result.ok or result.rejected:
+            # Um número recusado mostra que a conta está funcionando
+            self.circuit_breaker.record_success()
+        else:
+            # Erro da conta (ex.: token errado, instância desconectada): todos os envios falhariam,
+            # então conta como falha do servidor e abre o circuito
+            self.circuit_breaker.record_failure()
+
+        return result
+
+    def _result(self, response, started_at, retrying, error=None, error_class=None):
+        try:
+            body = response.json()
+        except ValueError:
+            body = {'raw': response.text}
+        if not isinstance(body, dict):
+            body = {'raw': body}
+
+        ok = response.status_code == 200 and str(body.get('sent')).lower() == 'true'
+        if not ok and error is None:
+            error = str(body.get('error') or body)
+            error_class = error_class or f'HTTP{response.status_code}'
+
+        return SendResult(
+            ok=ok,
+            status_code=response.status_code,
+            body=body,
+            error=error,
+            error_class=error_class,
+            attempts=retrying.statistics.get('attempt_number', 1),
+            latency_ms=int((time.monotonic() - started_at) * 1000),
+        )
 
     def send_message(self, to, message):
         """
@@ -22,19 +195,14 @@ class UltraMsgAPI:
 
         :param to: Recipient phone number (e.g., '558599275573').
         :param message: Message to be sent.
-        :return: API response or error message.
+        :return: SendResult.
         """
         url = f'{self.base_url}/chat'
         encoded_message = urllib.parse.quote(message)  # Encode the message
         payload = f"token={self.token}&to={to}&body={encoded_message}"
 
-        try:
-            response = requests.post(url, data=payload, headers=self.headers)
-            response.raise_for_status()
-            return response
-        except requests.exceptions.RequestException as e:
-            return {'error': str(e)}
-        
+        return self._send(url, payload)
+
     def send_image(self, to, image_url, caption=""):
         """
         Sends an image via WhatsApp.
@@ -42,28 +210,45 @@ class UltraMsgAPI:
         :param to: Recipient phone number (e.g., '55859xxxxxxxx').
         :param image_url: URL of the image to be sent.
         :param caption: Caption for the image.
-        :return: API response or error message.
+        :return: SendResult.
         """
         url = f'{self.base_url}/image'
         encoded_caption = urllib.parse.quote(caption)
         payload = f'token={self.token}&to={to}&image={image_url}&caption={encoded_caption}'
 
-        try:
-            response = requests.post(url, data=payload, headers=self.headers)
-            response.raise_for_status()
-            return response
-        except requests.exceptions.RequestException as e:
-            return {'error': str(e)}
-
-
-# Example usage:
-if __name__ == '__main__':
-    try:
-        # Make sure your .env file contains the correct ULTRAMSG_TOKEN and ULTRAMSG_INSTANCE
-        ultramsg = UltraMsgAPI()
-
-        # Test the send_message method
-        response = ultramsg.send_image(to='The-number', image_url='https://blog.emania.com.br/wp-content/uploads/2016/02/direitos-autorais-e-de-imagem.jpg', caption='Imagem aleatória')
-        print(response)  # Print the response
-    except ValueError as e:
-        print(f'Invalid configuration: {e}')
\ No newline at end of file
+        return self._send(url, payload)
+
+    def close(self):
+        self.session.close()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_ultramsg_client():
+    """Retorna o cliente UltraMsg do processo, criado na primeira chamada e reutilizado depois."""
+    global _client
+
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = UltraMsgAPI()
+
+    return _client
+
+
+def reset_ultramsg_client():
+    global _client
+
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+        _client = None
+
+
+@receiver(setting_changed)
+def reset_client_on_setting_changed(setting, **kwargs):
+    # Garante que override_settings nos testes crie um cliente com a nova configuração
+    if setting.startswith('ULTRAMSG_') or setting == 'BILLING_MESSAGES_CONCURRENCY':
+        reset_ultramsg_client()
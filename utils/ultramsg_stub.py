@@ -0,0 +1,119 @@
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+
+class UltraMsgStubHandler(BaseHTTPRequestHandler):
+    """Responde como a API do UltraMsg para /<instance>/messages/chat e /<instance>/messages/image."""
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        payload = {key: values[0] for key, values in parse_qs(self.rfile.read(length).decode()).items()}
+        status_code, body = self.server.stub.handle(self.path, payload)
+
+        content = json.dumps(body).encode()
+        self.send_response(status_code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        # Não polui a saída dos testes com o log de cada requisição
+        pass
+
+
+class UltraMsgStubServer:
+    """
+    Servidor HTTP local que imita a API do UltraMsg, para testes sem acesso à internet.
+
+    Registra cada requisição recebida em requests. Números em failing_numbers
+    recebem a resposta de erro da API e os status em forced_statuses são
+    devolvidos, em ordem, nas próximas requisições (ex.: [500, 503]).
+
+    Para testes de carga, latency (+ até latency_jitter) segundos são esperados em
+    cada resposta e uma fração error_rate das requisições recebe error_status.
+    keep_requests=False evita guardar as requisições em execuções longas.
+    Com valid_token, requisições com outro token recebem o erro de conta do UltraMsg.
+
+        with UltraMsgStubServer() as stub:
+            # ULTRAMSG_API_URL=stub.url
+            ...
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, failing_numbers=(), latency=0.0, latency_jitter=0.0,
+                 error_rate=0.0, error_status=500, seed=None, keep_requests=True, valid_token=None):
+        self.failing_numbers = set(failing_numbers)
+        self.valid_token = valid_token
+        self.forced_statuses = []
+        self.requests = []
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.keep_requests = keep_requests
+        self.stats = {'requests': 0, 'errors': 0}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), UltraMsgStubHandler)
+        self._server.daemon_threads = True
+        self._server.stub = self
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def handle(self, path, payload):
+        with self._lock:
+            if self.keep_requests:
+                self.requests.append({'path': path, 'payload': payload})
+            self.stats['requests'] += 1
+            message_id = self.stats['requests']
+            forced_status = self.forced_statuses.pop(0) if self.forced_statuses else None
+
+            if forced_status is None and self.error_rate and self._random.random() < self.error_rate:
+                forced_status = self.error_status
+            delay = self.latency + (self._random.uniform(0, self.latency_jitter) if self.latency_jitter else 0)
+            if forced_status:
+                self.stats['errors'] += 1
+
+        if delay:
+            # Cada requisição roda em sua própria thread, então a espera não bloqueia as demais
+            time.sleep(delay)
+
+        if forced_status:
+            return forced_status, {'error': f'Forced status {forced_status}'}
+
+        if self.valid_token is not None and payload.get('token') != self.valid_token:
+            # Erros da conta também vêm com HTTP 200
+            return 200, {'error': 'Wrong token. Please provide token as a GET parameter.'}
+
+        if payload.get('to') in self.failing_numbers:
+            return 200, {'error': 'Invalid WhatsApp number'}
+
+        return 200, {'sent': 'true', 'message': 'ok', 'id': message_id}
+
+    def serve_forever(self):
+        """Atende as requisições na thread atual até ser interrompido (usado pelo run_messaging_stub)."""
+        self._server.serve_forever()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
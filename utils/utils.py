@@ -1,6 +1,9 @@
+from contextlib import suppress
+from django.conf import settings
 from django.core.exceptions import ValidationError
 from django.core.validators import validate_email
-from django.core.mail import EmailMessage
+from django.core.mail import EmailMessage, get_connection
+from utils.spreadsheets import chunked
 
 def send_email(subject, message, to_email):
     email = EmailMessage(
@@ -10,6 +13,58 @@ def send_email(subject, message, to_email):
     )
     email.send()
 
+def send_mass_email(messages, batch_size=None, connection=None):
+    """
+    Envia vários e-mails ({'subject': ..., 'body': ..., 'to': ...}) reaproveitando a conexão SMTP.
+
+    send_email abre uma conexão TLS por e-mail; aqui a conexão é aberta uma vez por lote
+    de batch_size mensagens (padrão: EMAIL_BATCH_SIZE), o que também respeita o limite de
+    mensagens por sessão do servidor. Uma falha não interrompe o lote: a conexão é reaberta
+    e a mensagem entra na lista de falhas. Se a conexão nem abrir (servidor fora do ar,
+    erro de TLS ou de autenticação), todas as mensagens do lote entram na lista de falhas.
+    Retorna (enviadas, [(mensagem, erro)]).
+    """
+    batch_size = batch_size or settings.EMAIL_BATCH_SIZE
+    connection = connection or get_connection()
+    sent, failed = 0, []
+
+    for batch in chunked(messages, batch_size):
+        try:
+            connection.open()
+        except Exception as error:
+            failed.extend((message, f'{type(error).__name__}: {error}') for message in batch)
+            continue
+
+        try:
+            for message in batch:
+                email = EmailMessage(
+                    subject=message.get('subject', ''),
+                    body=message['body'],
+                    to=[message['to']],
+                    connection=connection,
+                )
+
+                try:
+                    count = connection.send_messages([email])
+                except Exception as error:
+                    failed.append((message, f'{type(error).__name__}: {error}'))
+                    # A sessão pode ter sido derrubada pelo servidor: abre outra para o resto do lote.
+                    # Se não abrir, cada envio seguinte tenta de novo e registra o próprio erro.
+                    connection.close()
+                    with suppress(Exception):
+                        connection.open()
+                    continue
+
+                if count:
+                    sent += count
+                else:
+                    # Com fail_silently o backend retorna 0 em vez de levantar a exceção
+                    failed.append((message, 'O servidor não aceitou o e-mail.'))
+        finally:
+            connection.close()
+
+    return sent, failed
+
 def verify_email(email):
     try:
         validate_email(email)
@@ -17,6 +72,13 @@ def verify_email(email):
     except ValidationError:
         return False
 
+def percentile(values, fraction):
+    """Percentil (fraction entre 0 e 1) de uma lista de números, ex.: percentile(latencias, 0.95)."""
+    values = sorted(values)
+    if not values:
+        return 0
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
 def is_valid_cpf(cpf):
     """Valida o CPF usando o algoritmo dos dígitos verificadores."""
 